@@ -0,0 +1,180 @@
+"""
+Serialization micro-benchmark for list responses.
+
+Renders pages of Listing and Contract ORM objects (built in memory, no database)
+the way FastAPI does for `response_model` (validate, dump to Python, then encode,
+with a thread hop for sync routes), the same through PydanticJSONResponse, and in
+one pass with `render_model`, with and without FAST_JSON_RESPONSES. Reports the
+median time per response, and the payload size of the full response and of a
+mobile sparse fieldset (`fields=`), raw and gzipped as GZipMiddleware sends it.
+
+    python -m benchmarks.serialization --page-size 100
+    python -m benchmarks.serialization --output serialization.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import platform
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+from traceapi.core.config import settings
+from traceapi.crud.crud_contract import build_contract
+from traceapi.db import models
+from traceapi.schemas.contract import Contract, ContractStatus
+from traceapi.schemas.listing import Incoterm, Listing
+from traceapi.schemas.user import UserTier
+from traceapi.utils.fieldsets import sparse_adapter
+from traceapi.utils.responses import PydanticJSONResponse, render_model
+
+# What the mobile app asks for with `fields=`
+MOBILE_FIELDS = {
+    "listings": ("id", "commodity_name", "price_per_kg_usd", "quantity_kg", "location_state"),
+    "contracts": ("id", "status", "parameters", "created_at"),
+}
+
+
+def make_listings(count: int, rng: random.Random) -> list[models.Listing]:
+    sellers = [
+        models.User(id=uuid.uuid4(), phone_number=f"+23480{index:08d}", tier=UserTier.TIER_1, is_active=True)
+        for index in range(max(1, count // 10))
+    ]
+    now = datetime.now(timezone.utc)
+    listings = []
+    for index in range(count):
+        seller = rng.choice(sellers)
+        listings.append(models.Listing(
+            id=uuid.uuid4(),
+            commodity_name=rng.choice(["Dried Ginger", "Sesame Seeds", "Cashew Nuts", "Hibiscus"]),
+            quantity_kg=rng.randint(100, 50_000),
+            price_per_kg_usd=round(rng.uniform(0.5, 8), 2),
+            location_lga="Kachia",
+            location_state="Kaduna",
+            incoterm=Incoterm.EXW,
+            notes="Sun dried, sorted and bagged in 50kg sacks",
+            is_active=True,
+            created_at=now - timedelta(minutes=index),
+            seller_id=seller.id,
+            seller=seller,
+        ))
+    return listings
+
+
+def make_contracts(count: int, rng: random.Random) -> list[models.Contract]:
+    buyer = models.User(id=uuid.uuid4(), phone_number="+2348099999999", tier=UserTier.TIER_1, is_active=True)
+    contracts = []
+    for listing in make_listings(count, rng):
+        contract = build_contract(listing=listing, buyer=buyer)
+        contract.status = ContractStatus.DRAFT
+        contract.listing, contract.buyer, contract.seller = listing, buyer, listing.seller
+        contracts.append(contract)
+    return contracts
+
+
+def time_per_call(render, repeats: int) -> float:
+    """Median milliseconds per call over `repeats` calls, after one warm-up."""
+    render()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        render()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def variants(response_type, value) -> dict:
+    field = create_response_field(name="response", type_=response_type, mode="serialization")
+    adapter = TypeAdapter(response_type)
+    loop = asyncio.new_event_loop()
+
+    def response_model(response_class):
+        # What FastAPI does for a sync route with a response_model
+        content = loop.run_until_complete(
+            serialize_response(field=field, response_content=value, is_coroutine=False)
+        )
+        return response_class(content).body
+
+    def single_pass(fast: bool):
+        previous = settings.FAST_JSON_RESPONSES
+        settings.FAST_JSON_RESPONSES = fast
+        try:
+            return render_model(adapter, value)
+        finally:
+            settings.FAST_JSON_RESPONSES = previous
+
+    return {
+        "response_model": lambda: response_model(JSONResponse),
+        "response_model+pydantic_json_response": lambda: response_model(PydanticJSONResponse),
+        "render_model": lambda: single_pass(False),
+        "render_model+fast_json": lambda: single_pass(True),
+    }
+
+
+def payload_bytes(schema, value, fields: tuple[str, ...]) -> dict:
+    sizes = {}
+    for label, selected in (("full", None), ("sparse", fields)):
+        body = render_model(sparse_adapter(schema, selected, many=True), value)
+        sizes[label] = len(body)
+        # Starlette's GZipMiddleware compresses at level 9
+        sizes[f"{label}_gzip"] = len(gzip.compress(body, compresslevel=9))
+    return sizes
+
+
+def run(page_size: int, repeats: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    payloads = {
+        "listings": (Listing, make_listings(page_size, rng)),
+        "contracts": (Contract, make_contracts(page_size, rng)),
+    }
+    results = {}
+    for name, (schema, value) in payloads.items():
+        renders = variants(List[schema], value)
+        bodies = {variant: render() for variant, render in renders.items()}
+        assert len({json.dumps(json.loads(body), sort_keys=True) for body in bodies.values()}) == 1, (
+            f"{name}: variants disagree on the response"
+        )
+        baseline = None
+        results[name] = {"payload_bytes": payload_bytes(schema, value, MOBILE_FIELDS[name]), "ms": {}, "speedup": {}}
+        for variant, render in renders.items():
+            elapsed = time_per_call(render, repeats)
+            baseline = baseline or elapsed
+            results[name]["ms"][variant] = round(elapsed, 3)
+            results[name]["speedup"][variant] = round(baseline / elapsed, 2)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100, help="items per rendered response")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "page_size": args.page_size,
+        "repeats": args.repeats,
+        **run(args.page_size, args.repeats, args.seed),
+    }
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
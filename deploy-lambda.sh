@@ -38,7 +38,13 @@ fi
 DATABASE_URL=$(terraform output -raw database_url)
 cd ..
 
-# Step 2: Deploy Lambda function
+# Step 2: Create the database schema
+# The Lambda handler never creates tables, so this runs once per deploy.
+echo "🗄️  Creating database schema..."
+DATABASE_URL="$DATABASE_URL" python -m traceapi.db.init_db || \
+    echo "⚠️  Could not reach the database from here; run 'python -m traceapi.db.init_db' from inside the VPC"
+
+# Step 3: Deploy Lambda function
 echo "🔧 Deploying Lambda function..."
 
 # Set environment variables
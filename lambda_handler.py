@@ -1,7 +1,49 @@
 """Lambda handler for FastAPI app"""
 
+import logging
+
 from mangum import Mangum
+from traceapi.core.config import settings
+from traceapi.db.session import get_engine
 from traceapi.main import app
 
+logger = logging.getLogger(__name__)
+
+
+def warm_database() -> None:
+    """
+    Opens the container's database connection during the init phase, so the first
+    real request does not pay for DNS, TCP and TLS setup. The connection goes back
+    to the pool and is reused by later invocations.
+    """
+    try:
+        with get_engine().connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+    except Exception:
+        logger.warning("Could not pre-connect to the database during init", exc_info=True)
+
+
+def is_warmup_event(event: dict) -> bool:
+    """
+    Scheduled keep-warm pings: EventBridge schedules, serverless-plugin-warmup,
+    or an explicit {"warmup": true} payload.
+    """
+    return (
+        event.get("source") in ("aws.events", "serverless-plugin-warmup")
+        or event.get("warmup") is True
+    )
+
+
+# Init phase: importing the app above and connecting here happen once per container
+if settings.LAMBDA_MODE and not settings.DB_BEHIND_PROXY:
+    warm_database()
+
 # Create the Lambda handler
-handler = Mangum(app, lifespan="off")
\ No newline at end of file
+asgi_handler = Mangum(app, lifespan="off")
+
+
+def handler(event, context):
+    # Answer warm-up pings without running the ASGI stack
+    if is_warmup_event(event):
+        return {"warmed": True}
+    return asgi_handler(event, context)
@@ -1,10 +1,16 @@
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from traceapi.db.base_class import Base
-from traceapi.db.session import get_db
+from traceapi.db.session import get_db, get_session_factory
 from traceapi.main import app
+from traceapi.utils.idempotency import idempotency_cache
+from traceapi.utils.rate_limit import MemoryRateLimitBackend, get_rate_limit_backend
+from traceapi.utils.response_cache import listings_cache
+from traceapi.utils.user_cache import user_cache
 
 # Use in-memory SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -34,11 +40,47 @@ def client(db):
             db.close()
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    # Every test signs in from the same address; give each its own buckets
+    rate_limiter = MemoryRateLimitBackend(max_keys=1000)
+    app.dependency_overrides[get_rate_limit_backend] = lambda: rate_limiter
+    # Tokens minted in the same second are identical across tests, so start cold
+    user_cache.clear()
+    idempotency_cache.clear()
+    listings_cache.clear()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_budget():
+    """
+    Assert that a block issues at most `max_queries` SQL statements, e.g.
+
+        with query_budget(2):
+            client.get(...)
+    """
+    @contextmanager
+    def budget(max_queries):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert len(statements) <= max_queries, (
+            f"{len(statements)} queries issued, budget is {max_queries}:\n"
+            + "\n".join(statements)
+        )
+
+    return budget
+
+
 @pytest.fixture
 def sample_user_data():
     """Sample user data for testing"""
@@ -54,4 +96,16 @@ def sample_login_data():
     return {
         "phone_number": "+2348012345678",
         "pin": "1234"
-    }
\ No newline at end of file
+    }
+
+@pytest.fixture
+def sample_listing_data():
+    """Sample listing data for testing"""
+    return {
+        "commodity_name": "Dried Ginger",
+        "quantity_kg": 1000,
+        "price_per_kg_usd": 2.5,
+        "location_lga": "Kachia",
+        "location_state": "Kaduna",
+        "incoterm": "Ex-Works"
+    }
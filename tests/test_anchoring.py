@@ -0,0 +1,119 @@
+import hashlib
+
+import pytest
+from fastapi import status
+from traceapi.core.anchoring import LocalFileChainBackend, get_chain_backend
+from traceapi.crud import crud_anchor, crud_contract, crud_listings, crud_user
+from traceapi.main import app
+from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.user import UserCreate
+from traceapi.utils.merkle import build_levels, inclusion_proof, merkle_root, verify_proof
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return LocalFileChainBackend(tmp_path / "anchors.jsonl")
+
+
+@pytest.fixture
+def signed_contracts(db, sample_listing_data):
+    """Five signed contracts and one still in DRAFT"""
+    seller = crud_user.create_user(db=db, user_in=UserCreate(**SELLER))
+    buyer = crud_user.create_user(db=db, user_in=UserCreate(**BUYER))
+    contracts = []
+    for _ in range(6):
+        listing = crud_listings.create_listing(
+            db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+        )
+        contracts.append(crud_contract.create_contract_from_listing(db=db, listing=listing, buyer=buyer))
+    for contract in contracts[:5]:
+        crud_contract.accept_contract(db=db, contract=contract)
+    return contracts
+
+
+class TestMerkleTree:
+    """Test Merkle roots and inclusion proofs"""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 8, 33])
+    def test_every_leaf_verifies(self, size):
+        """Test each leaf's proof verifies against the root and has at most log2(n) steps"""
+        leaves = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(size)]
+        levels = build_levels(leaves)
+        root = merkle_root(levels)
+
+        for index, leaf in enumerate(leaves):
+            proof = inclusion_proof(levels, index)
+            assert len(proof) <= max(size - 1, 0).bit_length()
+            assert verify_proof(leaf, proof, root)
+
+    def test_tampered_leaf_fails(self):
+        """Test a proof does not verify a different leaf"""
+        leaves = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(4)]
+        levels = build_levels(leaves)
+
+        assert not verify_proof(leaves[1], inclusion_proof(levels, 0), merkle_root(levels))
+
+
+class TestAnchorSignedContracts:
+    """Test batching signed contracts under anchored roots"""
+
+    def test_anchor_in_batches(self, db, signed_contracts, backend):
+        """Test only signed contracts are anchored, one root per batch, each with a verifying proof"""
+        batches = crud_anchor.anchor_all_signed_contracts(db, backend=backend, batch_size=2)
+
+        assert [batch.leaf_count for batch in batches] == [2, 2, 1]
+        anchored = [contract for contract in signed_contracts if contract.anchor_batch_id]
+        assert len(anchored) == 5
+        assert signed_contracts[5].on_chain_id is None
+        for contract in anchored:
+            assert contract.on_chain_id == contract.anchor_batch.on_chain_id
+            assert crud_anchor.verify_contract_anchor(contract, backend=backend)
+
+        # Nothing left to anchor
+        assert crud_anchor.anchor_signed_contracts(db, backend=backend) is None
+
+    def test_backend_survives_restart(self, db, signed_contracts, backend):
+        """Test roots written by the local backend are read back by a fresh instance"""
+        crud_anchor.anchor_all_signed_contracts(db, backend=backend)
+        reopened = LocalFileChainBackend(backend.path)
+
+        assert crud_anchor.verify_contract_anchor(signed_contracts[0], backend=reopened)
+
+    def test_roots_from_another_process_are_seen(self, db, signed_contracts, backend):
+        """Test an instance that has already read the file picks up roots appended by another"""
+        api_backend = LocalFileChainBackend(backend.path)
+        assert api_backend.get_root("local:unknown") is None
+
+        batches = crud_anchor.anchor_all_signed_contracts(db, backend=backend)
+        other = LocalFileChainBackend(backend.path).submit_root(batches[0].merkle_root, leaf_count=1)
+
+        assert crud_anchor.verify_contract_anchor(signed_contracts[0], backend=api_backend)
+        assert other != batches[0].on_chain_id
+        assert api_backend.get_root(other) == batches[0].merkle_root
+
+    def test_proof_endpoint(self, client, db, signed_contracts, backend):
+        """Test a party to the contract can fetch a verifying proof"""
+        contract_id = signed_contracts[0].id
+        crud_anchor.anchor_all_signed_contracts(db, backend=backend)
+        app.dependency_overrides[get_chain_backend] = lambda: backend
+
+        response = client.post("/api/v1/users/login/token", json=BUYER)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = client.get(f"/api/v1/contracts/{contract_id}/proof", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["verified"] is True
+        assert verify_proof(data["contract_hash"], data["proof"], data["merkle_root"])
+
+    def test_proof_endpoint_not_anchored(self, client, signed_contracts):
+        """Test a draft contract has no proof yet"""
+        contract_id = signed_contracts[5].id
+        response = client.post("/api/v1/users/login/token", json=BUYER)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = client.get(f"/api/v1/contracts/{contract_id}/proof", headers=headers)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
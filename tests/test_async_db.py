@@ -0,0 +1,79 @@
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from traceapi.db.session import async_database_url, get_async_db
+from traceapi.main import include_routers
+from traceapi.utils.rate_limit import MemoryRateLimitBackend, get_rate_limit_backend
+from traceapi.utils.user_cache import user_cache
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+@pytest.fixture
+def async_client(db):
+    """A test client for an app serving the async handlers against the test database"""
+    # NullPool: each TestClient runs its own event loop, so connections must not outlive a request
+    engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+    TestingAsyncSession = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with TestingAsyncSession() as session:
+            yield session
+
+    async_app = FastAPI()
+    include_routers(async_app, async_db=True)
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    rate_limiter = MemoryRateLimitBackend(max_keys=1000)
+    async_app.dependency_overrides[get_rate_limit_backend] = lambda: rate_limiter
+    user_cache.clear()
+    with TestClient(async_app) as test_client:
+        yield test_client
+
+
+def register_and_login(client, credentials):
+    response = client.post("/api/v1/users/register", json=credentials)
+    assert response.status_code == status.HTTP_201_CREATED
+    response = client.post("/api/v1/users/login/token", json=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestAsyncHandlers:
+    """Test the async handlers cover the trade flow end to end"""
+
+    def test_async_routes_take_precedence(self, async_client):
+        """Test the async handler is the one matched for a shared path"""
+        routes = [
+            route.endpoint.__name__
+            for route in async_client.app.routes
+            if getattr(route, "path", None) == "/api/v1/listings/" and "GET" in route.methods
+        ]
+        assert routes[0] == "read_active_listings_async"
+
+    def test_trade_flow(self, async_client, sample_listing_data):
+        """Test register, list, browse, offer and accept through the async handlers"""
+        seller_headers = register_and_login(async_client, SELLER)
+        buyer_headers = register_and_login(async_client, BUYER)
+
+        response = async_client.post("/api/v1/listings/", json=sample_listing_data, headers=seller_headers)
+        assert response.status_code == status.HTTP_201_CREATED
+        listing = response.json()
+        assert listing["seller"]["phone_number"] == SELLER["phone_number"]
+
+        response = async_client.get("/api/v1/listings/")
+        assert [item["id"] for item in response.json()] == [listing["id"]]
+
+        response = async_client.post(f"/api/v1/listings/{listing['id']}/make-offer", headers=buyer_headers)
+        assert response.status_code == status.HTTP_200_OK
+        contract = response.json()
+        assert contract["buyer"]["phone_number"] == BUYER["phone_number"]
+
+        response = async_client.post(f"/api/v1/contracts/{contract['id']}/accept", headers=seller_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["status"] == "SIGNED"
+
+        response = async_client.get(f"/api/v1/contracts/{contract['id']}", headers=buyer_headers)
+        assert response.json()["listing"]["seller"]["id"] == listing["seller_id"]
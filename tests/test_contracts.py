@@ -0,0 +1,331 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import status
+from traceapi.core.contract_templates import (
+    CURRENT_TEMPLATE_VERSION,
+    compute_contract_hash,
+    get_template,
+    render_legal_prose,
+)
+from traceapi.core.config import settings
+from traceapi.crud import crud_contract, crud_idempotency, crud_listings, crud_user
+from traceapi.db.models import Contract
+from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.user import UserCreate
+from traceapi.utils.idempotency import idempotency_cache
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+def auth_headers(client, credentials):
+    response = client.post("/api/v1/users/login/token", json=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def seller(db):
+    """A registered seller"""
+    return crud_user.create_user(db=db, user_in=UserCreate(**SELLER))
+
+
+@pytest.fixture
+def buyer(db):
+    """A registered buyer"""
+    return crud_user.create_user(db=db, user_in=UserCreate(**BUYER))
+
+
+@pytest.fixture
+def listing(db, seller, sample_listing_data):
+    """An active listing owned by the seller"""
+    return crud_listings.create_listing(
+        db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+    )
+
+
+@pytest.fixture
+def contract(db, listing, buyer):
+    """A DRAFT contract between the buyer and the seller"""
+    return crud_contract.create_contract_from_listing(db=db, listing=listing, buyer=buyer)
+
+
+class TestMakeOffer:
+    """Test making offers on listings"""
+
+    def test_make_offer_success(self, client, listing, buyer, query_budget):
+        """Test a buyer's offer creates a DRAFT contract with its parties embedded"""
+        buyer_id, seller_id = str(buyer.id), str(listing.seller_id)
+        offer = {"listing_id": str(listing.id), "offered_price_per_kg_usd": 2.4}
+        headers = auth_headers(client, BUYER)
+
+        # auth lookup, listing lookup, insert, reload with relationships
+        with query_budget(4):
+            response = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert data["status"] == "DRAFT"
+        assert data["buyer"]["id"] == buyer_id
+        assert data["listing"]["seller"]["id"] == seller_id
+
+    def test_make_offer_on_own_listing(self, client, listing):
+        """Test a seller cannot make an offer on their own listing"""
+        headers = auth_headers(client, SELLER)
+        offer = {"listing_id": str(listing.id), "offered_price_per_kg_usd": 2.4}
+        response = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_repeat_offer_same_day(self, client, db, listing, buyer):
+        """Test two identical offers on the same day draft two contracts with distinct hashes"""
+        offer = {"listing_id": str(listing.id), "offered_price_per_kg_usd": 2.4}
+        headers = auth_headers(client, BUYER)
+
+        first = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+        second = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+        batch = client.post("/api/v1/contracts/offers/batch", json={"offers": [offer]}, headers=headers)
+
+        assert first.status_code == second.status_code == batch.status_code == status.HTTP_201_CREATED
+        contracts = [first.json(), second.json(), *batch.json()]
+        assert len({contract["contract_hash"] for contract in contracts}) == 3
+        assert [contract["parameters"]["contract_id"] for contract in contracts] == [c["id"] for c in contracts]
+        assert db.query(Contract).count() == 3
+
+
+class TestMakeOffersInBatch:
+    """Test drafting several contracts in one request"""
+
+    def test_batch_offers_success(self, client, db, seller, buyer, sample_listing_data, query_budget):
+        """Test every offer is drafted, in submission order, in a fixed number of queries"""
+        listings = [
+            crud_listings.create_listing(
+                db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+            )
+            for _ in range(5)
+        ]
+        listing_ids = [str(listing.id) for listing in listings]
+        batch = {"offers": [{"listing_id": listing_id, "offered_price_per_kg_usd": 2.4} for listing_id in listing_ids]}
+        headers = auth_headers(client, BUYER)
+
+        # auth lookup, listings lookup, insert, reload with relationships
+        with query_budget(4):
+            response = client.post("/api/v1/contracts/offers/batch", json=batch, headers=headers)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert [contract["listing"]["id"] for contract in data] == listing_ids
+        assert {contract["template_version"] for contract in data} == {CURRENT_TEMPLATE_VERSION}
+
+    def test_batch_offers_all_or_nothing(self, client, db, listing, buyer):
+        """Test a batch with an invalid offer drafts nothing and reports the offer's index"""
+        listing_id = str(listing.id)
+        batch = {"offers": [
+            {"listing_id": listing_id, "offered_price_per_kg_usd": 2.4},
+            {"listing_id": str(uuid.uuid4()), "offered_price_per_kg_usd": 2.4},
+            {"listing_id": listing_id, "offered_price_per_kg_usd": 2.4},
+        ]}
+        response = client.post("/api/v1/contracts/offers/batch", json=batch, headers=auth_headers(client, BUYER))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [error["index"] for error in response.json()["detail"]] == [1, 2]
+        assert db.query(Contract).count() == 0
+
+
+class TestContractTemplates:
+    """Test contract prose templates and hashing"""
+
+    def test_hash_reproducible_from_stored_fields(self, contract):
+        """Test the prose and hash can be rebuilt from the stored parameters, date and template version"""
+        legal_prose = render_legal_prose(
+            contract.parameters,
+            contract_date=contract.created_at.date(),
+            version=contract.template_version,
+        )
+
+        assert legal_prose == contract.legal_prose
+        assert compute_contract_hash(legal_prose, contract.parameters) == contract.contract_hash
+
+    def test_unknown_template_version(self):
+        """Test rendering with an unpublished template version fails loudly"""
+        with pytest.raises(KeyError):
+            get_template("v0")
+
+
+class TestReadContract:
+    """Test reading a contract"""
+
+    def test_read_contract_single_query(self, client, contract, query_budget):
+        """Test a contract and everything it embeds is read in one query after auth"""
+        headers = auth_headers(client, BUYER)
+
+        with query_budget(2):
+            response = client.get(f"/api/v1/contracts/{contract.id}", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["contract_hash"] == contract.contract_hash
+
+    def test_read_contract_fast_json(self, client, contract, monkeypatch):
+        """Test FAST_JSON_RESPONSES renders the same document"""
+        url = f"/api/v1/contracts/{contract.id}"
+        headers = auth_headers(client, BUYER)
+        expected = client.get(url, headers=headers).json()
+
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+        response = client.get(url, headers=headers)
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == expected
+
+    def test_read_contract_sparse_fields(self, client, contract, query_budget):
+        """Test a sparse fieldset skips the legal prose in the query and the response"""
+        url = f"/api/v1/contracts/{contract.id}"
+        headers = auth_headers(client, BUYER)
+
+        with query_budget(2) as statements:
+            response = client.get(url, params={"fields": "status,parameters"}, headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.json()) == {"id", "status", "parameters"}
+        assert "legal_prose" not in statements[-1]
+
+    def test_read_contract_not_a_party(self, client, db, contract):
+        """Test a user who is neither buyer nor seller cannot view the contract"""
+        contract_id = contract.id
+        crud_user.create_user(
+            db=db, user_in=UserCreate(phone_number="+2348099999999", pin="9999")
+        )
+        headers = auth_headers(client, {"phone_number": "+2348099999999", "pin": "9999"})
+        response = client.get(f"/api/v1/contracts/{contract_id}", headers=headers)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestAcceptContract:
+    """Test accepting a contract"""
+
+    def test_accept_contract_success(self, client, contract, query_budget):
+        """Test the seller can sign a DRAFT contract"""
+        headers = auth_headers(client, SELLER)
+
+        # auth lookup, contract lookup, update and outbox insert (one commit), reload with relationships
+        with query_budget(5):
+            response = client.post(f"/api/v1/contracts/{contract.id}/accept", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["status"] == "SIGNED"
+
+    def test_accept_contract_as_buyer(self, client, contract):
+        """Test the buyer cannot accept the contract"""
+        headers = auth_headers(client, BUYER)
+        response = client.post(f"/api/v1/contracts/{contract.id}/accept", headers=headers)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestIdempotencyKey:
+    """Test retries carrying an Idempotency-Key replay the first response"""
+
+    def test_offer_retry_replayed(self, client, db, listing, buyer, query_budget):
+        """Test a retried offer returns the first contract without creating another"""
+        offer = {"listing_id": str(listing.id), "offered_price_per_kg_usd": 2.4}
+        headers = {**auth_headers(client, BUYER), "Idempotency-Key": "offer-1"}
+
+        first = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+        # answered from the in-process cache, the user from the auth cache
+        with query_budget(0):
+            retry = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+
+        assert first.status_code == retry.status_code == status.HTTP_201_CREATED
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert db.query(Contract).count() == 1
+
+    def test_replay_from_database(self, client, db, listing, buyer):
+        """Test the stored response is replayed once the in-process cache is cold"""
+        url = f"/api/v1/listings/{listing.id}/make-offer"
+        headers = {**auth_headers(client, BUYER), "Idempotency-Key": "offer-2"}
+        first = client.post(url, headers=headers)
+        idempotency_cache.clear()
+        retry = client.post(url, headers=headers)
+
+        assert retry.status_code == status.HTTP_200_OK
+        assert retry.json()["id"] == first.json()["id"]
+        assert db.query(Contract).count() == 1
+
+    def test_key_reused_for_different_request(self, client, db, seller, buyer, listing, sample_listing_data):
+        """Test a key cannot be reused with a different body"""
+        other = crud_listings.create_listing(
+            db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+        )
+        first = {"listing_id": str(listing.id), "offered_price_per_kg_usd": 2.4}
+        second = {"listing_id": str(other.id), "offered_price_per_kg_usd": 2.4}
+        headers = {**auth_headers(client, BUYER), "Idempotency-Key": "offer-3"}
+        client.post("/api/v1/contracts/offers", json=first, headers=headers)
+        response = client.post("/api/v1/contracts/offers", json=second, headers=headers)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_accept_retry_replayed(self, client, contract):
+        """Test a retried accept returns the signed contract instead of a 400"""
+        headers = {**auth_headers(client, SELLER), "Idempotency-Key": "accept-1"}
+        first = client.post(f"/api/v1/contracts/{contract.id}/accept", headers=headers)
+        retry = client.post(f"/api/v1/contracts/{contract.id}/accept", headers=headers)
+
+        assert retry.status_code == status.HTTP_200_OK
+        assert retry.json() == first.json()
+        assert retry.json()["status"] == "SIGNED"
+
+    def test_failed_save_leaves_nothing_behind(self, client, db, listing, buyer, monkeypatch):
+        """Test a crash while saving the response rolls back the effect, so the retry runs"""
+        offer = {"listing_id": str(listing.id), "offered_price_per_kg_usd": 2.4}
+        headers = {**auth_headers(client, BUYER), "Idempotency-Key": "offer-4"}
+
+        def crash(*args, **kwargs):
+            raise RuntimeError("connection lost")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(crud_idempotency, "save_idempotent_response", crash)
+            with pytest.raises(RuntimeError):
+                client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+        assert idempotency_cache.get(buyer.id, "offer-4") is None
+
+        retry = client.post("/api/v1/contracts/offers", json=offer, headers=headers)
+
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert "Idempotent-Replayed" not in retry.headers
+        assert db.query(Contract).count() == 1
+
+    def test_purge_expired_keys(self, client, db, listing, buyer):
+        """Test the purge job deletes keys past their TTL only"""
+        url = f"/api/v1/listings/{listing.id}/make-offer"
+        client.post(url, headers={**auth_headers(client, BUYER), "Idempotency-Key": "offer-5"})
+
+        now = datetime.now(timezone.utc)
+        assert crud_idempotency.purge_expired_idempotency_keys(db, before=now - timedelta(hours=1)) == 0
+        assert crud_idempotency.purge_expired_idempotency_keys(db, before=now + timedelta(seconds=1)) == 1
+
+
+class TestExportContracts:
+    """Test streaming export of a user's contracts"""
+
+    def test_export_own_contracts(self, client, db, contract):
+        """Test only contracts the user is a party to are exported"""
+        contract_id = str(contract.id)
+        crud_user.create_user(
+            db=db, user_in=UserCreate(phone_number="+2348099999999", pin="9999")
+        )
+
+        response = client.get("/api/v1/contracts/export", headers=auth_headers(client, BUYER))
+        assert response.status_code == status.HTTP_200_OK
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == [contract_id]
+        assert rows[0]["status"] == "DRAFT"
+
+        headers = auth_headers(client, {"phone_number": "+2348099999999", "pin": "9999"})
+        response = client.get("/api/v1/contracts/export", params={"format": "csv"}, headers=headers)
+        assert response.text.splitlines() == [
+            "id,status,listing_id,seller_id,buyer_id,parameters,contract_hash,on_chain_id"
+        ]
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi import status
+from traceapi.core.integrity import audit_contract_hashes, load_checkpoint
+from traceapi.crud import crud_contract, crud_listings, crud_user
+from traceapi.db.models import Contract
+from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.user import UserCreate
+
+from tests.conftest import TestingSessionLocal
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+@pytest.fixture
+def contracts(db, sample_listing_data):
+    """Five contracts between the same seller and buyer"""
+    seller = crud_user.create_user(db=db, user_in=UserCreate(**SELLER))
+    buyer = crud_user.create_user(db=db, user_in=UserCreate(**BUYER))
+    listings = [
+        crud_listings.create_listing(db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id)
+        for _ in range(5)
+    ]
+    return crud_contract.create_contracts_from_listings(db, listings=listings, buyer=buyer)
+
+
+@pytest.fixture
+def tampered_id(db, contracts):
+    """The ID of a contract whose prose was edited after drafting"""
+    contract = sorted(contracts, key=lambda contract: contract.id)[3]
+    contract.legal_prose += " Amended."
+    db.commit()
+    return str(contract.id)
+
+
+class TestAuditContractHashes:
+    """Test the chunked, resumable integrity audit"""
+
+    def test_reports_mismatches(self, tampered_id):
+        """Test every contract is checked across chunks and the tampered one is reported"""
+        mismatches = []
+        totals = audit_contract_hashes(TestingSessionLocal, chunk_size=2, on_mismatches=mismatches.extend)
+
+        assert totals["checked"] == 5
+        assert totals["mismatches"] == 1
+        assert [mismatch["contract_id"] for mismatch in mismatches] == [tampered_id]
+
+    def test_worker_pool(self, tampered_id):
+        """Test hashing in worker processes gives the same result"""
+        mismatches = []
+        totals = audit_contract_hashes(TestingSessionLocal, chunk_size=2, workers=1, on_mismatches=mismatches.extend)
+
+        assert totals["checked"] == 5
+        assert [mismatch["contract_id"] for mismatch in mismatches] == [tampered_id]
+
+    def test_resumes_from_checkpoint(self, db, contracts, tmp_path):
+        """Test a rerun picks up after the last checkpointed contract"""
+        checkpoint_path = tmp_path / "audit.json"
+        ids = sorted(str(contract.id) for contract in contracts)
+        checkpoint_path.write_text(json.dumps({"last_id": ids[1], "checked": 2, "mismatches": 0}))
+
+        totals = audit_contract_hashes(TestingSessionLocal, chunk_size=2, checkpoint_path=checkpoint_path)
+
+        assert totals["checked"] == 5
+        assert load_checkpoint(checkpoint_path)["last_id"] == ids[-1]
+        # Nothing left after a completed run
+        assert audit_contract_hashes(TestingSessionLocal, checkpoint_path=checkpoint_path)["checked"] == 5
+
+
+class TestVerifyEndpoint:
+    """Test verifying the current user's contracts"""
+
+    def test_verify_my_contracts(self, client, db, tampered_id):
+        response = client.post("/api/v1/users/login/token", json=BUYER)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = client.get("/api/v1/contracts/verify", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["checked"] == db.query(Contract).count()
+        assert [mismatch["contract_id"] for mismatch in data["mismatches"]] == [tampered_id]
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy.pool import NullPool
+from traceapi.core.config import settings
+from traceapi.db.session import engine_options
+
+import lambda_handler
+
+
+class TestWarmupEvents:
+    """Test scheduled warm-up pings are answered without the ASGI app"""
+
+    @pytest.mark.parametrize("event", [
+        {"source": "aws.events", "detail-type": "Scheduled Event"},
+        {"source": "serverless-plugin-warmup"},
+        {"warmup": True},
+    ])
+    def test_warmup_short_circuits(self, event, monkeypatch):
+        """Test warm-up events never reach Mangum"""
+        def fail(*args):
+            raise AssertionError("ASGI handler should not run for warm-up events")
+
+        monkeypatch.setattr(lambda_handler, "asgi_handler", fail)
+
+        assert lambda_handler.handler(event, None) == {"warmed": True}
+
+    def test_http_event_reaches_app(self):
+        """Test an API Gateway request is served by the app"""
+        event = {
+            "version": "2.0",
+            "routeKey": "GET /",
+            "rawPath": "/",
+            "rawQueryString": "",
+            "headers": {"host": "api.example.com"},
+            "requestContext": {
+                "http": {"method": "GET", "path": "/", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+                "stage": "$default",
+            },
+            "isBase64Encoded": False,
+        }
+
+        response = lambda_handler.handler(event, None)
+
+        assert response["statusCode"] == 200
+
+
+class TestLambdaPooling:
+    """Test connection pool settings per execution mode"""
+
+    def test_lambda_uses_single_connection(self, monkeypatch):
+        """Test a Lambda container keeps at most one reused connection"""
+        monkeypatch.setattr(settings, "LAMBDA_MODE", True)
+        monkeypatch.setattr(settings, "DB_BEHIND_PROXY", False)
+
+        options = engine_options()
+
+        assert options["pool_size"] == 1
+        assert options["max_overflow"] == 0
+
+    def test_lambda_behind_proxy_holds_no_connection(self, monkeypatch):
+        """Test RDS Proxy mode disables client-side pooling"""
+        monkeypatch.setattr(settings, "LAMBDA_MODE", True)
+        monkeypatch.setattr(settings, "DB_BEHIND_PROXY", True)
+
+        assert engine_options()["poolclass"] is NullPool
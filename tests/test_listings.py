@@ -0,0 +1,411 @@
+import csv
+import io
+import json
+import uuid
+
+import pytest
+from benchmarks.seed import AS_OF, seed_marketplace
+from fastapi import status
+from sqlalchemy import event
+from traceapi.core.config import settings
+from traceapi.crud import crud_listings, crud_user
+from traceapi.schemas.listing import ListingCreate, ListingFilters
+from traceapi.schemas.user import UserCreate
+from tests.conftest import engine
+
+
+@pytest.fixture
+def seller(db, sample_user_data):
+    """A registered seller"""
+    return crud_user.create_user(db=db, user_in=UserCreate(**sample_user_data))
+
+
+def create_listings(db, seller, sample_listing_data, count):
+    return [
+        crud_listings.create_listing(
+            db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+        )
+        for _ in range(count)
+    ]
+
+
+class TestListingPagination:
+    """Test keyset pagination of the public listings endpoint"""
+
+    def test_cursor_walks_all_listings_once(self, client, db, seller, sample_listing_data):
+        """Test following X-Next-Cursor visits every listing exactly once, newest first"""
+        created = create_listings(db, seller, sample_listing_data, 5)
+        expected = [str(listing.id) for listing in reversed(created)]
+
+        seen = []
+        response = client.get("/api/v1/listings/", params={"limit": 2})
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(item["id"] for item in response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            response = client.get("/api/v1/listings/", params={"limit": 2, "cursor": next_cursor})
+
+        assert seen == expected
+
+    def test_last_page_has_no_cursor(self, client, db, seller, sample_listing_data):
+        """Test a partial page does not advertise a next cursor"""
+        create_listings(db, seller, sample_listing_data, 1)
+        response = client.get("/api/v1/listings/", params={"limit": 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 1
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected"""
+        response = client.get("/api/v1/listings/", params={"cursor": "not-a-cursor"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestListingQueryBudget:
+    """Test the listings page loads sellers without N+1 queries"""
+
+    def test_listings_page_single_query(self, client, db, sample_listing_data, query_budget):
+        """Test a page of listings from different sellers is fetched in one query"""
+        for phone_number in ("+2348011111111", "+2348022222222", "+2348033333333"):
+            other_seller = crud_user.create_user(
+                db=db, user_in=UserCreate(phone_number=phone_number, pin="1234")
+            )
+            create_listings(db, other_seller, sample_listing_data, 1)
+
+        with query_budget(1):
+            response = client.get("/api/v1/listings/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len({item["seller"]["id"] for item in response.json()}) == 3
+
+
+@pytest.fixture
+def query_plans():
+    """SQLite's EXPLAIN QUERY PLAN details for every SELECT issued, in order"""
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT"):
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append(" / ".join(row[3] for row in cursor.fetchall()))
+
+    event.listen(engine, "before_cursor_execute", explain)
+    yield plans
+    event.remove(engine, "before_cursor_execute", explain)
+
+
+class TestListingQueryPlans:
+    """Test listing pages and search use their indexes on seeded data"""
+
+    @pytest.fixture
+    def marketplace(self, db):
+        seed_marketplace(engine, users=20, listings=300)
+
+    def test_keyset_page_seeks_index(self, db, marketplace, query_plans):
+        """Test first and later pages are read from ix_listings_active_created_id"""
+        crud_listings.get_listings(db, limit=20)
+        crud_listings.get_listings(db, limit=20, after=(AS_OF, uuid.uuid4()))
+
+        assert "USING INDEX ix_listings_active_created_id (is_active=?)" in query_plans[0]
+        assert "USING INDEX ix_listings_active_created_id (is_active=? AND (created_at,id)<(?,?))" in query_plans[1]
+        assert "TEMP B-TREE" not in query_plans[0] + query_plans[1]
+
+    def test_search_newest_uses_index(self, db, marketplace, query_plans):
+        """Test the default newest-first search page is read in index order"""
+        results = crud_listings.search_listings(db, filters=ListingFilters())
+
+        assert len(results["items"]) == 20
+        assert "USING INDEX ix_listings_active_created_id" in query_plans[0]
+        assert "TEMP B-TREE" not in query_plans[0]
+
+
+class TestListingResponseCache:
+    """Test conditional GETs and the in-process cache of public listing pages"""
+
+    @pytest.fixture
+    def headers(self, client, seller, sample_user_data):
+        response = client.post("/api/v1/users/login/token", json=sample_user_data)
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def test_repeat_page_served_from_cache(self, client, db, seller, sample_listing_data, query_budget):
+        """Test a repeated page is served without a query, with CDN headers"""
+        create_listings(db, seller, sample_listing_data, 2)
+        first = client.get("/api/v1/listings/", params={"limit": 10})
+
+        with query_budget(0):
+            second = client.get("/api/v1/listings/", params={"limit": 10})
+
+        assert second.json() == first.json()
+        assert second.headers["ETag"] == first.headers["ETag"]
+        assert second.headers["Cache-Control"] == settings.LISTINGS_CACHE_CONTROL
+        assert "Last-Modified" in second.headers
+
+    def test_conditional_get_not_modified(self, client, db, seller, sample_listing_data):
+        """Test If-None-Match and If-Modified-Since are answered with a 304"""
+        create_listings(db, seller, sample_listing_data, 1)
+        first = client.get("/api/v1/listings/")
+
+        response = client.get("/api/v1/listings/", headers={"If-None-Match": first.headers["ETag"]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["ETag"] == first.headers["ETag"]
+
+        response = client.get("/api/v1/listings/", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = client.get("/api/v1/listings/", headers={"If-None-Match": 'W/"stale"'})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_create_invalidates(self, client, headers, sample_listing_data):
+        """Test a new listing shows up immediately and changes the ETag"""
+        first = client.get("/api/v1/listings/")
+        client.post("/api/v1/listings/", json=sample_listing_data, headers=headers)
+        second = client.get("/api/v1/listings/")
+
+        assert len(second.json()) == len(first.json()) + 1
+        assert second.headers["ETag"] != first.headers["ETag"]
+
+    def test_deactivate_invalidates(self, client, db, seller, headers, sample_listing_data):
+        """Test a deactivated listing drops out of cached pages and search"""
+        listing_id = str(create_listings(db, seller, sample_listing_data, 1)[0].id)
+        assert len(client.get("/api/v1/listings/").json()) == 1
+        assert client.get("/api/v1/listings/search").json()["total"] == 1
+
+        response = client.delete(f"/api/v1/listings/{listing_id}", headers=headers)
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert client.get("/api/v1/listings/").json() == []
+        assert client.get("/api/v1/listings/search").json()["total"] == 0
+
+    def test_modified_since_after_change_in_same_second(self, client, headers, sample_listing_data):
+        """Test a page changed within the second of an earlier render is not a 304 for its Last-Modified"""
+        first = client.get("/api/v1/listings/")
+        client.post("/api/v1/listings/", json=sample_listing_data, headers=headers)
+
+        response = client.get("/api/v1/listings/", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 1
+        assert response.headers["Last-Modified"] != first.headers["Last-Modified"]
+
+    def test_deactivate_seller_invalidates(self, client, db, seller, sample_listing_data):
+        """Test deactivating a seller drops the cached pages that embed them"""
+        create_listings(db, seller, sample_listing_data, 1)
+        first = client.get("/api/v1/listings/")
+
+        crud_user.deactivate_user(db=db, user=seller)
+        response = client.get("/api/v1/listings/", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_deactivate_other_sellers_listing(self, client, db, seller, sample_listing_data):
+        """Test only the seller can deactivate a listing"""
+        listing_id = str(create_listings(db, seller, sample_listing_data, 1)[0].id)
+        crud_user.create_user(db=db, user_in=UserCreate(phone_number="+2348099999999", pin="9999"))
+        response = client.post("/api/v1/users/login/token", json={"phone_number": "+2348099999999", "pin": "9999"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = client.delete(f"/api/v1/listings/{listing_id}", headers=headers)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestSparseFieldsets:
+    """Test `fields=` projection and response compression"""
+
+    def test_sparse_fields_projected_in_sql(self, client, db, seller, sample_listing_data, query_budget):
+        """Test only the requested columns are selected and returned"""
+        create_listings(db, seller, sample_listing_data, 2)
+        params = {"fields": "commodity_name,price_per_kg_usd,quantity_kg,location_state"}
+
+        with query_budget(1) as statements:
+            response = client.get("/api/v1/listings/", params=params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.json()[0]) == {"id", "commodity_name", "price_per_kg_usd", "quantity_kg", "location_state"}
+        assert "notes" not in statements[0]
+        assert "users" not in statements[0]
+
+    def test_sparse_fields_with_seller(self, client, db, seller, sample_listing_data):
+        """Test asking for the seller still joins it in"""
+        create_listings(db, seller, sample_listing_data, 1)
+        response = client.get("/api/v1/listings/", params={"fields": "seller"})
+
+        assert response.json()[0]["seller"]["id"] == str(seller.id)
+
+    def test_unknown_field(self, client):
+        """Test unknown field names are rejected"""
+        response = client.get("/api/v1/listings/", params={"fields": "commodity_name,hashed_pin"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_large_responses_gzipped(self, client, db, seller, sample_listing_data):
+        """Test a full page is compressed while a tiny one is not"""
+        create_listings(db, seller, sample_listing_data, 20)
+
+        response = client.get("/api/v1/listings/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert len(response.json()) == 20
+
+        response = client.get("/api/v1/listings/", params={"fields": "id", "limit": 1}, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+
+class TestListingSearch:
+    """Test the faceted listing search endpoint"""
+
+    @pytest.fixture
+    def catalogue(self, db, seller, sample_listing_data):
+        """Listings across commodities, states and prices"""
+        rows = [
+            ("Dried Ginger", "Kaduna", "Kachia", 2.5),
+            ("Dried Ginger", "Kaduna", "Jaba", 3.0),
+            ("Ginger Powder", "Kaduna", "Kachia", 6.0),
+            ("Dried Ginger", "Nasarawa", "Akwanga", 2.0),
+            ("Sesame Seeds", "Jigawa", "Hadejia", 1.8),
+        ]
+        for commodity, state, lga, price in rows:
+            data = dict(sample_listing_data, commodity_name=commodity, location_state=state,
+                        location_lga=lga, price_per_kg_usd=price)
+            crud_listings.create_listing(db=db, listing_in=ListingCreate(**data), seller_id=seller.id)
+
+    def test_search_by_commodity_prefix(self, client, catalogue):
+        """Test commodity matching is a case-insensitive prefix match"""
+        response = client.get("/api/v1/listings/search", params={"commodity": "dried"})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"] == 3
+        assert {item["commodity_name"] for item in data["items"]} == {"Dried Ginger"}
+
+    def test_search_filters_and_sort(self, client, catalogue):
+        """Test region and price filters combine with price ordering"""
+        params = {"state": "Kaduna", "max_price": 5, "sort": "price_desc"}
+        response = client.get("/api/v1/listings/search", params=params)
+
+        data = response.json()
+        assert [item["price_per_kg_usd"] for item in data["items"]] == [3.0, 2.5]
+
+    def test_search_facets_ignore_own_filter(self, client, catalogue):
+        """Test the state facet counts other states while a state filter is applied"""
+        params = {"commodity": "Dried", "state": "Kaduna"}
+        response = client.get("/api/v1/listings/search", params=params)
+
+        facets = response.json()["facets"]
+        assert facets["state"] == [
+            {"value": "Kaduna", "count": 2},
+            {"value": "Nasarawa", "count": 1},
+        ]
+        assert facets["commodity"] == [
+            {"value": "Dried Ginger", "count": 2},
+            {"value": "Ginger Powder", "count": 1},
+        ]
+
+    def test_search_fuzzy_commodity(self, client, catalogue):
+        """Test fuzzy matching finds commodities containing the term"""
+        response = client.get("/api/v1/listings/search", params={"commodity": "ginger", "fuzzy": True})
+
+        assert response.json()["total"] == 4
+
+
+class TestBulkListingCreation:
+    """Test creating listings in bulk"""
+
+    @pytest.fixture
+    def headers(self, client, seller, sample_user_data):
+        response = client.post("/api/v1/users/login/token", json=sample_user_data)
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def test_bulk_json_array(self, client, headers, sample_listing_data, query_budget):
+        """Test valid items are inserted in one statement and invalid ones reported"""
+        items = [dict(sample_listing_data, quantity_kg=100 + i) for i in range(50)]
+        items.insert(3, dict(sample_listing_data, price_per_kg_usd=-1))
+
+        with query_budget(2):
+            response = client.post("/api/v1/listings/bulk", json=items, headers=headers)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert len(data["created"]) == 50
+        assert [error["index"] for error in data["errors"]] == [3]
+        assert data["errors"][0]["errors"][0]["loc"] == ["price_per_kg_usd"]
+
+        response = client.get("/api/v1/listings/", params={"limit": 100})
+        assert len(response.json()) == 50
+
+    def test_bulk_ndjson(self, client, headers, sample_listing_data):
+        """Test NDJSON bodies are accepted line by line"""
+        body = "\n".join([json.dumps(sample_listing_data), "{not json", "null", json.dumps(sample_listing_data)])
+        response = client.post(
+            "/api/v1/listings/bulk",
+            content=body,
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert len(data["created"]) == 2
+        assert data["errors"][0] == {"index": 1, "errors": [{"msg": "Invalid JSON"}]}
+        assert data["errors"][1]["index"] == 2
+        assert data["errors"][1]["errors"][0]["type"] == "model_type"
+
+    def test_bulk_all_invalid(self, client, headers):
+        """Test a batch with no valid items is rejected"""
+        response = client.post("/api/v1/listings/bulk", json=[{"commodity_name": "Maize"}], headers=headers)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert response.json()["created"] == []
+
+    def test_bulk_too_many_items(self, client, headers, sample_listing_data, monkeypatch):
+        """Test batches over the configured limit are rejected"""
+        monkeypatch.setattr(settings, "LISTINGS_BULK_MAX_ITEMS", 2)
+        response = client.post("/api/v1/listings/bulk", json=[sample_listing_data] * 3, headers=headers)
+
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    def test_bulk_body_too_large(self, client, headers, monkeypatch):
+        """Test oversized bodies are refused by Content-Length, or while streaming without one"""
+        monkeypatch.setattr(settings, "LISTINGS_BULK_MAX_ITEMS", 2)
+        monkeypatch.setattr(settings, "LISTINGS_BULK_MAX_ITEM_BYTES", 100)
+        body = b"[" + b" " * 300 + b"]"
+
+        response = client.post("/api/v1/listings/bulk", content=body, headers=headers)
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+        response = client.post("/api/v1/listings/bulk", content=iter([body[:150], body[150:]]), headers=headers)
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+class TestListingExport:
+    """Test streaming export of active listings"""
+
+    def test_export_ndjson_applies_filters(self, client, db, seller, sample_listing_data, monkeypatch):
+        """Test every matching listing is streamed, across several fetch batches"""
+        monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+        create_listings(db, seller, sample_listing_data, 5)
+        create_listings(db, seller, dict(sample_listing_data, commodity_name="Sesame Seeds"), 2)
+
+        response = client.get("/api/v1/listings/export", params={"commodity": "dried"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == 5
+        assert {row["commodity_name"] for row in rows} == {sample_listing_data["commodity_name"]}
+        assert rows[0]["incoterm"] == sample_listing_data["incoterm"]
+
+    def test_export_csv(self, client, db, seller, sample_listing_data):
+        """Test CSV export writes a header row and one row per listing"""
+        create_listings(db, seller, sample_listing_data, 3)
+
+        response = client.get("/api/v1/listings/export", params={"format": "csv"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 3
+        assert rows[0]["seller_id"] == str(seller.id)
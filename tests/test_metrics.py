@@ -0,0 +1,145 @@
+import json
+import logging
+import re
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, event
+from traceapi.core import metrics
+from traceapi.core.config import settings
+from traceapi.crud import crud_user
+from traceapi.db import instrumentation
+from traceapi.db.session import TimedQueuePool
+from traceapi.schemas.user import UserCreate
+from tests.conftest import engine
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestRequestMetrics:
+    """Test per-route latency and status metrics"""
+
+    def test_records_route_template(self, client, db):
+        """Test requests are labelled by route template, not by path"""
+        route = "/api/v1/contracts/{contract_id}"
+        before = sample("trace_http_request_duration_seconds_count", method="GET", route=route)
+
+        client.get("/api/v1/contracts/00000000-0000-0000-0000-000000000000")
+        client.get("/api/v1/contracts/11111111-1111-1111-1111-111111111111")
+
+        assert sample("trace_http_request_duration_seconds_count", method="GET", route=route) == before + 2
+        assert sample("trace_http_requests_total", method="GET", route=route, status="403") >= 2
+
+    def test_unmatched_paths_share_a_label(self, client):
+        """Test unknown paths do not create a series each"""
+        before = sample("trace_http_requests_total", method="GET", route="unmatched", status="404")
+
+        client.get("/no/such/path")
+
+        assert sample("trace_http_requests_total", method="GET", route="unmatched", status="404") == before + 1
+
+    def test_metrics_endpoint(self, client, sample_user_data):
+        """Test /metrics serves the request, bcrypt and JWT timings"""
+        client.post("/api/v1/users/register", json=sample_user_data)
+        token = client.post("/api/v1/users/login/token", json=sample_user_data).json()["access_token"]
+        client.get("/api/v1/users/profile", headers={"Authorization": f"Bearer {token}"})
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'trace_http_request_duration_seconds_bucket{le="0.005",method="POST",route="/api/v1/users/register"}' in body
+        assert 'trace_pin_hash_seconds_count{operation="hash"}' in body
+        assert 'trace_pin_hash_seconds_count{operation="verify"}' in body
+        assert "trace_jwt_decode_seconds_count" in body
+
+    def test_emf_log_line(self, client, capsys, monkeypatch):
+        """Test Lambda mode writes a CloudWatch EMF line per request"""
+        monkeypatch.setattr(settings, "METRICS_EMF_LOGS", True)
+
+        client.get("/")
+
+        record = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+        assert record["Route"] == "GET /"
+        assert record["StatusCode"] == 200
+        assert record["ServerErrors"] == 0
+        assert record["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Route"]]
+
+
+class TestPoolMetrics:
+    """Test connection pool gauges and checkout timing"""
+
+    def test_pool_gauges_and_wait(self, tmp_path):
+        """Test checked-out connections and checkout waits are reported"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2)
+        metrics.track_pool("test", engine)
+        waits = sample("trace_db_pool_wait_seconds_count", pool="sync")
+        try:
+            with engine.connect(), engine.connect():
+                assert sample("trace_db_pool_checked_out", pool="test") == 2
+                assert sample("trace_db_pool_size", pool="test") == 2
+            assert sample("trace_db_pool_checked_out", pool="test") == 0
+            assert sample("trace_db_pool_wait_seconds_count", pool="sync") == waits + 2
+        finally:
+            metrics.pool_collector.engines.pop("test")
+            engine.dispose()
+
+
+@pytest.fixture
+def instrumented():
+    """Statement timing on the test engine, as get_engine() sets it up"""
+    instrumentation.instrument_engine(engine)
+    yield
+    event.remove(engine, "before_cursor_execute", instrumentation.before_cursor_execute)
+    event.remove(engine, "after_cursor_execute", instrumentation.after_cursor_execute)
+
+
+class TestQueryStats:
+    """Test per-statement timing and per-request query counts"""
+
+    def test_server_timing_header(self, client, instrumented, monkeypatch):
+        """Test the request's query count and time are sent when enabled"""
+        monkeypatch.setattr(settings, "SERVER_TIMING_HEADER", True)
+
+        response = client.get("/api/v1/listings/search", params={"commodity": "ginger"})
+
+        match = re.fullmatch(r'db;dur=[0-9.]+;desc="(\d+) queries"', response.headers["server-timing"])
+        assert match and int(match.group(1)) >= 1
+
+    def test_no_header_by_default(self, client, instrumented):
+        """Test production responses do not reveal database work"""
+        response = client.get("/api/v1/listings/search", params={"commodity": "ginger"})
+
+        assert "server-timing" not in response.headers
+
+    def test_request_query_histogram(self, client, instrumented):
+        """Test statements are counted per route"""
+        route = "/api/v1/listings/search"
+        before = sample("trace_http_request_queries_sum", method="GET", route=route)
+
+        client.get(route, params={"commodity": "ginger"})
+
+        assert sample("trace_http_request_queries_sum", method="GET", route=route) >= before + 1
+        assert sample("trace_db_statement_seconds_count", operation="SELECT") > 0
+
+    def test_slow_query_log(self, db, instrumented, monkeypatch, caplog, sample_user_data):
+        """Test slow statements are logged with their caller and parameter types, not values"""
+        crud_user.create_user(db=db, user_in=UserCreate(**sample_user_data))
+        monkeypatch.setattr(settings, "SLOW_QUERY_SECONDS", 0)
+
+        with caplog.at_level(logging.WARNING, logger=instrumentation.__name__):
+            crud_user.get_user_by_phone(db, phone_number=sample_user_data["phone_number"])
+
+        message = caplog.records[-1].getMessage()
+        assert "in traceapi.crud.crud_user.get_user_by_phone" in message
+        assert "'str'" in message
+        assert sample_user_data["phone_number"] not in message
+
+    def test_parameter_shape(self):
+        """Test parameter shapes for single and executemany statements"""
+        assert instrumentation.parameter_shape({"id": 1, "name": "x"}) == {"id": "int", "name": "str"}
+        assert instrumentation.parameter_shape((1, None)) == ["int", "NoneType"]
+        assert instrumentation.parameter_shape([{"id": 1}, {"id": 2}], executemany=True) == "2 x {'id': 'int'}"
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import status
+from traceapi.core.config import settings
+from traceapi.core.outbox import OUTBOX_HANDLERS, OutboxDispatcher, dispatch_outbox_batch, load_outbox_handlers
+from traceapi.crud import crud_contract, crud_listings, crud_user
+from traceapi.crud.crud_outbox import CONTRACT_SIGNED
+from traceapi.db.models import OutboxEvent, utcnow
+from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.user import UserCreate
+
+from tests.conftest import TestingSessionLocal
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+@pytest.fixture(autouse=True)
+def registered_handlers():
+    """Register the real handlers first, so tests can swap them out"""
+    load_outbox_handlers()
+
+
+@pytest.fixture
+def contract(db, sample_listing_data):
+    """A DRAFT contract between the buyer and the seller"""
+    seller = crud_user.create_user(db=db, user_in=UserCreate(**SELLER))
+    buyer = crud_user.create_user(db=db, user_in=UserCreate(**BUYER))
+    listing = crud_listings.create_listing(
+        db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+    )
+    return crud_contract.create_contract_from_listing(db=db, listing=listing, buyer=buyer)
+
+
+@pytest.fixture
+def delivered(monkeypatch):
+    """Records payloads delivered to a contract.signed handler"""
+    payloads = []
+    monkeypatch.setitem(OUTBOX_HANDLERS, CONTRACT_SIGNED, [lambda db, payload: payloads.append(payload)])
+    return payloads
+
+
+class TestOutboxWrite:
+    """Test events are staged with the change that causes them"""
+
+    def test_accept_writes_event(self, client, db, contract):
+        """Test accepting a contract stages one contract.signed event"""
+        contract_id = contract.id
+        response = client.post("/api/v1/users/login/token", json=SELLER)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = client.post(f"/api/v1/contracts/{contract_id}/accept", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+
+        event = db.query(OutboxEvent).one()
+        assert event.event_type == CONTRACT_SIGNED
+        assert event.aggregate_id == contract_id
+        assert event.payload["contract_hash"] == response.json()["contract_hash"]
+        assert event.dispatched_at is None
+
+
+class TestOutboxDispatch:
+    """Test delivering staged events"""
+
+    def test_dispatch_delivers_once(self, db, contract, delivered):
+        """Test due events reach their handler and are not delivered again"""
+        crud_contract.accept_contract(db=db, contract=contract)
+
+        assert OutboxDispatcher(TestingSessionLocal).run_once() == 1
+        assert [payload["contract_id"] for payload in delivered] == [str(contract.id)]
+        assert db.query(OutboxEvent).one().dispatched_at is not None
+        assert dispatch_outbox_batch(db) == 0
+
+    def test_failed_event_backs_off(self, db, contract, monkeypatch):
+        """Test a failing handler leaves the event for a later retry"""
+        def fail(db, payload):
+            raise RuntimeError("payments unavailable")
+        monkeypatch.setitem(OUTBOX_HANDLERS, CONTRACT_SIGNED, [fail])
+        crud_contract.accept_contract(db=db, contract=contract)
+
+        assert dispatch_outbox_batch(db) == 1
+        event = db.query(OutboxEvent).one()
+        assert event.attempts == 1
+        assert "payments unavailable" in event.last_error
+        assert event.failed_at is None
+        # Not due again until the backoff has passed
+        assert dispatch_outbox_batch(db) == 0
+        retry_at = utcnow() + timedelta(seconds=settings.OUTBOX_RETRY_MAX_SECONDS + 1)
+        assert dispatch_outbox_batch(db, now=retry_at) == 1
+
+    def test_failed_event_gives_up(self, db, contract, monkeypatch):
+        """Test an event is marked failed once its attempts are exhausted"""
+        def fail(db, payload):
+            raise RuntimeError("payments unavailable")
+        monkeypatch.setitem(OUTBOX_HANDLERS, CONTRACT_SIGNED, [fail])
+        monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 1)
+        crud_contract.accept_contract(db=db, contract=contract)
+
+        dispatch_outbox_batch(db)
+        event = db.query(OutboxEvent).one()
+        assert event.failed_at is not None
+        assert dispatch_outbox_batch(db, now=utcnow() + timedelta(days=1)) == 0
@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import func
+from traceapi.crud import crud_contract, crud_listings, crud_user, crud_wallet
+from traceapi.crud.crud_settlement import settle_contracts, settle_contracts_chunk
+from traceapi.db.models import Transaction
+from traceapi.schemas.contract import ContractStatus
+from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.user import UserCreate
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+@pytest.fixture
+def parties(db):
+    seller = crud_user.create_user(db=db, user_in=UserCreate(**SELLER))
+    buyer = crud_user.create_user(db=db, user_in=UserCreate(**BUYER))
+    buyer_wallet = crud_wallet.get_or_create_user_wallet(db, owner_id=buyer.id)
+    crud_wallet.deposit(db, wallet_id=buyer_wallet.id, amount_usd_cents=100_000, reference="deposit-1")
+    return seller, buyer, buyer_wallet.id
+
+
+@pytest.fixture
+def escrowed_contracts(db, parties, sample_listing_data):
+    """Six signed contracts worth $10 each, with escrow funded"""
+    seller, buyer, _ = parties
+    listing_data = dict(sample_listing_data, quantity_kg=4, price_per_kg_usd=2.5)
+    listings = [
+        crud_listings.create_listing(db=db, listing_in=ListingCreate(**listing_data), seller_id=seller.id)
+        for _ in range(6)
+    ]
+    contracts = crud_contract.create_contracts_from_listings(db, listings=listings, buyer=buyer)
+    for contract in contracts:
+        crud_contract.accept_contract(db=db, contract=contract)
+        crud_wallet.fund_escrow(db, crud_contract.contract_signed_payload(contract))
+        db.commit()
+    return contracts
+
+
+def set_status(db, contracts, status):
+    for contract in contracts:
+        contract.status = status
+    db.commit()
+
+
+class TestSettlement:
+    """Test batch release and refund of escrow"""
+
+    def test_release_and_refund(self, db, parties, escrowed_contracts):
+        """Test completed contracts pay the seller, cancelled ones refund the buyer, others wait"""
+        seller, _, buyer_wallet_id = parties
+        set_status(db, escrowed_contracts[:3], ContractStatus.COMPLETED)
+        set_status(db, escrowed_contracts[3:5], ContractStatus.CANCELLED)
+
+        totals = settle_contracts(db, chunk_size=2)
+
+        assert totals["released"] == 3
+        assert totals["refunded"] == 2
+        seller_wallet = crud_wallet.get_wallet_by_owner(db, owner_id=seller.id)
+        assert seller_wallet.balance_usd_cents == 3_000
+        assert crud_wallet.get_wallet_balance(db, wallet_id=buyer_wallet_id) == 100_000 - 6_000 + 2_000
+        # The still-signed contract keeps its escrow
+        assert crud_wallet.get_wallet_balance(db, wallet_id=crud_wallet.ESCROW_WALLET_ID) == 1_000
+        assert db.query(func.sum(Transaction.amount_usd_cents)).scalar() == 0
+
+    def test_balances_netted_per_wallet(self, db, escrowed_contracts, query_budget):
+        """Test a chunk updates each wallet once, however many of its contracts it holds"""
+        set_status(db, escrowed_contracts, ContractStatus.COMPLETED)
+
+        # contracts, escrow amounts, wallets, escrow update, seller insert + update, entries, settled_at
+        with query_budget(8):
+            counts = settle_contracts_chunk(db, chunk_size=100)
+
+        assert counts["released"] == 6
+        assert db.query(Transaction).filter(Transaction.reference.like("settle:%")).count() == 12
+
+    def test_rerun_is_idempotent(self, db, parties, escrowed_contracts):
+        """Test settled contracts are not paid twice"""
+        seller, _, _ = parties
+        set_status(db, escrowed_contracts, ContractStatus.COMPLETED)
+        settle_contracts(db)
+
+        assert settle_contracts(db)["released"] == 0
+        assert crud_wallet.get_wallet_by_owner(db, owner_id=seller.id).balance_usd_cents == 6_000
+
+    def test_unfunded_completed_contract_waits(self, db, parties, sample_listing_data):
+        """Test a completed contract whose escrow is not funded yet is left for a later run"""
+        seller, buyer, _ = parties
+        listing = crud_listings.create_listing(
+            db=db, listing_in=ListingCreate(**sample_listing_data), seller_id=seller.id
+        )
+        contract = crud_contract.create_contract_from_listing(db=db, listing=listing, buyer=buyer)
+        set_status(db, [contract], ContractStatus.COMPLETED)
+
+        totals = settle_contracts(db)
+
+        assert totals["unfunded"] == 1
+        assert contract.settled_at is None
@@ -1,8 +1,25 @@
+import asyncio
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
 import pytest
 import uuid
 from fastapi import status
+from pydantic import ValidationError
+from traceapi.core.config import Settings, settings
+from traceapi.core.security import PinHasher, PinHasherBusy, pin_hasher
 from traceapi.crud import crud_user
-from traceapi.schemas.user import UserCreate
+from traceapi.schemas.user import UserCreate, UserTier
+from traceapi.utils import rate_limit
+from traceapi.utils.rate_limit import LocalBucketStore, MemoryRateLimitBackend, SharedRateLimitBackend
+
+
+class BrokenExecutor(Executor):
+    """A process pool whose worker has died"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        raise BrokenProcessPool("A worker process terminated abruptly")
 
 
 class TestUserRegistration:
@@ -152,4 +169,206 @@ class TestGetUserById:
         """Test getting user by invalid UUID format"""
         response = client.get("/api/v1/users/invalid-uuid")
         
-        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
\ No newline at end of file
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+class TestAuthenticatedUserCache:
+    """Test caching of the authenticated user between requests"""
+
+    def test_repeat_request_skips_user_lookup(self, client, db, sample_user_data, query_budget):
+        """Test a second request with the same token does not query the database"""
+        user_create = UserCreate(**sample_user_data)
+        crud_user.create_user(db=db, user_in=user_create)
+        login_response = client.post("/api/v1/users/login/token", json=sample_user_data)
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        client.get("/api/v1/users/profile", headers=headers)
+        with query_budget(0):
+            response = client.get("/api/v1/users/profile", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_tier_change_invalidates_cache(self, client, db, sample_user_data):
+        """Test changing a user's tier is visible on their next request"""
+        user_create = UserCreate(**sample_user_data)
+        user = crud_user.create_user(db=db, user_in=user_create)
+        login_response = client.post("/api/v1/users/login/token", json=sample_user_data)
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        client.get("/api/v1/users/profile", headers=headers)
+
+        crud_user.update_user_tier(db=db, user=user, tier=UserTier.TIER_1)
+        response = client.get("/api/v1/users/profile", headers=headers)
+
+        assert response.json()["tier"] == "TIER_1"
+
+
+class TestPinHashing:
+    """Test PIN hashing offload on login"""
+
+    def test_login_upgrades_outdated_hash(self, client, db, sample_user_data):
+        """Test a PIN hashed with a lower bcrypt cost is re-hashed on login"""
+        weak_hash = bcrypt.hashpw(sample_user_data["pin"].encode(), bcrypt.gensalt(4)).decode()
+        user_create = UserCreate(**sample_user_data)
+        user = crud_user.create_user(db=db, user_in=user_create, hashed_pin=weak_hash)
+        user_id = user.id
+
+        response = client.post("/api/v1/users/login/token", json=sample_user_data)
+
+        assert response.status_code == status.HTTP_200_OK
+        stored = crud_user.get_user_by_id(db, user_id=user_id)
+        assert stored.hashed_pin.startswith(f"$2b${settings.PIN_HASH_ROUNDS:02d}$")
+
+    def test_login_sheds_load_when_hasher_saturated(self, client, db, sample_user_data, monkeypatch):
+        """Test login fails fast with 503 when the hashing pool is full"""
+        user_create = UserCreate(**sample_user_data)
+        crud_user.create_user(db=db, user_in=user_create)
+        monkeypatch.setattr(pin_hasher, "max_pending", 0)
+
+        response = client.post("/api/v1/users/login/token", json=sample_user_data)
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "1"
+
+    def test_broken_pool_retried_on_fresh_one(self):
+        """Test a pool broken by a dead worker is replaced and the operation retried"""
+        hasher = PinHasher(workers=0, max_pending=4)
+        hasher._executor = BrokenExecutor()
+
+        assert asyncio.run(hasher.hash("1234")).startswith("$2b$")
+        assert hasher._executor is None
+        assert hasher.pending == 0
+
+    def test_broken_pool_twice_is_busy(self, monkeypatch):
+        """Test an operation whose fresh pool also breaks is shed as busy, not a 500"""
+        hasher = PinHasher(workers=1, max_pending=4)
+        monkeypatch.setattr(hasher, "_get_executor", BrokenExecutor)
+
+        with pytest.raises(PinHasherBusy):
+            asyncio.run(hasher.hash("1234"))
+        assert hasher.pending == 0
+
+
+class TestSignInRateLimit:
+    """Test per-phone and per-IP limits on sign-in"""
+
+    def test_phone_limit_returns_429(self, client, db, sample_user_data, monkeypatch):
+        """Test attempts beyond the phone burst are refused with Retry-After"""
+        monkeypatch.setattr(settings, "RATE_LIMIT_PHONE_BURST", 3)
+        wrong_pin = {**sample_user_data, "pin": "9999"}
+
+        statuses = [client.post("/api/v1/users/login/token", json=wrong_pin).status_code for _ in range(4)]
+
+        assert statuses == [401, 401, 401, 429]
+        response = client.post("/api/v1/users/login/token", json=sample_user_data)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_phone_formats_share_a_bucket(self, client, monkeypatch):
+        """Test +234, 234 and 0 prefixed numbers count against the same limit"""
+        monkeypatch.setattr(settings, "RATE_LIMIT_PHONE_BURST", 2)
+
+        for phone_number in ("+2348012345678", "2348012345678", "08012345678"):
+            response = client.post("/api/v1/users/login/token", json={"phone_number": phone_number, "pin": "1234"})
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_ip_limit_applies_across_phones(self, client, monkeypatch):
+        """Test one address cannot spread attempts over many phone numbers"""
+        monkeypatch.setattr(settings, "RATE_LIMIT_IP_BURST", 2)
+
+        statuses = [
+            client.post("/api/v1/users/login/token", json={"phone_number": f"+23480{index:08d}", "pin": "1234"}).status_code
+            for index in range(3)
+        ]
+
+        assert statuses == [401, 401, 429]
+
+    def test_limited_before_database_and_bcrypt(self, client, monkeypatch, sample_user_data):
+        """Test a refused attempt does no user lookup or hashing"""
+        monkeypatch.setattr(settings, "RATE_LIMIT_PHONE_BURST", 0)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("rate limited attempts must not reach the database or bcrypt")
+
+        monkeypatch.setattr(crud_user, "get_user_by_phone", fail)
+        monkeypatch.setattr(pin_hasher, "verify_and_update", fail)
+        monkeypatch.setattr(pin_hasher, "hash", fail)
+
+        assert client.post("/api/v1/users/login/token", json=sample_user_data).status_code == 429
+        assert client.post("/api/v1/users/register", json=sample_user_data).status_code == 429
+
+    def test_forwarded_for_behind_trusted_proxy(self, client, monkeypatch):
+        """Test clients behind a load balancer get their own buckets"""
+        monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+        monkeypatch.setattr(settings, "RATE_LIMIT_IP_BURST", 1)
+
+        def attempt(forwarded_for, index):
+            credentials = {"phone_number": f"+23480{index:08d}", "pin": "1234"}
+            return client.post(
+                "/api/v1/users/login/token", json=credentials, headers={"X-Forwarded-For": forwarded_for}
+            ).status_code
+
+        assert attempt("203.0.113.1", 1) == 401
+        assert attempt("203.0.113.2", 2) == 401
+        # A spoofed left-most entry does not escape the limit
+        assert attempt("198.51.100.9, 203.0.113.1", 3) == 429
+
+
+class TestRateLimitBackends:
+    """Test the token bucket backends"""
+
+    @pytest.fixture(params=["memory", "shared"])
+    def backend(self, request):
+        if request.param == "memory":
+            return MemoryRateLimitBackend(max_keys=100)
+        return SharedRateLimitBackend(LocalBucketStore())
+
+    def test_bucket_refills(self, backend, monkeypatch):
+        """Test a bucket allows its burst, then one attempt per refill interval"""
+        now = [1000.0]
+        monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+        monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+
+        assert [backend.take("k", capacity=2, refill_per_second=0.5) for _ in range(3)] == [0, 0, 2.0]
+        now[0] += 2
+        assert backend.take("k", capacity=2, refill_per_second=0.5) == 0
+        assert backend.take("other", capacity=2, refill_per_second=0.5) == 0
+
+    def test_memory_backend_is_bounded(self):
+        """Test the in-memory backend evicts the least recently used buckets"""
+        backend = MemoryRateLimitBackend(max_keys=2)
+        for key in ("a", "b", "c"):
+            backend.take(key, capacity=1, refill_per_second=0.01)
+
+        assert backend.take("a", capacity=1, refill_per_second=0.01) == 0
+        assert backend.take("c", capacity=1, refill_per_second=0.01) > 0
+
+    def test_shared_backend_fails_open(self):
+        """Test an unreachable store lets sign-in through"""
+        class DownStore(LocalBucketStore):
+            def get(self, key):
+                raise ConnectionError("store unreachable")
+
+        backend = SharedRateLimitBackend(DownStore())
+
+        assert backend.take("k", capacity=1, refill_per_second=1) == 0
+
+    def test_shared_backend_retries_conflicting_writes(self):
+        """Test a write lost to another process is retried against the new state"""
+        class RacingStore(LocalBucketStore):
+            raced = False
+
+            def compare_and_set(self, key, expected, value, *, ttl_seconds):
+                if not self.raced:
+                    self.raced = True
+                    # Another process takes the last token first
+                    super().compare_and_set(key, expected, f"0:{rate_limit.time.time()}", ttl_seconds=ttl_seconds)
+                return super().compare_and_set(key, expected, value, ttl_seconds=ttl_seconds)
+
+        backend = SharedRateLimitBackend(RacingStore())
+
+        assert backend.take("k", capacity=1, refill_per_second=0.001) > 0
+
+    def test_refill_rate_must_be_positive(self):
+        """Test a zero refill rate is refused at startup rather than failing sign-ins"""
+        with pytest.raises(ValidationError):
+            Settings(RATE_LIMIT_PHONE_PER_MINUTE=0)
@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+from fastapi import status
+from sqlalchemy import func
+from traceapi.core.outbox import dispatch_outbox_batch, load_outbox_handlers
+from traceapi.crud import crud_contract, crud_listings, crud_user, crud_wallet
+from traceapi.db.models import Transaction, Wallet
+from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.user import UserCreate
+from traceapi.schemas.wallet import TransactionType
+
+from tests.conftest import TestingSessionLocal
+
+SELLER = {"phone_number": "+2348012345678", "pin": "1234"}
+BUYER = {"phone_number": "+2348087654321", "pin": "4321"}
+
+
+@pytest.fixture
+def buyer(db):
+    return crud_user.create_user(db=db, user_in=UserCreate(**BUYER))
+
+
+@pytest.fixture
+def wallet_id(db, buyer):
+    """The buyer's wallet, funded with $100"""
+    wallet = crud_wallet.get_or_create_user_wallet(db, owner_id=buyer.id)
+    crud_wallet.deposit(db, wallet_id=wallet.id, amount_usd_cents=10_000, reference="deposit-1")
+    return wallet.id
+
+
+def assert_ledger_balanced(db):
+    """Every transfer nets to zero and every balance equals the sum of its entries"""
+    assert db.query(func.sum(Transaction.amount_usd_cents)).scalar() == 0
+    for wallet in db.query(Wallet).all():
+        entries = db.query(func.sum(Transaction.amount_usd_cents)).filter(Transaction.wallet_id == wallet.id).scalar()
+        assert wallet.balance_usd_cents == entries
+
+
+class TestLedger:
+    """Test double-entry transfers"""
+
+    def test_deposit(self, db, wallet_id):
+        """Test a deposit credits the wallet against the external wallet"""
+        assert crud_wallet.get_wallet_balance(db, wallet_id=wallet_id) == 10_000
+        assert crud_wallet.get_wallet_balance(db, wallet_id=crud_wallet.EXTERNAL_WALLET_ID) == -10_000
+        assert_ledger_balanced(db)
+
+    def test_reference_is_idempotent(self, db, wallet_id):
+        """Test reposting a reference returns the first transfer and moves nothing"""
+        first = db.query(Transaction.transfer_id).filter(Transaction.reference == "deposit-1").first()[0]
+
+        assert crud_wallet.deposit(db, wallet_id=wallet_id, amount_usd_cents=10_000, reference="deposit-1") == first
+        assert crud_wallet.get_wallet_balance(db, wallet_id=wallet_id) == 10_000
+
+    def test_insufficient_funds(self, db, wallet_id):
+        """Test a debit beyond the balance is refused and leaves no trace"""
+        with pytest.raises(crud_wallet.InsufficientFunds):
+            crud_wallet.transfer(
+                db,
+                from_wallet_id=wallet_id,
+                to_wallet_id=crud_wallet.ESCROW_WALLET_ID,
+                amount_usd_cents=10_001,
+                transaction_type=TransactionType.ESCROW,
+            )
+        db.rollback()
+
+        assert crud_wallet.get_wallet_balance(db, wallet_id=wallet_id) == 10_000
+        assert_ledger_balanced(db)
+
+    def test_concurrent_debits_cannot_overspend(self, db, wallet_id):
+        """Test racing debits on one wallet never take it below zero"""
+        outcomes = []
+
+        def spend():
+            with TestingSessionLocal() as session:
+                try:
+                    crud_wallet.transfer(
+                        session,
+                        from_wallet_id=wallet_id,
+                        to_wallet_id=crud_wallet.ESCROW_WALLET_ID,
+                        amount_usd_cents=1_500,
+                        transaction_type=TransactionType.ESCROW,
+                    )
+                    outcomes.append(True)
+                except crud_wallet.InsufficientFunds:
+                    outcomes.append(False)
+
+        threads = [threading.Thread(target=spend) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert outcomes.count(True) == 6
+        db.expire_all()
+        assert crud_wallet.get_wallet_balance(db, wallet_id=wallet_id) == 1_000
+        assert_ledger_balanced(db)
+
+    def test_platform_wallet_opened_concurrently(self, db, wallet_id, monkeypatch):
+        """Test losing the race to open a platform wallet falls through to the balance check"""
+        crud_wallet.transfer(
+            db,
+            from_wallet_id=wallet_id,
+            to_wallet_id=crud_wallet.ESCROW_WALLET_ID,
+            amount_usd_cents=1_000,
+            transaction_type=TransactionType.ESCROW,
+        )
+        # The wallet check misses once, as if another transfer opened it just after
+        get = db.get
+        misses = [None]
+        monkeypatch.setattr(db, "get", lambda *args, **kwargs: misses.pop() if misses else get(*args, **kwargs))
+
+        with pytest.raises(crud_wallet.InsufficientFunds):
+            crud_wallet.apply_balance_delta(
+                db, wallet_id=crud_wallet.ESCROW_WALLET_ID, delta=-1_500, allow_negative=False
+            )
+        crud_wallet.apply_balance_delta(db, wallet_id=crud_wallet.ESCROW_WALLET_ID, delta=-500, allow_negative=False)
+        db.commit()
+
+        assert misses == []
+        assert crud_wallet.get_wallet_balance(db, wallet_id=crud_wallet.ESCROW_WALLET_ID) == 500
+
+    def test_entries_are_append_only(self, db, wallet_id):
+        entry = db.query(Transaction).first()
+        entry.amount_usd_cents = 1
+        with pytest.raises(ValueError):
+            db.commit()
+        db.rollback()
+
+
+class TestEscrowFunding:
+    """Test escrow is funded from the contract.signed outbox event"""
+
+    def test_signed_contract_funds_escrow_once(self, db, buyer, wallet_id, sample_listing_data):
+        seller = crud_user.create_user(db=db, user_in=UserCreate(**SELLER))
+        listing = crud_listings.create_listing(
+            db=db,
+            listing_in=ListingCreate(**dict(sample_listing_data, quantity_kg=20, price_per_kg_usd=2.5)),
+            seller_id=seller.id,
+        )
+        contract = crud_contract.create_contract_from_listing(db=db, listing=listing, buyer=buyer)
+        crud_contract.accept_contract(db=db, contract=contract)
+        load_outbox_handlers()
+
+        assert dispatch_outbox_batch(db) == 1
+        assert crud_wallet.get_wallet_balance(db, wallet_id=wallet_id) == 5_000
+        assert crud_wallet.get_wallet_balance(db, wallet_id=crud_wallet.ESCROW_WALLET_ID) == 5_000
+
+        # A redelivered event is a no-op
+        crud_wallet.fund_escrow(db, crud_contract.contract_signed_payload(contract))
+        db.commit()
+        assert crud_wallet.get_wallet_balance(db, wallet_id=wallet_id) == 5_000
+        assert_ledger_balanced(db)
+
+
+class TestWalletEndpoints:
+    """Test reading the current user's wallet"""
+
+    def test_read_wallet_and_transactions(self, client, wallet_id):
+        response = client.post("/api/v1/users/login/token", json=BUYER)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = client.get("/api/v1/wallets/me", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["balance_usd_cents"] == 10_000
+
+        response = client.get("/api/v1/wallets/me/transactions", headers=headers)
+        assert [entry["transaction_type"] for entry in response.json()] == ["DEPOSIT"]
+        assert response.json()[0]["amount_usd_cents"] == 10_000
@@ -1,74 +1,86 @@
 import uuid
 from http import HTTPStatus
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 
+from traceapi.core.anchoring import ChainBackend, get_chain_backend
+from traceapi.core.config import settings
+from traceapi.core.integrity import audit_contract_hashes
 from traceapi.crud import crud_contract
-from traceapi.crud.crud_contract import get_contract_by_id, accept_contract, create_contract_from_listing
-from traceapi.crud.crud_listings import get_listing_by_id
+from traceapi.crud.crud_anchor import verify_contract_anchor
+from traceapi.crud.crud_contract import (
+    accept_contract,
+    accept_contract_async,
+    create_contract_from_listing,
+    create_contract_from_listing_async,
+    create_contracts_from_listings,
+    get_contract_by_id,
+    get_contract_by_id_async,
+    iter_user_contract_rows,
+)
+from traceapi.crud.crud_listings import get_listing_by_id, get_listing_by_id_async, get_listings_by_ids
+from traceapi.db.models import Contract as ContractModel, Listing as ListingModel
 from traceapi.db import session
-from traceapi.db.models import User
-from traceapi.schemas.contract import Contract, ContractStatus, OfferCreate
+from traceapi.schemas.contract import (
+    Contract,
+    ContractAnchorProof,
+    ContractIntegrityReport,
+    ContractStatus,
+    OfferBatchCreate,
+    OfferCreate,
+)
+from traceapi.schemas.user import User
 from traceapi.utils import dependencies
+from traceapi.utils.export import ExportFormat, export_response, session_batches
+from traceapi.utils.fieldsets import fieldset, sparse_adapter
+from traceapi.utils.idempotency import (
+    begin_idempotent_request,
+    begin_idempotent_request_async,
+    idempotency_key_header,
+    request_fingerprint,
+)
+from traceapi.utils.responses import model_response
 
 router = APIRouter()
+# Async handlers on the async engine; mounted ahead of `router` when settings.ASYNC_DB is on
+async_router = APIRouter()
 
-@router.post("/offers", response_model=Contract, status_code=HTTPStatus.CREATED)
-def make_offer_on_listing(
-        *,
-        db: Session = Depends(session.get_db),
-        offer_in: OfferCreate,
-        current_user: User = Depends(dependencies.get_current_user)
-):
+contract_list = TypeAdapter(List[Contract])
+contract_fields = fieldset(Contract)
+
+
+def ensure_can_make_offer(listing: ListingModel | None, current_user: User) -> ListingModel:
     """
-    A buyer makes an offer on a listing, creating a DRAFT contract.
+    Checks that the current user may make an offer on the listing.
     """
-    listing = get_listing_by_id(db, listing_id=offer_in.listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     if not listing.is_active:
         raise HTTPException(status_code=400, detail="Listing is not active")
     if listing.seller_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot make an offer on your own listing")
+    return listing
 
-    contract = create_contract_from_listing(db=db, listing=listing, buyer=current_user)
-
-    return contract
 
-@router.get("/{contract_id}", response_model=Contract)
-def read_contract(
-        *,
-        db: Session = Depends(session.get_db),
-        contract_id: uuid.UUID,
-        current_user: User = Depends(dependencies.get_current_user)
-):
+def ensure_can_view_contract(contract: ContractModel | None, current_user: User) -> ContractModel:
     """
-    Retrieve a specific contract.
     A user can only view a contract if they are the buyer or the seller.
     """
-    contract = crud_contract.get_contract_by_id(db, contract_id=contract_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
-
     if contract.buyer_id != current_user.id and contract.seller_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this contract")
-
     return contract
 
 
-@router.post("/{contract_id}/accept", response_model=Contract)
-def accept_trade_contract(
-        *,
-        db: Session = Depends(session.get_db),
-        contract_id: uuid.UUID,
-        current_user: User = Depends(dependencies.get_current_user)
-):
+def ensure_can_accept_contract(contract: ContractModel | None, current_user: User) -> ContractModel:
     """
-    Seller accepts a DRAFT contract, changing its status to SIGNED.
-    This is the digital signature action. Once signed, the contract is locked.
+    Checks that the current user is the seller and the contract is still a DRAFT.
     """
-    contract = get_contract_by_id(db, contract_id=contract_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
 
@@ -87,11 +99,246 @@ def accept_trade_contract(
             status_code=HTTPStatus.BAD_REQUEST,
             detail=f"Contract cannot be accepted. Current status: {contract.status}",
         )
+    return contract
 
-    # If all checks pass, update the contract
-    accepted_contract = accept_contract(db=db, contract=contract)
+@router.post("/offers", response_model=Contract, status_code=HTTPStatus.CREATED)
+def make_offer_on_listing(
+        *,
+        request: Request,
+        db: Session = Depends(session.get_db),
+        offer_in: OfferCreate,
+        current_user: User = Depends(dependencies.get_current_user),
+        idempotency_key: Optional[str] = Depends(idempotency_key_header)
+):
+    """
+    A buyer makes an offer on a listing, creating a DRAFT contract.
+    Retries carrying the same Idempotency-Key replay the first response.
+    """
+    idempotent = begin_idempotent_request(
+        db, user_id=current_user.id, key=idempotency_key, fingerprint=request_fingerprint(request, offer_in)
+    )
+    if idempotent.replay is not None:
+        return idempotent.replay
+
+    listing = ensure_can_make_offer(
+        get_listing_by_id(db, listing_id=offer_in.listing_id), current_user
+    )
+
+    with idempotent.guard(db):
+        contract = create_contract_from_listing(db=db, listing=listing, buyer=current_user, commit=idempotent.key is None)
+        return idempotent.complete(db, Contract, contract, status_code=HTTPStatus.CREATED)
+
+@router.post("/offers/batch", response_model=List[Contract], status_code=HTTPStatus.CREATED)
+def make_offers_in_batch(
+        *,
+        db: Session = Depends(session.get_db),
+        batch_in: OfferBatchCreate,
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    A buyer makes offers on several listings at once, drafting all the DRAFT
+    contracts in one transaction. If any offer is invalid none are made, and each
+    failing offer is reported with its index.
+    """
+    listing_ids = [offer.listing_id for offer in batch_in.offers]
+    listings_by_id = get_listings_by_ids(db, listing_ids)
+
+    listings, errors, seen = [], [], set()
+    for index, listing_id in enumerate(listing_ids):
+        if listing_id in seen:
+            errors.append({"index": index, "detail": "Duplicate offer on this listing"})
+            continue
+        seen.add(listing_id)
+        try:
+            listings.append(ensure_can_make_offer(listings_by_id.get(listing_id), current_user))
+        except HTTPException as exc:
+            errors.append({"index": index, "detail": exc.detail})
+    if errors:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=errors)
+
+    contracts = create_contracts_from_listings(db, listings=listings, buyer=current_user)
+    return model_response(contract_list, contracts, status_code=HTTPStatus.CREATED)
+
+# Also on async_router so its /{contract_id} route does not capture /export
+@router.get("/export")
+@async_router.get("/export")
+def export_my_contracts(
+        format: ExportFormat = ExportFormat.NDJSON,
+        session_factory: sessionmaker = Depends(session.get_session_factory),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Stream every contract the current user is buyer or seller on, as NDJSON or CSV.
+    """
+    batches = session_batches(
+        session_factory,
+        iter_user_contract_rows,
+        user_id=current_user.id,
+        batch_size=settings.EXPORT_BATCH_SIZE,
+    )
+    columns = [column.key for column in crud_contract.EXPORT_COLUMNS]
+    return export_response(batches, columns, format, filename="contracts")
+
+@router.get("/verify", response_model=ContractIntegrityReport)
+@async_router.get("/verify", response_model=ContractIntegrityReport)
+def verify_my_contracts(
+        session_factory: sessionmaker = Depends(session.get_session_factory),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Recompute the hash of every contract the current user is a party to and report
+    any whose stored prose or parameters no longer match. Full-table audits run
+    from the command line: `python -m traceapi.core.integrity`.
+    """
+    mismatches = []
+    totals = audit_contract_hashes(
+        session_factory,
+        chunk_size=settings.INTEGRITY_CHUNK_SIZE,
+        user_id=current_user.id,
+        on_mismatches=mismatches.extend,
+    )
+    return {"checked": totals["checked"], "mismatches": mismatches}
+
+@router.get("/{contract_id}", response_model=Contract)
+def read_contract(
+        *,
+        db: Session = Depends(session.get_db),
+        contract_id: uuid.UUID,
+        fields: tuple[str, ...] | None = Depends(contract_fields),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Retrieve a specific contract.
+    A user can only view a contract if they are the buyer or the seller.
+    `fields` selects a sparse fieldset, e.g. `fields=status,parameters` to skip
+    the legal prose; only those columns are read from the database.
+    """
+    contract = crud_contract.get_contract_by_id(db, contract_id=contract_id, fields=fields)
+    return model_response(sparse_adapter(Contract, fields), ensure_can_view_contract(contract, current_user))
 
+
+@router.get("/{contract_id}/proof", response_model=ContractAnchorProof)
+def read_contract_anchor_proof(
+        *,
+        db: Session = Depends(session.get_db),
+        contract_id: uuid.UUID,
+        backend: ChainBackend = Depends(get_chain_backend),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Retrieve the Merkle inclusion proof tying a signed contract's hash to the root
+    anchored under its on_chain_id, so either party can verify it independently.
+    """
+    contract = ensure_can_view_contract(
+        db.get(ContractModel, contract_id), current_user
+    )
+    if contract.anchor_batch_id is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Contract has not been anchored yet")
+    return {
+        "contract_id": contract.id,
+        "contract_hash": contract.contract_hash,
+        "on_chain_id": contract.on_chain_id,
+        "merkle_root": contract.anchor_batch.merkle_root,
+        "proof": contract.merkle_proof,
+        "verified": verify_contract_anchor(contract, backend=backend),
+    }
+
+@router.post("/{contract_id}/accept", response_model=Contract)
+def accept_trade_contract(
+        *,
+        request: Request,
+        db: Session = Depends(session.get_db),
+        contract_id: uuid.UUID,
+        current_user: User = Depends(dependencies.get_current_user),
+        idempotency_key: Optional[str] = Depends(idempotency_key_header)
+):
+    """
+    Seller accepts a DRAFT contract, changing its status to SIGNED.
+    This is the digital signature action. Once signed, the contract is locked.
+    Retries carrying the same Idempotency-Key replay the first response.
+    """
+    idempotent = begin_idempotent_request(
+        db, user_id=current_user.id, key=idempotency_key, fingerprint=request_fingerprint(request)
+    )
+    if idempotent.replay is not None:
+        return idempotent.replay
+
+    contract = ensure_can_accept_contract(
+        get_contract_by_id(db, contract_id=contract_id), current_user
+    )
+
+    # If all checks pass, update the contract
     # As per the PRD, once signed, the contract is locked and a record is stored.
-    # Our hash already ensures integrity. The next step would be storing the hash on-chain.
-    # [cite: 56]
-    return accepted_contract
\ No newline at end of file
+    # Our hash already ensures integrity; the anchor worker (core.anchoring) puts it
+    # on-chain in the next Merkle batch. [cite: 56]
+    with idempotent.guard(db):
+        accepted_contract = accept_contract(db=db, contract=contract, commit=idempotent.key is None)
+        return idempotent.complete(db, Contract, accepted_contract)
+
+
+# --- Async handlers (settings.ASYNC_DB) ---
+
+@async_router.post("/offers", response_model=Contract, status_code=HTTPStatus.CREATED)
+async def make_offer_on_listing_async(
+        *,
+        request: Request,
+        db: AsyncSession = Depends(session.get_async_db),
+        offer_in: OfferCreate,
+        current_user: User = Depends(dependencies.get_current_user_async),
+        idempotency_key: Optional[str] = Depends(idempotency_key_header)
+):
+    """
+    A buyer makes an offer on a listing, creating a DRAFT contract.
+    """
+    idempotent = await begin_idempotent_request_async(
+        db, user_id=current_user.id, key=idempotency_key, fingerprint=request_fingerprint(request, offer_in)
+    )
+    if idempotent.replay is not None:
+        return idempotent.replay
+    listing = ensure_can_make_offer(
+        await get_listing_by_id_async(db, listing_id=offer_in.listing_id), current_user
+    )
+    async with idempotent.guard_async(db):
+        contract = await create_contract_from_listing_async(
+            db, listing=listing, buyer=current_user, commit=idempotent.key is None
+        )
+        return await idempotent.complete_async(db, Contract, contract, status_code=HTTPStatus.CREATED)
+
+@async_router.get("/{contract_id}", response_model=Contract)
+async def read_contract_async(
+        *,
+        db: AsyncSession = Depends(session.get_async_db),
+        contract_id: uuid.UUID,
+        fields: tuple[str, ...] | None = Depends(contract_fields),
+        current_user: User = Depends(dependencies.get_current_user_async)
+):
+    """
+    Retrieve a specific contract.
+    A user can only view a contract if they are the buyer or the seller.
+    """
+    contract = await get_contract_by_id_async(db, contract_id=contract_id, fields=fields)
+    return model_response(sparse_adapter(Contract, fields), ensure_can_view_contract(contract, current_user))
+
+@async_router.post("/{contract_id}/accept", response_model=Contract)
+async def accept_trade_contract_async(
+        *,
+        request: Request,
+        db: AsyncSession = Depends(session.get_async_db),
+        contract_id: uuid.UUID,
+        current_user: User = Depends(dependencies.get_current_user_async),
+        idempotency_key: Optional[str] = Depends(idempotency_key_header)
+):
+    """
+    Seller accepts a DRAFT contract, changing its status to SIGNED.
+    """
+    idempotent = await begin_idempotent_request_async(
+        db, user_id=current_user.id, key=idempotency_key, fingerprint=request_fingerprint(request)
+    )
+    if idempotent.replay is not None:
+        return idempotent.replay
+    contract = ensure_can_accept_contract(
+        await get_contract_by_id_async(db, contract_id=contract_id), current_user
+    )
+    async with idempotent.guard_async(db):
+        contract = await accept_contract_async(db, contract=contract, commit=idempotent.key is None)
+        return await idempotent.complete_async(db, Contract, contract)
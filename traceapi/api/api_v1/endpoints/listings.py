@@ -1,19 +1,93 @@
+import json
 import uuid
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 
-from traceapi.crud.crud_contract import create_contract_from_listing
-from traceapi.crud.crud_listings import create_listing, get_listings, get_listing_by_id
-from traceapi.db import session, models
+from traceapi.api.api_v1.endpoints.contracts import ensure_can_make_offer
+from traceapi.crud.crud_contract import create_contract_from_listing, create_contract_from_listing_async
+from traceapi.core.config import settings
+from traceapi.crud import crud_listings
+from traceapi.crud.crud_listings import (
+    create_listing,
+    create_listing_async,
+    create_listings_bulk,
+    deactivate_listing,
+    get_listing_by_id,
+    get_listing_by_id_async,
+    get_listings,
+    get_listings_async,
+    iter_listing_rows,
+    search_listings,
+)
+from traceapi.db import session
 from traceapi.schemas.contract import Contract
-from traceapi.schemas.listing import Listing, ListingCreate
+from traceapi.schemas.listing import (
+    BulkListingResult,
+    Incoterm,
+    Listing,
+    ListingCreate,
+    ListingFilters,
+    ListingSearchResults,
+    ListingSort,
+)
 from traceapi.schemas.user import User
 from traceapi.utils import dependencies
+from traceapi.utils.export import ExportFormat, export_response, session_batches
+from traceapi.utils.fieldsets import fieldset, sparse_adapter
+from traceapi.utils.idempotency import (
+    begin_idempotent_request,
+    begin_idempotent_request_async,
+    idempotency_key_header,
+    request_fingerprint,
+)
+from traceapi.utils.pagination import decode_cursor, encode_cursor
+from traceapi.utils.response_cache import listings_cache
+from traceapi.utils.responses import render_model
 
 router = APIRouter()
+# Async handlers on the async engine; mounted ahead of `router` when settings.ASYNC_DB is on
+async_router = APIRouter()
+
+search_results = TypeAdapter(ListingSearchResults)
+listing_fields = fieldset(Listing)
+
+
+def listing_filters(
+        commodity: Optional[str] = Query(None, max_length=100),
+        fuzzy: bool = False,
+        state: Optional[str] = None,
+        lga: Optional[str] = None,
+        incoterm: Optional[Incoterm] = None,
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        min_quantity: Optional[float] = Query(None, ge=0),
+        max_quantity: Optional[float] = Query(None, ge=0),
+        sort: ListingSort = ListingSort.NEWEST,
+) -> ListingFilters:
+    """
+    Collects listing filters from the query string.
+    """
+    return ListingFilters(
+        commodity=commodity,
+        fuzzy=fuzzy,
+        state=state,
+        lga=lga,
+        incoterm=incoterm,
+        min_price=min_price,
+        max_price=max_price,
+        min_quantity=min_quantity,
+        max_quantity=max_quantity,
+        sort=sort,
+    )
+
 
 @router.post("/", response_model=Listing, status_code=status.HTTP_201_CREATED)
 def create_new_listing(
@@ -28,40 +102,295 @@ def create_new_listing(
     listing = create_listing(db=db, listing_in=listing_in, seller_id=current_user.id)
     return listing
 
+def cursor_position(cursor: Optional[str]):
+    """Decodes the `cursor` query parameter, rejecting malformed cursors."""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def next_cursor_headers(listings, limit: int) -> dict[str, str]:
+    """Advertises the next page in X-Next-Cursor when this page is full."""
+    if listings and len(listings) == limit:
+        last = listings[-1]
+        return {"X-Next-Cursor": encode_cursor(last.created_at, last.id)}
+    return {}
+
+def bulk_too_large_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"At most {settings.LISTINGS_BULK_MAX_ITEMS} listings per request",
+    )
+
+async def read_bulk_body(request: Request) -> bytes:
+    """
+    Reads a bulk request body, refusing it with a 413 once it exceeds what
+    LISTINGS_BULK_MAX_ITEMS items may take: up front from Content-Length, or
+    while streaming when the body is chunked or the header understates it.
+    """
+    max_bytes = settings.LISTINGS_BULK_MAX_ITEMS * settings.LISTINGS_BULK_MAX_ITEM_BYTES
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise bulk_too_large_exception()
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise bulk_too_large_exception()
+    return bytes(body)
+
+# Marks an undecodable NDJSON line. Not None: a `null` line is valid JSON, left to validation
+INVALID_JSON_LINE = object()
+
+def parse_bulk_items(body: bytes, content_type: str) -> list:
+    """
+    Splits a bulk request body into raw items: a JSON array, or one JSON object
+    per line for application/x-ndjson. Undecodable NDJSON lines become
+    INVALID_JSON_LINE so they can be reported against their position.
+    """
+    if content_type.startswith("application/x-ndjson"):
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(INVALID_JSON_LINE)
+        return items
+
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of listings")
+    return items
+
+@router.post(
+    "/bulk",
+    response_model=BulkListingResult,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": {"content": {
+        "application/json": {"schema": {"type": "array", "items": ListingCreate.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    }}},
+)
+async def create_listings_in_bulk(
+        request: Request,
+        db: Session = Depends(session.get_db),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Create up to LISTINGS_BULK_MAX_ITEMS listings in one request, as a JSON array
+    or NDJSON (Content-Type: application/x-ndjson). Valid items are inserted in a
+    single statement; invalid ones are reported by index and skipped.
+    """
+    items = parse_bulk_items(await read_bulk_body(request), request.headers.get("content-type", ""))
+    if len(items) > settings.LISTINGS_BULK_MAX_ITEMS:
+        raise bulk_too_large_exception()
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        if item is INVALID_JSON_LINE:
+            errors.append({"index": index, "errors": [{"msg": "Invalid JSON"}]})
+            continue
+        try:
+            valid.append(ListingCreate.model_validate(item))
+        except ValidationError as exc:
+            errors.append({
+                "index": index,
+                "errors": jsonable_encoder(exc.errors(include_url=False, include_context=False)),
+            })
+
+    if not valid:
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            content={"created": [], "errors": errors},
+        )
+
+    created = await run_in_threadpool(
+        create_listings_bulk, db, listings_in=valid, seller_id=current_user.id
+    )
+    return {"created": created, "errors": errors}
+
 @router.get("/", response_model=List[Listing])
 def read_active_listings(
+        request: Request,
         db: Session = Depends(session.get_db),
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: tuple[str, ...] | None = Depends(listing_fields),
+):
+    """
+    Retrieve all active listings, newest first. This is a public endpoint.
+    When a full page is returned, the `X-Next-Cursor` response header carries an
+    opaque cursor; pass it back as `cursor` to fetch the next page. `skip` is
+    ignored in cursor mode. `fields` selects a sparse fieldset, e.g.
+    `fields=commodity_name,price_per_kg_usd,quantity_kg,location_state`; only
+    those columns are read from the database.
+    Pages are served from an in-process cache with ETag/Last-Modified validators,
+    so conditional requests get a 304.
+    """
+    after = cursor_position(cursor)
+    cached = listings_cache.get(request)
+    if cached is None:
+        generation = listings_cache.generation
+        listings = get_listings(db, skip=skip, limit=limit, after=after, fields=fields)
+        cached = listings_cache.put(
+            request, generation, render_model(sparse_adapter(Listing, fields, many=True), listings), next_cursor_headers(listings, limit)
+        )
+    return cached.to_response(request)
+
+@router.get("/search", response_model=ListingSearchResults)
+def search_active_listings(
+        request: Request,
+        db: Session = Depends(session.get_db),
+        filters: ListingFilters = Depends(listing_filters),
+        skip: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Search active listings by commodity, region, incoterm, price and quantity.
+    Returns a page of results, the total match count and per-state and
+    per-commodity facet counts. This is a public endpoint, cached like the
+    listings page.
+    """
+    cached = listings_cache.get(request)
+    if cached is None:
+        generation = listings_cache.generation
+        results = search_listings(db, filters=filters, skip=skip, limit=limit)
+        cached = listings_cache.put(request, generation, render_model(search_results, results))
+    return cached.to_response(request)
+
+@router.get("/export")
+def export_active_listings(
+        format: ExportFormat = ExportFormat.NDJSON,
+        filters: ListingFilters = Depends(listing_filters),
+        session_factory: sessionmaker = Depends(session.get_session_factory),
 ):
     """
-    Retrieve all active listings. This is a public endpoint.
+    Stream every active listing matching the search filters, as NDJSON or CSV.
+    This is a public endpoint.
     """
-    listings = get_listings(db, skip=skip, limit=limit)
-    return listings
+    batches = session_batches(
+        session_factory,
+        iter_listing_rows,
+        filters=filters,
+        batch_size=settings.EXPORT_BATCH_SIZE,
+    )
+    columns = [column.key for column in crud_listings.EXPORT_COLUMNS]
+    return export_response(batches, columns, format, filename="listings")
+
+@router.delete("/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
+def deactivate_my_listing(
+        *,
+        db: Session = Depends(session.get_db),
+        listing_id: uuid.UUID,
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Take one of your listings off the market. It stops appearing in listings,
+    search and export, and no longer accepts offers; existing contracts keep it.
+    """
+    listing = get_listing_by_id(db, listing_id=listing_id)
+    if not listing or not listing.is_active:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    if listing.seller_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to deactivate this listing")
+    deactivate_listing(db, listing=listing)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post("/{listing_id}/make-offer", response_model=Contract)
 def make_offer_on_listing(
         *,
+        request: Request,
         db: Session = Depends(session.get_db),
         listing_id: uuid.UUID,
         # In a real scenario, the offer_in would contain price, etc.
         # offer_in: schemas.OfferCreate,
-        current_user: models.User = Depends(dependencies.get_current_user)
+        current_user: User = Depends(dependencies.get_current_user),
+        idempotency_key: Optional[str] = Depends(idempotency_key_header)
 ):
     """
     A buyer makes an offer on a listing, creating a DRAFT contract.
     This action corresponds to the "Create Contract" button in the PRD[cite: 56].
+    Retries carrying the same Idempotency-Key replay the first response.
     """
-    listing = get_listing_by_id(db, listing_id=listing_id)
-    if not listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    if not listing.is_active:
-        raise HTTPException(status_code=400, detail="Listing is not active")
-    if listing.seller_id == current_user.id:
-        raise HTTPException(status_code=400, detail="Cannot make an offer on your own listing")
+    idempotent = begin_idempotent_request(
+        db, user_id=current_user.id, key=idempotency_key, fingerprint=request_fingerprint(request)
+    )
+    if idempotent.replay is not None:
+        return idempotent.replay
+
+    listing = ensure_can_make_offer(get_listing_by_id(db, listing_id=listing_id), current_user)
 
     # For now, making an offer directly creates the contract in DRAFT state
-    contract = create_contract_from_listing(db=db, listing=listing, buyer=current_user)
+    with idempotent.guard(db):
+        contract = create_contract_from_listing(db=db, listing=listing, buyer=current_user, commit=idempotent.key is None)
+        return idempotent.complete(db, Contract, contract)
+
+
+# --- Async handlers (settings.ASYNC_DB) ---
+
+@async_router.post("/", response_model=Listing, status_code=status.HTTP_201_CREATED)
+async def create_new_listing_async(
+        *,
+        db: AsyncSession = Depends(session.get_async_db),
+        listing_in: ListingCreate,
+        current_user: User = Depends(dependencies.get_current_user_async)
+):
+    """
+    Create a new commodity listing. This is a protected endpoint.
+    """
+    return await create_listing_async(db, listing_in=listing_in, seller_id=current_user.id)
 
-    return contract
\ No newline at end of file
+@async_router.get("/", response_model=List[Listing])
+async def read_active_listings_async(
+        request: Request,
+        db: AsyncSession = Depends(session.get_async_db),
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: tuple[str, ...] | None = Depends(listing_fields),
+):
+    """
+    Retrieve all active listings, newest first. This is a public endpoint.
+    Paginate with `cursor` and the `X-Next-Cursor` response header.
+    """
+    after = cursor_position(cursor)
+    cached = listings_cache.get(request)
+    if cached is None:
+        generation = listings_cache.generation
+        listings = await get_listings_async(db, skip=skip, limit=limit, after=after, fields=fields)
+        cached = listings_cache.put(
+            request, generation, render_model(sparse_adapter(Listing, fields, many=True), listings), next_cursor_headers(listings, limit)
+        )
+    return cached.to_response(request)
+
+@async_router.post("/{listing_id}/make-offer", response_model=Contract)
+async def make_offer_on_listing_async(
+        *,
+        request: Request,
+        db: AsyncSession = Depends(session.get_async_db),
+        listing_id: uuid.UUID,
+        current_user: User = Depends(dependencies.get_current_user_async),
+        idempotency_key: Optional[str] = Depends(idempotency_key_header)
+):
+    """
+    A buyer makes an offer on a listing, creating a DRAFT contract.
+    """
+    idempotent = await begin_idempotent_request_async(
+        db, user_id=current_user.id, key=idempotency_key, fingerprint=request_fingerprint(request)
+    )
+    if idempotent.replay is not None:
+        return idempotent.replay
+    listing = ensure_can_make_offer(await get_listing_by_id_async(db, listing_id=listing_id), current_user)
+    async with idempotent.guard_async(db):
+        contract = await create_contract_from_listing_async(
+            db, listing=listing, buyer=current_user, commit=idempotent.key is None
+        )
+        return await idempotent.complete_async(db, Contract, contract)
@@ -1,29 +1,49 @@
 from traceapi.utils import dependencies
 from traceapi.crud import crud_user
 from traceapi.schemas.user import UserCreate, User, Token, LoginRequest
-from traceapi.core.security import verify_pin, create_access_token
+from traceapi.core.security import PinHasherBusy, create_access_token, pin_hasher
 from traceapi.db import session
+from traceapi.utils.rate_limit import RateLimitBackend, get_rate_limit_backend, limit_sign_in
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import ValidationError
 import uuid
 
 router = APIRouter()
+# Async handlers on the async engine; mounted ahead of `router` when settings.ASYNC_DB is on
+async_router = APIRouter()
+
+
+def pin_hasher_busy_exception() -> HTTPException:
+    """Returned when the PIN hashing pool is saturated, before any bcrypt work is queued."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests in progress, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
 
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
-def register_new_user(
-    *, db: Session = Depends(session.get_db), create_user_request: UserCreate
+async def register_new_user(
+    *,
+    request: Request,
+    db: Session = Depends(session.get_db),
+    rate_limiter: RateLimitBackend = Depends(get_rate_limit_backend),
+    create_user_request: UserCreate,
 ):
     """
     Handle new user registration (Tier 0).
     Creates a new user with a phone number and a 4-digit PIN.
+    The PIN is hashed on the PIN hashing pool; database work runs on the threadpool.
     """
+    limit_sign_in(rate_limiter, request, create_user_request.phone_number)
     try:
         # Check if a user with this phone number already exists
-        user = crud_user.get_user_by_phone(
-            db, phone_number=create_user_request.phone_number
+        user = await run_in_threadpool(
+            crud_user.get_user_by_phone, db, phone_number=create_user_request.phone_number
         )
         if user:
             raise HTTPException(
@@ -31,8 +51,15 @@ def register_new_user(
                 detail="A user with this phone number already exists.",
             )
 
+        try:
+            hashed_pin = await pin_hasher.hash(create_user_request.pin)
+        except PinHasherBusy:
+            raise pin_hasher_busy_exception()
+
         # If not, create the new user
-        user = crud_user.create_user(db=db, user_in=create_user_request)
+        user = await run_in_threadpool(
+            crud_user.create_user, db=db, user_in=create_user_request, hashed_pin=hashed_pin
+        )
         return user
     except ValidationError as e:
         raise HTTPException(
@@ -42,26 +69,49 @@ def register_new_user(
 
 
 @router.post("/login/token", response_model=Token)
-def login_for_access_token(
-    login_request: LoginRequest, db: Session = Depends(session.get_db)
+async def login_for_access_token(
+    request: Request,
+    login_request: LoginRequest,
+    db: Session = Depends(session.get_db),
+    rate_limiter: RateLimitBackend = Depends(get_rate_limit_backend),
 ):
     """
     Authenticate a user and return a JWT access token.
+    Attempts are rate limited per IP and per phone number before any work.
+    PIN verification runs on the PIN hashing pool; a hash made with an outdated
+    bcrypt cost is transparently replaced on success.
     """
+    limit_sign_in(rate_limiter, request, login_request.phone_number)
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect phone number or PIN",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
     try:
         # The form uses 'username', we'll use it for the phone number.
-        user = crud_user.get_user_by_phone(db, phone_number=login_request.phone_number)
+        user = await run_in_threadpool(
+            crud_user.get_user_by_phone, db, phone_number=login_request.phone_number
+        )
+        if not user:
+            raise credentials_exception
 
-        # Check if user exists and if the provided PIN is correct
-        if not user or not verify_pin(login_request.pin, user.hashed_pin):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect phone number or PIN",
-                headers={"WWW-Authenticate": "Bearer"},
+        # Check if the provided PIN is correct
+        try:
+            verified, new_hash = await pin_hasher.verify_and_update(
+                login_request.pin, user.hashed_pin
             )
+        except PinHasherBusy:
+            raise pin_hasher_busy_exception()
+        if not verified:
+            raise credentials_exception
 
         # If credentials are correct, create and return an access token
         access_token = create_access_token(subject=user.phone_number)
+
+        if new_hash:
+            await run_in_threadpool(
+                crud_user.update_user_pin_hash, db, user=user, hashed_pin=new_hash
+            )
         return {"access_token": access_token, "token_type": "bearer"}
     except ValidationError as e:
         raise HTTPException(
@@ -95,3 +145,100 @@ def get_user_by_id(
             detail="User not found"
         )
     return user
+
+
+# --- Async handlers (settings.ASYNC_DB) ---
+
+
+@async_router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
+async def register_new_user_async(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(session.get_async_db),
+    rate_limiter: RateLimitBackend = Depends(get_rate_limit_backend),
+    create_user_request: UserCreate,
+):
+    """
+    Handle new user registration (Tier 0).
+    Creates a new user with a phone number and a 4-digit PIN.
+    """
+    limit_sign_in(rate_limiter, request, create_user_request.phone_number)
+    user = await crud_user.get_user_by_phone_async(
+        db, phone_number=create_user_request.phone_number
+    )
+    if user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A user with this phone number already exists.",
+        )
+
+    try:
+        hashed_pin = await pin_hasher.hash(create_user_request.pin)
+    except PinHasherBusy:
+        raise pin_hasher_busy_exception()
+
+    return await crud_user.create_user_async(
+        db, user_in=create_user_request, hashed_pin=hashed_pin
+    )
+
+
+@async_router.post("/login/token", response_model=Token)
+async def login_for_access_token_async(
+    request: Request,
+    login_request: LoginRequest,
+    db: AsyncSession = Depends(session.get_async_db),
+    rate_limiter: RateLimitBackend = Depends(get_rate_limit_backend),
+):
+    """
+    Authenticate a user and return a JWT access token.
+    """
+    limit_sign_in(rate_limiter, request, login_request.phone_number)
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect phone number or PIN",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user = await crud_user.get_user_by_phone_async(db, phone_number=login_request.phone_number)
+    if not user:
+        raise credentials_exception
+
+    try:
+        verified, new_hash = await pin_hasher.verify_and_update(
+            login_request.pin, user.hashed_pin
+        )
+    except PinHasherBusy:
+        raise pin_hasher_busy_exception()
+    if not verified:
+        raise credentials_exception
+
+    if new_hash:
+        await crud_user.update_user_pin_hash_async(db, user=user, hashed_pin=new_hash)
+
+    access_token = create_access_token(subject=user.phone_number)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@async_router.get("/profile", response_model=User)
+async def read_users_me_async(
+    current_user: User = Depends(dependencies.get_current_user_async),
+):
+    """
+    Fetch the profile of the currently authenticated user.
+    """
+    return current_user
+
+
+@async_router.get("/{user_id}", response_model=User)
+async def get_user_by_id_async(
+    user_id: uuid.UUID, db: AsyncSession = Depends(session.get_async_db)
+):
+    """
+    Fetch a user by their ID.
+    """
+    user = await crud_user.get_user_by_id_async(db, user_id=user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
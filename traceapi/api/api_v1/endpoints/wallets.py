@@ -0,0 +1,38 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from traceapi.crud.crud_wallet import get_or_create_user_wallet, get_wallet_transactions
+from traceapi.db import session
+from traceapi.schemas.user import User
+from traceapi.schemas.wallet import Transaction, Wallet
+from traceapi.utils import dependencies
+
+router = APIRouter()
+# No async handlers yet; with settings.ASYNC_DB requests fall through to `router`
+async_router = APIRouter()
+
+
+@router.get("/me", response_model=Wallet)
+def read_my_wallet(
+        db: Session = Depends(session.get_db),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Get the current user's wallet and balance, opening the wallet on first use.
+    """
+    return get_or_create_user_wallet(db, owner_id=current_user.id)
+
+
+@router.get("/me/transactions", response_model=List[Transaction])
+def read_my_transactions(
+        limit: int = Query(50, ge=1, le=200),
+        db: Session = Depends(session.get_db),
+        current_user: User = Depends(dependencies.get_current_user)
+):
+    """
+    Get the most recent ledger entries on the current user's wallet, newest first.
+    """
+    wallet = get_or_create_user_wallet(db, owner_id=current_user.id)
+    return get_wallet_transactions(db, wallet_id=wallet.id, limit=limit)
@@ -0,0 +1,124 @@
+import json
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from traceapi.core.config import settings
+
+
+class ChainBackend(ABC):
+    """
+    Where Merkle roots of contract batches are anchored. Only the root of each
+    batch is submitted, so the on-chain cost is per batch rather than per contract.
+    """
+
+    @abstractmethod
+    def submit_root(self, merkle_root: str, *, leaf_count: int) -> str:
+        """Records a Merkle root and returns its on-chain transaction/record ID."""
+
+    @abstractmethod
+    def get_root(self, on_chain_id: str) -> str | None:
+        """Returns the Merkle root recorded under `on_chain_id`, or None if unknown."""
+
+
+class LocalFileChainBackend(ChainBackend):
+    """
+    Stand-in chain for development and tests: an append-only JSON Lines file,
+    indexed in memory. Other processes (the anchoring CLI, other workers) append
+    to the same file, so an ID not yet indexed sends a read of what was added
+    since, and IDs are random rather than numbered from this process's view.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._roots: dict[str, str] = {}
+        # Bytes of the file already indexed; only complete lines are consumed
+        self._offset = 0
+
+    def _read_new_records(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as records:
+            records.seek(self._offset)
+            for line in records:
+                if not line.endswith(b"\n"):
+                    # Still being written by another process
+                    break
+                record = json.loads(line)
+                self._roots[record["on_chain_id"]] = record["merkle_root"]
+                self._offset += len(line)
+
+    def submit_root(self, merkle_root: str, *, leaf_count: int) -> str:
+        with self._lock:
+            on_chain_id = f"local:{uuid.uuid4().hex}"
+            record = {
+                "on_chain_id": on_chain_id,
+                "merkle_root": merkle_root,
+                "leaf_count": leaf_count,
+                "submitted_at": datetime.now(timezone.utc).isoformat(),
+            }
+            with self.path.open("a") as records:
+                records.write(json.dumps(record) + "\n")
+            # Indexed directly; the line is read again, harmlessly, on the next refresh
+            self._roots[on_chain_id] = merkle_root
+            return on_chain_id
+
+    def get_root(self, on_chain_id: str) -> str | None:
+        with self._lock:
+            if on_chain_id not in self._roots:
+                self._read_new_records()
+            return self._roots.get(on_chain_id)
+
+
+# Backends selectable with settings.ANCHOR_BACKEND; deployments register real chains here
+CHAIN_BACKENDS: dict[str, Callable[[], ChainBackend]] = {
+    "local": lambda: LocalFileChainBackend(settings.ANCHOR_LOCAL_PATH),
+}
+
+_backend: ChainBackend | None = None
+
+
+def register_chain_backend(name: str, factory: Callable[[], ChainBackend]) -> None:
+    CHAIN_BACKENDS[name] = factory
+
+
+def get_chain_backend() -> ChainBackend:
+    """Returns the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if settings.ANCHOR_BACKEND not in CHAIN_BACKENDS:
+            raise ValueError(f"Unknown anchor backend: {settings.ANCHOR_BACKEND}")
+        _backend = CHAIN_BACKENDS[settings.ANCHOR_BACKEND]()
+    return _backend
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    import time
+
+    from traceapi.crud.crud_anchor import anchor_all_signed_contracts
+    from traceapi.db.session import get_session_factory
+
+    parser = argparse.ArgumentParser(description="Anchor signed contracts on-chain in Merkle batches.")
+    parser.add_argument("--batch-size", type=int, default=settings.ANCHOR_BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=0, help="seconds between runs; 0 runs once and exits")
+    args = parser.parse_args(argv)
+
+    session_factory = get_session_factory()
+    backend = get_chain_backend()
+    while True:
+        with session_factory() as db:
+            batches = anchor_all_signed_contracts(db, backend=backend, batch_size=args.batch_size)
+            for batch in batches:
+                print(f"Anchored {batch.leaf_count} contracts under {batch.on_chain_id}")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
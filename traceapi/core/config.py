@@ -1,12 +1,28 @@
 import os
+from pydantic import Field
 from pydantic_settings import BaseSettings
 import secrets
 
+# Set by the Lambda runtime in every function container
+RUNNING_IN_LAMBDA = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.environ.get(
         "DATABASE_URL", "postgresql://user:password@db/mydatabase"
     )
+    # Serve the hot-path endpoints from async handlers on an asyncpg/aiosqlite engine.
+    # The async URL is derived from DATABASE_URL unless given explicitly.
+    ASYNC_DB: bool = False
+    ASYNC_DATABASE_URL: str | None = None
+
+    # --- Lambda execution mode ---
+    # A Lambda container handles one request at a time, so it keeps a single reused
+    # connection instead of a pool. Behind RDS Proxy, it holds no connection at all.
+    LAMBDA_MODE: bool = RUNNING_IN_LAMBDA
+    DB_BEHIND_PROXY: bool = False
+    # Recycle the container's connection before RDS/NAT idle timeouts can drop it
+    LAMBDA_POOL_RECYCLE_SECONDS: int = 300
 
     # --- JWT Settings ---
     # To generate a good secret key, run this in a Python shell:
@@ -16,6 +32,109 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # One week
 
+    # --- PIN hashing ---
+    # bcrypt cost factor. Raising it re-hashes existing PINs on their next successful login.
+    PIN_HASH_ROUNDS: int = 12
+    # Worker processes dedicated to bcrypt; 0 hashes on a thread in the API process instead.
+    # Lambda has no /dev/shm for process pool queues, so it always hashes on a thread.
+    PIN_HASH_WORKERS: int = 0 if RUNNING_IN_LAMBDA else 2
+    # Hash operations allowed in flight before sign-ins are shed with a 503.
+    PIN_HASH_MAX_PENDING: int = 64
+
+    # Render responses with pydantic-core rather than json.dumps. The JSON is the
+    # same, except that NaN/Infinity become null instead of failing the request.
+    FAST_JSON_RESPONSES: bool = False
+    # Responses at least this many bytes are gzipped for clients that accept it
+    GZIP_MINIMUM_SIZE: int = 1024
+
+    # --- Listings ---
+    # Largest batch accepted by POST /listings/bulk
+    LISTINGS_BULK_MAX_ITEMS: int = 1000
+    # Bytes allowed per item of a bulk body; larger bodies are refused with a 413
+    # before they are read in full
+    LISTINGS_BULK_MAX_ITEM_BYTES: int = 4096
+    # Rows fetched per round trip (and per streamed chunk) by the export endpoints
+    EXPORT_BATCH_SIZE: int = 1000
+    # Rendered public listing pages and search results, keyed by query string.
+    # Invalidation is per process, so the TTL bounds staleness across workers.
+    LISTINGS_CACHE_TTL_SECONDS: int = 30
+    LISTINGS_CACHE_MAX_SIZE: int = 256
+    # Sent with public listing responses for browsers and the CDN
+    LISTINGS_CACHE_CONTROL: str = "public, max-age=5, s-maxage=30, stale-while-revalidate=30"
+
+    # Contracts read per chunk by the integrity audit
+    INTEGRITY_CHUNK_SIZE: int = 1000
+
+    # --- Contract anchoring ---
+    # Signed contracts per Merkle batch; one root is anchored per batch
+    ANCHOR_BATCH_SIZE: int = 1024
+    # Key into core.anchoring.CHAIN_BACKENDS
+    ANCHOR_BACKEND: str = "local"
+    ANCHOR_LOCAL_PATH: str = "anchors.jsonl"
+
+    # --- Escrow settlement ---
+    # Contracts settled per transaction by `python -m traceapi.core.settlement`
+    SETTLEMENT_CHUNK_SIZE: int = 500
+
+    # --- Outbox dispatcher ---
+    # Run the dispatcher as a task inside the API process; otherwise run
+    # `python -m traceapi.core.outbox` separately (always the case in Lambda)
+    OUTBOX_IN_PROCESS: bool = False
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    # How long a claimed event is hidden from other dispatchers
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_BASE_SECONDS: float = 2.0
+    OUTBOX_RETRY_MAX_SECONDS: float = 600.0
+
+    # --- Idempotency keys ---
+    # How long a key's stored response is replayed; a key may be reused after this
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    # In-process LRU of stored responses in front of the idempotency_keys table
+    IDEMPOTENCY_CACHE_MAX_SIZE: int = 10_000
+
+    # --- Authenticated user cache ---
+    # Verified tokens are mapped to a user snapshot so protected endpoints skip the
+    # user lookup. Invalidation is per process, so the TTL bounds staleness across workers.
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10_000
+
+    # --- Sign-in rate limiting ---
+    # Token buckets per client IP and per phone number on register and login,
+    # checked before the user lookup and bcrypt. Mobile carriers put many users
+    # behind one address, so the IP bucket is the looser of the two.
+    RATE_LIMIT_ENABLED: bool = True
+    # Key into utils.rate_limit.RATE_LIMIT_BACKENDS; "memory" limits each process
+    # on its own, a shared backend limits across workers and Lambda containers
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Refill rates must be positive; to stop limiting, set RATE_LIMIT_ENABLED
+    RATE_LIMIT_IP_BURST: int = 30
+    RATE_LIMIT_IP_PER_MINUTE: float = Field(30, gt=0)
+    RATE_LIMIT_PHONE_BURST: int = 5
+    RATE_LIMIT_PHONE_PER_MINUTE: float = Field(1, gt=0)
+    # Load balancers in front of the app appending to X-Forwarded-For. 0 uses the
+    # connection's address, which is already the caller's under API Gateway.
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0
+
+    # --- Metrics ---
+    # Record per-route latency and status counts and serve them, with the pool,
+    # bcrypt and JWT timings, in Prometheus format at /metrics
+    METRICS_ENABLED: bool = True
+    # Also write each request as a CloudWatch Embedded Metric Format line to stdout,
+    # since a Lambda container cannot be scraped
+    METRICS_EMF_LOGS: bool = RUNNING_IN_LAMBDA
+    METRICS_NAMESPACE: str = "TRACE"
+    # Statements slower than this are logged with their caller and parameter types
+    SLOW_QUERY_SECONDS: float = 0.5
+    # Fraction of slow Postgres SELECTs logged with an EXPLAIN (ANALYZE, BUFFERS)
+    # plan. ANALYZE runs the query a second time, so keep this small.
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.0
+    # Send each request's query count and time as a Server-Timing header.
+    # For development: it tells any client how much database work a route does.
+    SERVER_TIMING_HEADER: bool = False
+
     class Config:
         env_file = ".env"
 
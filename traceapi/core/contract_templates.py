@@ -0,0 +1,77 @@
+import hashlib
+import json
+from datetime import date
+from functools import lru_cache
+
+from jinja2 import DictLoader, Environment, StrictUndefined, Template
+
+from traceapi.schemas.contract import ContractParameters
+
+# Version used for new contracts. Published versions must never be edited: a contract's
+# hash can only be reproduced from the exact template it was drafted with.
+CURRENT_TEMPLATE_VERSION = "v1"
+
+# These would be templates validated by Nigerian legal experts[cite: 63]
+TEMPLATES = {
+    "v1": """
+    --- LEGAL TRADE AGREEMENT ---
+    This contract is made on {{ contract_date }}.
+    
+    PARTIES:
+    - Seller ID: {{ seller_id }}
+    - Buyer ID: {{ buyer_id }}
+    
+    TERMS:
+    - Commodity: {{ commodity }}
+    - Quantity: {{ quantity_kg }} kg
+    - Price: USD ${{ price_per_kg_usd }}/kg
+    - Incoterm: {{ incoterm }}
+    
+    This agreement is governed by the laws of Nigeria. Both parties agree to the 
+    terms and conditions as laid out on the Farmily TRACE platform. Digital acceptance 
+    of this contract constitutes a legally binding signature.
+    """,
+}
+
+_environment = Environment(
+    loader=DictLoader(TEMPLATES),
+    autoescape=False,
+    undefined=StrictUndefined,
+    # Templates never change at runtime, so skip the per-render freshness check
+    auto_reload=False,
+)
+
+
+@lru_cache(maxsize=None)
+def get_template(version: str) -> Template:
+    """
+    Returns the compiled template for a version, compiling it on first use.
+    Raises KeyError for an unknown version.
+    """
+    if version not in TEMPLATES:
+        raise KeyError(f"Unknown contract template version: {version}")
+    return _environment.get_template(version)
+
+
+def canonical_parameters(params: ContractParameters) -> dict:
+    """
+    The JSON form of the parameters, computed once per contract and used for the
+    prose, the hash and the stored `parameters` column alike.
+    """
+    return params.model_dump(mode="json")
+
+
+def render_legal_prose(parameters: dict, *, contract_date: date, version: str = CURRENT_TEMPLATE_VERSION) -> str:
+    """
+    Generates human-readable legal text from canonical contract parameters.
+    """
+    return get_template(version).render(contract_date=contract_date.strftime("%Y-%m-%d"), **parameters).strip()
+
+
+def compute_contract_hash(legal_prose: str, parameters: dict) -> str:
+    """
+    SHA-256 over the prose followed by the canonical parameters with sorted keys,
+    so the contract cannot be altered without changing its hash[cite: 61].
+    """
+    payload = legal_prose + json.dumps(parameters, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
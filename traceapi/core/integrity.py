@@ -0,0 +1,153 @@
+import json
+import multiprocessing
+import os
+import uuid
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from traceapi.core.config import settings
+from traceapi.core.contract_templates import compute_contract_hash
+
+
+def find_hash_mismatches(rows: list[tuple]) -> list[dict]:
+    """
+    Recomputes the hash of each (id, legal_prose, parameters, contract_hash) row and
+    returns the rows whose stored hash no longer matches. Runs in the worker processes.
+    """
+    mismatches = []
+    for contract_id, legal_prose, parameters, contract_hash in rows:
+        computed = compute_contract_hash(legal_prose, parameters)
+        if computed != contract_hash:
+            mismatches.append({
+                "contract_id": str(contract_id),
+                "stored_hash": contract_hash,
+                "computed_hash": computed,
+            })
+    return mismatches
+
+
+def load_checkpoint(path: Path | None) -> dict:
+    if path is None or not path.exists():
+        return {"last_id": None, "checked": 0, "mismatches": 0}
+    return json.loads(path.read_text())
+
+
+def save_checkpoint(path: Path | None, checkpoint: dict) -> None:
+    if path is None:
+        return
+    # Write then rename, so an interrupted audit never leaves a torn checkpoint
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(checkpoint))
+    os.replace(tmp, path)
+
+
+class _Inline(Future):
+    """An already-completed future, for running without a worker pool."""
+
+    def __init__(self, result):
+        super().__init__()
+        self.set_result(result)
+
+
+def audit_contract_hashes(
+        session_factory: Callable[[], Session],
+        *,
+        chunk_size: int = 1000,
+        workers: int = 0,
+        user_id: uuid.UUID | None = None,
+        checkpoint_path: Path | None = None,
+        on_mismatches: Callable[[list[dict]], None] | None = None,
+) -> dict:
+    """
+    Checks every stored contract hash against its prose and parameters.
+
+    Contracts are read in keyset chunks, each in its own short-lived session, and
+    hashed in a process pool with a few chunks in flight, so memory and transaction
+    length stay bounded however large the table is. Chunks complete in order; after
+    each one the checkpoint records the last ID checked, and a rerun with the same
+    checkpoint resumes from there. Returns the running totals.
+    With `workers=0` hashing happens inline. `user_id` limits the audit to one party's contracts.
+    """
+    # Imported here so the worker processes, which only need find_hash_mismatches, stay light
+    from traceapi.crud.crud_contract import get_contract_hash_chunk
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    after = uuid.UUID(checkpoint["last_id"]) if checkpoint["last_id"] else None
+    executor: Executor | None = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    in_flight: deque[tuple[Future, uuid.UUID, int]] = deque()
+
+    def finish_oldest():
+        future, last_id, count = in_flight.popleft()
+        mismatches = future.result()
+        if mismatches and on_mismatches is not None:
+            on_mismatches(mismatches)
+        checkpoint["last_id"] = str(last_id)
+        checkpoint["checked"] += count
+        checkpoint["mismatches"] += len(mismatches)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    try:
+        while True:
+            with session_factory() as db:
+                rows = [tuple(row) for row in get_contract_hash_chunk(db, after=after, limit=chunk_size, user_id=user_id)]
+            if not rows:
+                break
+            after = rows[-1][0]
+            if executor is None:
+                future = _Inline(find_hash_mismatches(rows))
+            else:
+                future = executor.submit(find_hash_mismatches, rows)
+            in_flight.append((future, after, len(rows)))
+            if len(in_flight) > max(workers, 1) * 2:
+                finish_oldest()
+        while in_flight:
+            finish_oldest()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return checkpoint
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    import sys
+
+    from traceapi.db.session import get_session_factory
+
+    parser = argparse.ArgumentParser(description="Verify every stored contract hash against its prose and parameters.")
+    parser.add_argument("--chunk-size", type=int, default=settings.INTEGRITY_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", type=Path, help="resume from, and record progress in, this file")
+    parser.add_argument("--report", type=Path, help="append mismatches to this file as JSON Lines (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = args.report.open("a") if args.report else sys.stdout
+
+    def write_mismatches(mismatches: list[dict]) -> None:
+        for mismatch in mismatches:
+            report.write(json.dumps(mismatch) + "\n")
+        report.flush()
+
+    try:
+        totals = audit_contract_hashes(
+            get_session_factory(),
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            on_mismatches=write_mismatches,
+        )
+    finally:
+        if args.report:
+            report.close()
+    print(f"Checked {totals['checked']} contracts, {totals['mismatches']} mismatched", file=sys.stderr)
+    sys.exit(1 if totals["mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
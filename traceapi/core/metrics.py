@@ -0,0 +1,181 @@
+"""
+Prometheus metrics, served at /metrics, and CloudWatch Embedded Metric Format
+(EMF) log lines for Lambda, where there is no long-lived process to scrape.
+
+Recording is a histogram observe and a counter increment per request, so it is
+cheap enough to leave on for every route.
+"""
+
+import json
+import sys
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from sqlalchemy import Engine
+from sqlalchemy.pool import QueuePool
+
+from traceapi.core.config import settings
+
+# Requests that matched no route share one label, so scanners cannot blow up cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_SECONDS = Histogram(
+    "trace_http_request_duration_seconds",
+    "Time to serve a request, by route template",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "trace_http_requests",
+    "Requests served, by route template and status code",
+    ["method", "route", "status"],
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "trace_db_pool_wait_seconds",
+    "Time to check a connection out of the pool, including opening one on overflow",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+PIN_HASH_SECONDS = Histogram(
+    "trace_pin_hash_seconds",
+    "Time spent on bcrypt PIN hashing and verification, including waiting for a hasher worker",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.5, 5.0),
+)
+JWT_DECODE_SECONDS = Histogram(
+    "trace_jwt_decode_seconds",
+    "Time to verify and decode an access token",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+
+class PoolCollector(Collector):
+    """
+    Reports the state of each tracked engine's connection pool when scraped, so
+    nothing is recorded on checkout. The pool is looked up on every scrape
+    because `engine.dispose()` replaces it.
+    """
+
+    def __init__(self):
+        self.engines: dict[str, Engine] = {}
+
+    def collect(self):
+        checked_out = GaugeMetricFamily(
+            "trace_db_pool_checked_out", "Connections currently checked out of the pool", labels=["pool"]
+        )
+        overflow = GaugeMetricFamily(
+            "trace_db_pool_overflow", "Connections open beyond pool_size (negative while the pool is filling)",
+            labels=["pool"],
+        )
+        size = GaugeMetricFamily("trace_db_pool_size", "Configured pool_size", labels=["pool"])
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                # NullPool (behind RDS Proxy) keeps nothing to report
+                continue
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], pool.overflow())
+            size.add_metric([name], pool.size())
+        yield checked_out
+        yield overflow
+        yield size
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+def track_pool(name: str, engine: Engine) -> None:
+    """Adds `engine`'s pool to the gauges, labelled `pool=name`."""
+    pool_collector.engines[name] = engine
+
+
+class TimedPool:
+    """
+    Pool mixin observing how long each checkout takes into DB_POOL_WAIT_SECONDS.
+    A subclass rather than an event listener, because the pool has no event for
+    the start of a checkout, and `Pool.recreate()` keeps the class on dispose.
+    """
+
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self.metrics_label).observe(time.perf_counter() - started)
+
+
+def route_template(scope) -> str:
+    """The matched route's path template, e.g. `/api/v1/contracts/{contract_id}`; FastAPI puts the route on the scope."""
+    route = scope.get("route")
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+
+def write_emf(method: str, route: str, status_code: int, seconds: float) -> None:
+    """
+    Writes one request as a CloudWatch Embedded Metric Format line. Lambda sends
+    stdout to CloudWatch Logs, which turns the line into Latency, ClientErrors
+    and ServerErrors metrics per route; the status code is kept as a log field.
+    """
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": settings.METRICS_NAMESPACE,
+                "Dimensions": [["Route"]],
+                "Metrics": [
+                    {"Name": "Latency", "Unit": "Milliseconds"},
+                    {"Name": "ClientErrors", "Unit": "Count"},
+                    {"Name": "ServerErrors", "Unit": "Count"},
+                ],
+            }],
+        },
+        "Route": f"{method} {route}",
+        "StatusCode": status_code,
+        "Latency": round(seconds * 1000, 3),
+        "ClientErrors": int(400 <= status_code < 500),
+        "ServerErrors": int(status_code >= 500),
+    }
+    # Not through logging: the Lambda runtime prefixes log records, and CloudWatch
+    # only extracts metrics from lines that are pure JSON
+    sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class MetricsMiddleware:
+    """
+    Records latency and status per route template, e.g. `/api/v1/contracts/{contract_id}`.
+    Plain ASGI rather than BaseHTTPMiddleware, which would add a task and a
+    memory stream to every request. Latency runs until the last body chunk is
+    sent, so streamed exports are timed in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            template = route_template(scope)
+            method = scope["method"]
+            REQUEST_SECONDS.labels(method, template).observe(seconds)
+            REQUESTS.labels(method, template, str(status_code)).inc()
+            if settings.METRICS_EMF_LOGS:
+                write_emf(method, template, status_code, seconds)
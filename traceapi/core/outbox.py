@@ -0,0 +1,141 @@
+import asyncio
+import importlib
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from traceapi.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Handlers run with the dispatcher's session and the event payload. Delivery is at
+# least once, so handlers must be idempotent; their DB writes commit together with
+# the event being marked dispatched.
+OutboxHandler = Callable[[Session, dict], None]
+
+OUTBOX_HANDLERS: dict[str, list[OutboxHandler]] = defaultdict(list)
+
+# Modules that register handlers when imported; loaded before the first delivery
+HANDLER_MODULES = ("traceapi.crud.crud_wallet",)
+
+
+def outbox_handler(event_type: str) -> Callable[[OutboxHandler], OutboxHandler]:
+    """Registers the decorated function as a handler for `event_type`."""
+    def register(handler: OutboxHandler) -> OutboxHandler:
+        OUTBOX_HANDLERS[event_type].append(handler)
+        return handler
+    return register
+
+
+def load_outbox_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with full jitter, capped at OUTBOX_RETRY_MAX_SECONDS."""
+    ceiling = min(settings.OUTBOX_RETRY_MAX_SECONDS, settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** attempts)
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def dispatch_outbox_batch(db: Session, *, batch_size: int | None = None, now: datetime | None = None) -> int:
+    """
+    Claims a batch of due events and delivers each to its handlers, one transaction
+    per event so a failing event cannot undo its neighbours. A failed event is
+    retried with backoff until OUTBOX_MAX_ATTEMPTS, then marked failed.
+    Returns the number of events claimed.
+    """
+    from traceapi.crud import crud_outbox
+    from traceapi.db.models import utcnow
+
+    load_outbox_handlers()
+    now = now or utcnow()
+    events = crud_outbox.claim_outbox_events(
+        db,
+        limit=batch_size or settings.OUTBOX_BATCH_SIZE,
+        lease=timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        now=now,
+    )
+    for event_id, event_type, payload, attempts in events:
+        try:
+            for handler in OUTBOX_HANDLERS.get(event_type, ()):
+                handler(db, payload)
+            crud_outbox.mark_outbox_event_dispatched(db, event_id=event_id)
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Outbox event %s (%s) failed on attempt %d", event_id, event_type, attempts + 1, exc_info=True)
+            retry_at = None
+            if attempts + 1 < settings.OUTBOX_MAX_ATTEMPTS:
+                retry_at = utcnow() + retry_delay(attempts)
+            crud_outbox.mark_outbox_event_failed(db, event_id=event_id, error=repr(exc), retry_at=retry_at)
+            db.commit()
+    return len(events)
+
+
+class OutboxDispatcher:
+    """
+    Polls the outbox from an asyncio task. Full batches are followed immediately by
+    the next one; an empty or partial batch waits OUTBOX_POLL_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], *, batch_size: int | None = None, poll_interval: float | None = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.OUTBOX_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self._task: asyncio.Task | None = None
+
+    def run_once(self) -> int:
+        with self.session_factory() as db:
+            return dispatch_outbox_batch(db, batch_size=self.batch_size)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await run_in_threadpool(self.run_once)
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    from traceapi.db.session import get_session_factory
+
+    parser = argparse.ArgumentParser(description="Deliver outbox events to their handlers.")
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="deliver what is due now and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    dispatcher = OutboxDispatcher(get_session_factory(), batch_size=args.batch_size)
+    if args.once:
+        while dispatcher.run_once() == args.batch_size:
+            pass
+        return
+    asyncio.run(dispatcher.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,122 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 from traceapi.core.config import settings
+from traceapi.core.metrics import PIN_HASH_SECONDS
 
 from jose import jwt
 from passlib.context import CryptContext
 
 # We use passlib to handle password hashing. bcrypt is a strong hashing algorithm.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes below the configured cost are flagged by needs_update and upgraded on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PIN_HASH_ROUNDS,
+    bcrypt__min_rounds=settings.PIN_HASH_ROUNDS,
+)
 
 
 def verify_pin(plain_pin: str, hashed_pin: str) -> bool:
     """Verifies a plain text PIN against a hashed PIN."""
-    return pwd_context.verify(plain_pin, hashed_pin)
+    with PIN_HASH_SECONDS.labels("verify").time():
+        return pwd_context.verify(plain_pin, hashed_pin)
+
+
+def _hash_pin(pin: str) -> str:
+    return pwd_context.hash(pin)
 
 
 def get_pin_hash(pin: str) -> str:
     """Hashes a plain text PIN."""
-    return pwd_context.hash(pin)
+    with PIN_HASH_SECONDS.labels("hash").time():
+        return _hash_pin(pin)
+
+
+def _verify_and_update_pin(plain_pin: str, hashed_pin: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_pin, hashed_pin)
+
+
+def verify_and_update_pin(plain_pin: str, hashed_pin: str) -> tuple[bool, str | None]:
+    """
+    Verifies a PIN and, if the stored hash uses outdated settings, returns a
+    replacement hash as the second element.
+    """
+    with PIN_HASH_SECONDS.labels("verify").time():
+        return _verify_and_update_pin(plain_pin, hashed_pin)
+
+
+class PinHasherBusy(Exception):
+    """Raised when too many PIN hash operations are already in flight."""
+
+
+class PinHasher:
+    """
+    Runs bcrypt on a dedicated, size-bounded pool of worker processes so that
+    sign-in bursts cannot occupy the request threadpool. Work beyond `max_pending`
+    in-flight operations is rejected immediately with PinHasherBusy, as is work
+    whose pool broke twice: a dead worker breaks its pool, so an operation is
+    retried once on a fresh one.
+    Operations are timed here, as workers cannot report to /metrics; the time
+    includes waiting for a free worker, which is what a sign-in pays.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor | None:
+        if self.workers > 0 and self._executor is None:
+            # spawn rather than fork: the API process has live threads and DB connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise PinHasherBusy()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            for _ in range(2):
+                executor = self._get_executor()
+                try:
+                    return await loop.run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    # Concurrent callers share the broken pool; only the first replaces it
+                    if self._executor is executor:
+                        self._executor = None
+                        executor.shutdown(wait=False, cancel_futures=True)
+            raise PinHasherBusy()
+        finally:
+            self.pending -= 1
+
+    async def hash(self, pin: str) -> str:
+        """Hashes a plain text PIN off the event loop."""
+        with PIN_HASH_SECONDS.labels("hash").time():
+            return await self._run(_hash_pin, pin)
+
+    async def verify_and_update(self, plain_pin: str, hashed_pin: str) -> tuple[bool, str | None]:
+        """Verifies a PIN off the event loop; see `verify_and_update_pin`."""
+        with PIN_HASH_SECONDS.labels("verify").time():
+            return await self._run(_verify_and_update_pin, plain_pin, hashed_pin)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pin_hasher = PinHasher(
+    workers=settings.PIN_HASH_WORKERS, max_pending=settings.PIN_HASH_MAX_PENDING
+)
 
 
 def create_access_token(subject: Any, expires_delta: timedelta | None = None) -> str:
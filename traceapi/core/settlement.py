@@ -0,0 +1,23 @@
+from traceapi.core.config import settings
+
+
+def main(argv: list[str] | None = None) -> None:
+    """End-of-day settlement: release or refund escrow for every finished contract."""
+    import argparse
+    import json
+
+    from traceapi.crud.crud_settlement import settle_contracts
+    from traceapi.db.session import get_session_factory
+
+    parser = argparse.ArgumentParser(description="Release or refund escrow for COMPLETED and CANCELLED contracts.")
+    parser.add_argument("--chunk-size", type=int, default=settings.SETTLEMENT_CHUNK_SIZE,
+                        help="contracts per transaction")
+    args = parser.parse_args(argv)
+
+    with get_session_factory()() as db:
+        totals = settle_contracts(db, chunk_size=args.chunk_size)
+    print(json.dumps(totals))
+
+
+if __name__ == "__main__":
+    main()
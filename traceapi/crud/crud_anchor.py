@@ -0,0 +1,72 @@
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from traceapi.core.anchoring import ChainBackend
+from traceapi.db.models import AnchorBatch, Contract, utcnow
+from traceapi.schemas.contract import ContractStatus
+from traceapi.utils.merkle import build_levels, inclusion_proof, merkle_root, verify_proof
+
+# Contracts are anchored once both parties have signed; drafts and cancellations are not
+ANCHORABLE_STATUSES = (
+    ContractStatus.SIGNED,
+    ContractStatus.IN_PROGRESS,
+    ContractStatus.COMPLETED,
+    ContractStatus.DISPUTED,
+)
+
+def anchor_signed_contracts(db: Session, *, backend: ChainBackend, batch_size: int = 1024) -> AnchorBatch | None:
+    """
+    Anchors the next batch of signed, not yet anchored contracts: builds a Merkle
+    tree over their hashes, submits only the root to the chain backend, and stores
+    each contract's inclusion proof. Returns None when nothing is waiting.
+    Rows are locked with SKIP LOCKED on Postgres so concurrent anchor workers take
+    disjoint batches. If the commit fails after submission the contracts stay
+    unanchored and go out in a later batch; the orphaned root is harmless.
+    """
+    pending = db.execute(
+        select(Contract.id, Contract.contract_hash)
+        .where(Contract.anchor_batch_id.is_(None), Contract.status.in_(ANCHORABLE_STATUSES))
+        .order_by(Contract.created_at, Contract.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not pending:
+        return None
+
+    levels = build_levels([contract_hash for _, contract_hash in pending])
+    root = merkle_root(levels)
+    on_chain_id = backend.submit_root(root, leaf_count=len(pending))
+
+    batch = AnchorBatch(id=uuid.uuid4(), merkle_root=root, leaf_count=len(pending), on_chain_id=on_chain_id, created_at=utcnow())
+    db.add(batch)
+    db.flush()
+    # Bulk UPDATE by primary key: one executemany for the whole batch
+    db.execute(update(Contract), [
+        {
+            "id": contract_id,
+            "anchor_batch_id": batch.id,
+            "on_chain_id": on_chain_id,
+            "merkle_proof": inclusion_proof(levels, index),
+        }
+        for index, (contract_id, _) in enumerate(pending)
+    ])
+    db.commit()
+    return batch
+
+def anchor_all_signed_contracts(db: Session, *, backend: ChainBackend, batch_size: int = 1024) -> list[AnchorBatch]:
+    """Anchors batches until no signed contract is left unanchored."""
+    batches = []
+    while (batch := anchor_signed_contracts(db, backend=backend, batch_size=batch_size)) is not None:
+        batches.append(batch)
+    return batches
+
+def verify_contract_anchor(contract: Contract, *, backend: ChainBackend) -> bool:
+    """
+    Checks a contract's hash against the root anchored under its on_chain_id,
+    using only the stored proof: O(log n) hashes for a batch of n contracts.
+    """
+    if not contract.on_chain_id or contract.merkle_proof is None:
+        return False
+    root = backend.get_root(contract.on_chain_id)
+    return root is not None and verify_proof(contract.contract_hash, contract.merkle_proof, root)
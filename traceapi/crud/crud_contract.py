@@ -1,86 +1,235 @@
-import hashlib
 import uuid
-from datetime import datetime
-import json
-from sqlalchemy.orm import Session
-from traceapi.db.models import Contract, Listing, User
+from typing import Iterator, Sequence
+
+from sqlalchemy import Row, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, load_only
+from traceapi.core.contract_templates import (
+    CURRENT_TEMPLATE_VERSION,
+    canonical_parameters,
+    compute_contract_hash,
+    render_legal_prose,
+)
+from traceapi.crud.crud_outbox import CONTRACT_SIGNED, add_outbox_event
+from traceapi.db.models import Contract, Listing, User, utcnow
 from traceapi.schemas.contract import ContractParameters, ContractStatus
 
 
-def generate_legal_prose(params: ContractParameters) -> str:
-    """
-    Generates human-readable legal text from contract parameters.
-    This would be a template validated by Nigerian legal experts[cite: 63].
+def generate_legal_prose(params: ContractParameters, *, version: str = CURRENT_TEMPLATE_VERSION) -> str:
     """
-    prose = f"""
-    --- LEGAL TRADE AGREEMENT ---
-    This contract is made on {datetime.now().strftime('%Y-%m-%d')}.
-    
-    PARTIES:
-    - Seller ID: {params.seller_id}
-    - Buyer ID: {params.buyer_id}
-    
-    TERMS:
-    - Commodity: {params.commodity}
-    - Quantity: {params.quantity_kg} kg
-    - Price: USD ${params.price_per_kg_usd}/kg
-    - Incoterm: {params.incoterm}
-    
-    This agreement is governed by the laws of Nigeria. Both parties agree to the 
-    terms and conditions as laid out on the Farmily TRACE platform. Digital acceptance 
-    of this contract constitutes a legally binding signature.
+    Generates human-readable legal text from contract parameters, dated today.
     """
-    return prose.strip()
+    return render_legal_prose(canonical_parameters(params), contract_date=utcnow().date(), version=version)
 
-def create_contract_from_listing(db: Session, *, listing: Listing, buyer: User) -> Contract:
+def build_contract(*, listing: Listing, buyer: User) -> Contract:
     """
-    Creates a new contract in DRAFT status based on an offer for a listing.
+    Builds (without saving) a DRAFT contract for a buyer's offer on a listing.
     """
-    # 1. Define the machine-readable parameters [cite: 60]
-    params = ContractParameters(
-        buyer_id=str(buyer.id),
-        seller_id=str(listing.seller_id),
-        listing_id=str(listing.id),
+    # 1. Define the machine-readable parameters [cite: 60], serialized once for prose, hash and storage
+    contract_id = uuid.uuid4()
+    parameters = canonical_parameters(ContractParameters(
+        contract_id=contract_id,
+        buyer_id=buyer.id,
+        seller_id=listing.seller_id,
+        listing_id=listing.id,
         commodity=listing.commodity_name,
         quantity_kg=listing.quantity_kg,
         price_per_kg_usd=listing.price_per_kg_usd,
         incoterm=listing.incoterm.value
-    )
+    ))
 
-    # 2. Generate the human-readable legal prose [cite: 59]
-    legal_prose = generate_legal_prose(params)
+    # 2. Generate the human-readable legal prose [cite: 59] from the current template.
+    # created_at fixes the date in the prose, so the hash can be recomputed later.
+    created_at = utcnow()
+    legal_prose = render_legal_prose(parameters, contract_date=created_at.date())
 
     # 3. Create the cryptographic hash of the contract to ensure it's tamper-proof [cite: 61]
-    contract_data_string = legal_prose + json.dumps(params.model_dump(mode='json'), sort_keys=True)
-    contract_hash = hashlib.sha256(contract_data_string.encode()).hexdigest()
+    contract_hash = compute_contract_hash(legal_prose, parameters)
 
     # 4. Create the database object
-    db_contract = Contract(
+    return Contract(
+        id=contract_id,
         listing_id=listing.id,
         seller_id=listing.seller_id,
         buyer_id=buyer.id,
         legal_prose=legal_prose,
-        parameters=params.model_dump(mode='json'),
-        contract_hash=contract_hash
+        parameters=parameters,
+        contract_hash=contract_hash,
+        template_version=CURRENT_TEMPLATE_VERSION,
+        created_at=created_at,
     )
 
+def create_contract_from_listing(db: Session, *, listing: Listing, buyer: User, commit: bool = True) -> Contract:
+    """
+    Creates a new contract in DRAFT status based on an offer for a listing.
+    With `commit=False` it is only flushed, for the caller to commit.
+    """
+    db_contract = build_contract(listing=listing, buyer=buyer)
+    contract_id = db_contract.id
     db.add(db_contract)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    # Reload with the response relationships in one statement rather than refresh + lazy loads
+    return get_contract_by_id(db, contract_id=contract_id)
+
+# Matches the nesting of schemas.contract.Contract: buyer, seller and listing.seller
+CONTRACT_RESPONSE_LOADERS = (
+    joinedload(Contract.buyer),
+    joinedload(Contract.seller),
+    joinedload(Contract.listing).joinedload(Listing.seller),
+)
+
+def contract_loaders(fields: tuple[str, ...] | None = None) -> tuple:
+    """
+    Loader options for contract responses. With `fields` (a sparse fieldset) only
+    those columns are selected, plus the parties' IDs for the access check, and
+    only the requested relationships are joined.
+    """
+    if fields is None:
+        return CONTRACT_RESPONSE_LOADERS
+    relationships = dict(zip(("buyer", "seller", "listing"), CONTRACT_RESPONSE_LOADERS))
+    columns = [getattr(Contract, name) for name in fields if name not in relationships]
+    return (
+        load_only(*columns, Contract.buyer_id, Contract.seller_id),
+        *(loader for name, loader in relationships.items() if name in fields),
+    )
+
+# Flat columns written by the export endpoint; legal_prose is left to GET /contracts/{id}
+EXPORT_COLUMNS = (
+    Contract.id,
+    Contract.status,
+    Contract.listing_id,
+    Contract.seller_id,
+    Contract.buyer_id,
+    Contract.parameters,
+    Contract.contract_hash,
+    Contract.on_chain_id,
+)
+
+def create_contracts_from_listings(db: Session, *, listings: list[Listing], buyer: User) -> list[Contract]:
+    """
+    Drafts one contract per listing for the buyer in a single transaction, and
+    returns them reloaded with their response relationships in submission order.
+    """
+    db_contracts = [build_contract(listing=listing, buyer=buyer) for listing in listings]
+    contract_ids = [db_contract.id for db_contract in db_contracts]
+    db.add_all(db_contracts)
     db.commit()
-    db.refresh(db_contract)
-    return db_contract
+    return get_contracts_by_ids(db, contract_ids=contract_ids)
+
+def get_contracts_by_ids(db: Session, *, contract_ids: list[uuid.UUID]) -> list[Contract]:
+    """Fetches contracts by ID in one statement, in the order the IDs were given."""
+    contracts = (
+        db.query(Contract)
+        .options(*CONTRACT_RESPONSE_LOADERS)
+        .filter(Contract.id.in_(contract_ids))
+        .all()
+    )
+    by_id = {contract.id: contract for contract in contracts}
+    return [by_id[contract_id] for contract_id in contract_ids if contract_id in by_id]
 
-def get_contract_by_id(db: Session, *, contract_id: uuid.UUID) -> Contract | None:
-    """Fetches a single contract by its ID."""
-    return db.query(Contract).filter(Contract.id == contract_id).first()
+def get_contract_by_id(db: Session, *, contract_id: uuid.UUID, fields: tuple[str, ...] | None = None) -> Contract | None:
+    """
+    Fetches a single contract by its ID, with everything the response embeds, or
+    only the sparse fieldset `fields`.
+    """
+    return (
+        db.query(Contract)
+        .options(*contract_loaders(fields))
+        .filter(Contract.id == contract_id)
+        .first()
+    )
+
+def iter_user_contract_rows(db: Session, *, user_id: uuid.UUID, batch_size: int = 1000) -> Iterator[Sequence[Row]]:
+    """
+    Yields the contracts a user is buyer or seller on as batches of EXPORT_COLUMNS rows,
+    streamed with yield_per so memory stays flat.
+    """
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .where(or_(Contract.buyer_id == user_id, Contract.seller_id == user_id))
+        .order_by(Contract.id)
+    )
+    yield from db.execute(statement.execution_options(yield_per=batch_size)).partitions()
+
+def get_contract_hash_chunk(
+        db: Session,
+        *,
+        after: uuid.UUID | None = None,
+        limit: int = 1000,
+        user_id: uuid.UUID | None = None,
+) -> Sequence[Row]:
+    """
+    Fetches the next chunk of (id, legal_prose, parameters, contract_hash) rows in
+    ID order, seeking past `after` on the primary key rather than using an OFFSET.
+    """
+    statement = select(Contract.id, Contract.legal_prose, Contract.parameters, Contract.contract_hash)
+    if after is not None:
+        statement = statement.where(Contract.id > after)
+    if user_id is not None:
+        statement = statement.where(or_(Contract.buyer_id == user_id, Contract.seller_id == user_id))
+    return db.execute(statement.order_by(Contract.id).limit(limit)).all()
+
+def contract_signed_payload(contract: Contract) -> dict:
+    return {
+        "contract_id": str(contract.id),
+        "listing_id": str(contract.listing_id),
+        "seller_id": str(contract.seller_id),
+        "buyer_id": str(contract.buyer_id),
+        "contract_hash": contract.contract_hash,
+        "parameters": contract.parameters,
+    }
 
-def accept_contract(db: Session, *, contract: Contract) -> Contract:
+def accept_contract(db: Session, *, contract: Contract, commit: bool = True) -> Contract:
+    """
+    Updates a contract's status to SIGNED; see `create_contract_from_listing` for `commit`.
+    """
+    contract_id = contract.id
+    contract.status = ContractStatus.SIGNED
+    db.add(contract)
+    # Escrow funding and other follow-up work is delivered by the outbox dispatcher,
+    # so accepting costs one commit however slow those side effects are
+    add_outbox_event(db, event_type=CONTRACT_SIGNED, aggregate_id=contract_id, payload=contract_signed_payload(contract))
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return get_contract_by_id(db, contract_id=contract_id)
+
+# --- Async variants, used by the async routers (settings.ASYNC_DB) ---
+
+async def create_contract_from_listing_async(
+        db: AsyncSession, *, listing: Listing, buyer: User, commit: bool = True
+) -> Contract:
+    """Creates a new contract in DRAFT status based on an offer for a listing."""
+    db_contract = build_contract(listing=listing, buyer=buyer)
+    db.add(db_contract)
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
+    return await get_contract_by_id_async(db, contract_id=db_contract.id)
+
+async def get_contract_by_id_async(
+        db: AsyncSession, *, contract_id: uuid.UUID, fields: tuple[str, ...] | None = None
+) -> Contract | None:
+    """Fetches a single contract by its ID; see `get_contract_by_id`."""
+    statement = select(Contract).options(*contract_loaders(fields)).filter(Contract.id == contract_id)
+    return (await db.scalars(statement)).first()
+
+async def accept_contract_async(db: AsyncSession, *, contract: Contract, commit: bool = True) -> Contract:
     """
     Updates a contract's status to SIGNED.
+    The contract must have been loaded with `get_contract_by_id_async`; the async
+    session does not expire it on commit, so it is returned as is.
     """
     contract.status = ContractStatus.SIGNED
-    # Here is where we would later add a hook to trigger the escrow funding process
-    # for the Payments & Settlement module.
     db.add(contract)
-    db.commit()
-    db.refresh(contract)
-    return contract
\ No newline at end of file
+    add_outbox_event(db, event_type=CONTRACT_SIGNED, aggregate_id=contract.id, payload=contract_signed_payload(contract))
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
+    return contract
@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from traceapi.db.models import IdempotencyKey, utcnow
+
+def get_idempotency_key(db: Session, *, user_id: uuid.UUID, key: str) -> IdempotencyKey | None:
+    return db.get(IdempotencyKey, (user_id, key))
+
+def stage_idempotency_key(
+        db: Session | AsyncSession,
+        *,
+        user_id: uuid.UUID,
+        key: str,
+        fingerprint: str,
+        existing: IdempotencyKey | None = None,
+) -> IdempotencyKey:
+    """
+    Adds the key to the session without committing, so it is only saved by the
+    same commit as the request's effect and its response. A stale `existing` row
+    is reused.
+    """
+    if existing is not None:
+        existing.fingerprint = fingerprint
+        existing.status_code = None
+        existing.response_body = None
+        existing.created_at = utcnow()
+        return existing
+    record = IdempotencyKey(user_id=user_id, key=key, fingerprint=fingerprint, created_at=utcnow())
+    db.add(record)
+    return record
+
+def save_idempotent_response(db: Session, *, record: IdempotencyKey, status_code: int, body) -> None:
+    """Sets the staged key's response and commits it together with the request's effect."""
+    record.status_code = status_code
+    record.response_body = body
+    db.commit()
+
+def purge_expired_idempotency_keys(db: Session, *, before: datetime) -> int:
+    """Deletes keys created before `before`; returns how many."""
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < before))
+    db.commit()
+    return result.rowcount
+
+# --- Async variants, used by the async routers (settings.ASYNC_DB) ---
+
+async def get_idempotency_key_async(db: AsyncSession, *, user_id: uuid.UUID, key: str) -> IdempotencyKey | None:
+    return await db.get(IdempotencyKey, (user_id, key))
+
+async def save_idempotent_response_async(db: AsyncSession, *, record: IdempotencyKey, status_code: int, body) -> None:
+    record.status_code = status_code
+    record.response_body = body
+    await db.commit()
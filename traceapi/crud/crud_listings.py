@@ -1,7 +1,37 @@
 import uuid
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Iterator, Sequence
+
+from sqlalchemy import Row, Select, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session, joinedload, load_only
 from traceapi.db.models import Listing
-from traceapi.schemas.listing import ListingCreate
+from traceapi.schemas.listing import ListingCreate, ListingFilters, ListingSort
+from traceapi.utils.response_cache import listings_cache
+
+# Facet buckets returned per dimension, most populated first
+FACET_LIMIT = 20
+
+SORT_ORDERS = {
+    ListingSort.NEWEST: (Listing.created_at.desc(), Listing.id.desc()),
+    ListingSort.PRICE_ASC: (Listing.price_per_kg_usd.asc(), Listing.id.asc()),
+    ListingSort.PRICE_DESC: (Listing.price_per_kg_usd.desc(), Listing.id.desc()),
+    ListingSort.QUANTITY_DESC: (Listing.quantity_kg.desc(), Listing.id.desc()),
+}
+
+# Flat columns written by the export endpoint
+EXPORT_COLUMNS = (
+    Listing.id,
+    Listing.commodity_name,
+    Listing.quantity_kg,
+    Listing.price_per_kg_usd,
+    Listing.incoterm,
+    Listing.location_state,
+    Listing.location_lga,
+    Listing.notes,
+    Listing.seller_id,
+    Listing.created_at,
+)
 
 def create_listing(db: Session, *, listing_in: ListingCreate, seller_id: uuid.UUID) -> Listing:
     """Creates a new commodity listing in the database."""
@@ -11,13 +41,184 @@ def create_listing(db: Session, *, listing_in: ListingCreate, seller_id: uuid.UU
     )
     db.add(db_listing)
     db.commit()
+    listings_cache.invalidate()
     db.refresh(db_listing)
     return db_listing
 
-def get_listings(db: Session, skip: int = 0, limit: int = 100):
-    """Fetches all active listings with pagination."""
-    return db.query(Listing).filter(Listing.is_active == True).offset(skip).limit(limit).all()
+def create_listings_bulk(db: Session, *, listings_in: list[ListingCreate], seller_id: uuid.UUID) -> list[uuid.UUID]:
+    """
+    Creates many listings for one seller in a single transaction.
+    IDs are generated client-side so the rows go out as one executemany/multi-row
+    INSERT with no RETURNING or per-row refresh.
+    """
+    rows = [
+        {**listing_in.model_dump(), "id": uuid.uuid4(), "seller_id": seller_id}
+        for listing_in in listings_in
+    ]
+    if rows:
+        db.execute(insert(Listing), rows)
+        db.commit()
+        listings_cache.invalidate()
+    return [row["id"] for row in rows]
+
+def deactivate_listing(db: Session, *, listing: Listing) -> Listing:
+    """Takes a listing off the market; it stays on record for its contracts."""
+    listing.is_active = False
+    db.commit()
+    listings_cache.invalidate()
+    return listing
+
+def listing_loaders(fields: tuple[str, ...] | None = None) -> tuple:
+    """
+    Loader options for listing responses. With `fields` (a sparse fieldset) only
+    those columns are selected, plus created_at for the page cursor, and the
+    seller is joined only if asked for.
+    """
+    if fields is None:
+        return (joinedload(Listing.seller),)
+    columns = [getattr(Listing, name) for name in fields if name != "seller"]
+    loaders = [load_only(*columns, Listing.created_at)]
+    if "seller" in fields:
+        loaders.append(joinedload(Listing.seller))
+    return tuple(loaders)
+
+def _active_listings_statement(
+        skip: int, limit: int, after: tuple[datetime, uuid.UUID] | None, fields: tuple[str, ...] | None
+) -> Select:
+    statement = (
+        select(Listing)
+        .options(*listing_loaders(fields))
+        .filter(Listing.is_active == True)
+        .order_by(Listing.created_at.desc(), Listing.id.desc())
+    )
+    if after is not None:
+        statement = statement.filter(tuple_(Listing.created_at, Listing.id) < tuple_(*after))
+    else:
+        statement = statement.offset(skip)
+    return statement.limit(limit)
+
+def get_listings(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        after: tuple[datetime, uuid.UUID] | None = None,
+        fields: tuple[str, ...] | None = None,
+):
+    """
+    Fetches active listings, newest first, with each seller joined in so that
+    serializing the embedded `seller` does not issue a query per listing.
+    When `after` (the created_at/id of the last item seen) is given, the page is
+    located with a keyset seek on ix_listings_active_created_id instead of an OFFSET,
+    so every page costs the same regardless of depth.
+    `fields` narrows the SELECT to a sparse fieldset; see `listing_loaders`.
+    """
+    return db.scalars(_active_listings_statement(skip, limit, after, fields)).all()
 
 def get_listing_by_id(db: Session, listing_id: uuid.UUID) -> Listing | None:
     """Fetches a single listing by its ID."""
-    return db.query(Listing).filter(Listing.id == listing_id).first()
\ No newline at end of file
+    return db.query(Listing).filter(Listing.id == listing_id).first()
+
+def get_listings_by_ids(db: Session, listing_ids: list[uuid.UUID]) -> dict[uuid.UUID, Listing]:
+    """Fetches several listings in one statement, keyed by ID."""
+    listings = db.scalars(select(Listing).filter(Listing.id.in_(listing_ids))).all()
+    return {listing.id: listing for listing in listings}
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def filter_listings(query: Query, filters: ListingFilters, *, dialect: str, exclude: tuple[str, ...] = ()) -> Query:
+    """
+    Applies search filters to a query over active listings.
+    Filters named in `exclude` are skipped; facets use this to ignore their own filter.
+    On Postgres the commodity prefix/fuzzy match is served by the pg_trgm index;
+    elsewhere fuzzy matching falls back to a substring match.
+    """
+    query = query.filter(Listing.is_active == True)
+    if filters.commodity and "commodity" not in exclude:
+        term = filters.commodity.strip()
+        if filters.fuzzy and dialect == "postgresql":
+            query = query.filter(Listing.commodity_name.op("%")(term))
+        elif filters.fuzzy:
+            query = query.filter(Listing.commodity_name.ilike(f"%{_escape_like(term)}%", escape="\\"))
+        else:
+            query = query.filter(Listing.commodity_name.ilike(f"{_escape_like(term)}%", escape="\\"))
+    if filters.state and "state" not in exclude:
+        query = query.filter(Listing.location_state == filters.state)
+    if filters.lga and "state" not in exclude:
+        query = query.filter(Listing.location_lga == filters.lga)
+    if filters.incoterm:
+        query = query.filter(Listing.incoterm == filters.incoterm)
+    if filters.min_price is not None:
+        query = query.filter(Listing.price_per_kg_usd >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(Listing.price_per_kg_usd <= filters.max_price)
+    if filters.min_quantity is not None:
+        query = query.filter(Listing.quantity_kg >= filters.min_quantity)
+    if filters.max_quantity is not None:
+        query = query.filter(Listing.quantity_kg <= filters.max_quantity)
+    return query
+
+def _facet_counts(db: Session, column, filters: ListingFilters, *, dialect: str, exclude: str) -> list[dict]:
+    count = func.count(Listing.id)
+    query = filter_listings(db.query(column, count), filters, dialect=dialect, exclude=(exclude,))
+    rows = query.group_by(column).order_by(count.desc(), column).limit(FACET_LIMIT).all()
+    return [{"value": value, "count": n} for value, n in rows if value is not None]
+
+def search_listings(db: Session, *, filters: ListingFilters, skip: int = 0, limit: int = 20) -> dict:
+    """
+    Searches active listings and returns a page of results, the total match count
+    and state/commodity facet counts.
+    """
+    dialect = db.get_bind().dialect.name
+    matches = filter_listings(db.query(Listing), filters, dialect=dialect)
+    items = (
+        matches.options(joinedload(Listing.seller))
+        .order_by(*SORT_ORDERS[filters.sort])
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return {
+        "items": items,
+        "total": matches.count(),
+        "facets": {
+            "state": _facet_counts(db, Listing.location_state, filters, dialect=dialect, exclude="state"),
+            "commodity": _facet_counts(db, Listing.commodity_name, filters, dialect=dialect, exclude="commodity"),
+        },
+    }
+
+def iter_listing_rows(db: Session, *, filters: ListingFilters, batch_size: int = 1000) -> Iterator[Sequence[Row]]:
+    """
+    Yields every active listing matching `filters` as batches of EXPORT_COLUMNS rows.
+    yield_per streams the result (a server-side cursor on Postgres) and skips the
+    ORM identity map, so memory stays flat however many rows match.
+    """
+    dialect = db.get_bind().dialect.name
+    statement = filter_listings(select(*EXPORT_COLUMNS), filters, dialect=dialect).order_by(*SORT_ORDERS[filters.sort])
+    yield from db.execute(statement.execution_options(yield_per=batch_size)).partitions()
+
+
+# --- Async variants, used by the async routers (settings.ASYNC_DB) ---
+
+async def create_listing_async(db: AsyncSession, *, listing_in: ListingCreate, seller_id: uuid.UUID) -> Listing:
+    """Creates a new commodity listing and returns it with its seller loaded."""
+    db_listing = Listing(**listing_in.model_dump(), seller_id=seller_id)
+    db.add(db_listing)
+    await db.commit()
+    listings_cache.invalidate()
+    return await get_listing_by_id_async(db, listing_id=db_listing.id)
+
+async def get_listings_async(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        after: tuple[datetime, uuid.UUID] | None = None,
+        fields: tuple[str, ...] | None = None,
+):
+    """Fetches active listings, newest first; see `get_listings`."""
+    return (await db.scalars(_active_listings_statement(skip, limit, after, fields))).all()
+
+async def get_listing_by_id_async(db: AsyncSession, listing_id: uuid.UUID) -> Listing | None:
+    """Fetches a single listing by its ID, with its seller (async sessions cannot lazy load)."""
+    statement = select(Listing).options(joinedload(Listing.seller)).filter(Listing.id == listing_id)
+    return (await db.scalars(statement)).first()
@@ -0,0 +1,86 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Sequence
+
+from sqlalchemy import Row, select, update
+from sqlalchemy.orm import Session
+from traceapi.db.models import OutboxEvent, utcnow
+
+# Event types
+CONTRACT_SIGNED = "contract.signed"
+
+def add_outbox_event(db: Session, *, event_type: str, aggregate_id: uuid.UUID, payload: dict) -> OutboxEvent:
+    """
+    Stages an event in the caller's transaction; it is only visible to the
+    dispatcher if that transaction commits.
+    """
+    now = utcnow()
+    event = OutboxEvent(
+        id=uuid.uuid4(),
+        event_type=event_type,
+        aggregate_id=aggregate_id,
+        payload=payload,
+        created_at=now,
+        available_at=now,
+        attempts=0,
+    )
+    db.add(event)
+    return event
+
+def claim_outbox_events(db: Session, *, limit: int, lease: timedelta, now: datetime | None = None) -> Sequence[Row]:
+    """
+    Claims up to `limit` due events, oldest first, and commits, returning
+    (id, event_type, payload, attempts) rows. Claimed events are leased by pushing
+    available_at forward, so other dispatchers skip them and a crashed
+    dispatcher's events become due again once the lease runs out.
+    """
+    now = now or utcnow()
+    events = db.execute(
+        select(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload, OutboxEvent.attempts)
+        .where(
+            OutboxEvent.dispatched_at.is_(None),
+            OutboxEvent.failed_at.is_(None),
+            OutboxEvent.available_at <= now,
+        )
+        .order_by(OutboxEvent.available_at, OutboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if events:
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([event.id for event in events]))
+            .values(available_at=now + lease)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    return events
+
+def mark_outbox_event_dispatched(db: Session, *, event_id: uuid.UUID, now: datetime | None = None) -> None:
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id == event_id)
+        .values(dispatched_at=now or utcnow(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+
+def mark_outbox_event_failed(
+        db: Session,
+        *,
+        event_id: uuid.UUID,
+        error: str,
+        retry_at: datetime | None,
+        now: datetime | None = None,
+) -> None:
+    """Records a failed attempt; with no `retry_at` the event is given up on."""
+    values = {"attempts": OutboxEvent.attempts + 1, "last_error": error}
+    if retry_at is None:
+        values["failed_at"] = now or utcnow()
+    else:
+        values["available_at"] = retry_at
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id == event_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
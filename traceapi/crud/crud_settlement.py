@@ -0,0 +1,124 @@
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from traceapi.crud.crud_wallet import ESCROW_WALLET_ID, apply_balance_delta
+from traceapi.db.models import Contract, Transaction, Wallet, utcnow
+from traceapi.schemas.contract import ContractStatus
+from traceapi.schemas.wallet import TransactionType, WalletKind
+
+# What settlement does with the escrow held for a contract in each final status.
+# DISPUTED contracts keep their escrow until resolved into one of these.
+SETTLEMENTS = {
+    ContractStatus.COMPLETED: TransactionType.RELEASE,  # to the seller
+    ContractStatus.CANCELLED: TransactionType.REFUND,  # back to the buyer
+}
+
+def settlement_reference(contract_id: uuid.UUID) -> str:
+    return f"settle:{contract_id}"
+
+def settle_contracts_chunk(db: Session, *, chunk_size: int = 500, after: uuid.UUID | None = None) -> dict | None:
+    """
+    Settles the next chunk of COMPLETED and CANCELLED contracts (in ID order, after
+    `after`) in one transaction, returning counts and the chunk's last contract ID,
+    or None when nothing is left to settle.
+
+    Each contract still gets its own pair of ledger entries, referenced
+    settle:{contract_id}, but balances are netted per wallet: the escrow wallet and
+    each seller or buyer are updated once per chunk, however many of their contracts
+    it holds. Settled contracts are stamped with settled_at in the same transaction,
+    so a rerun skips them and a crash mid-chunk rolls the whole chunk back. The
+    references' unique constraint guards against double settlement by concurrent
+    runs; contract rows are also taken with SKIP LOCKED on Postgres.
+    Completed contracts whose escrow has not been funded yet are left for a later run.
+    """
+    statement = select(Contract.id, Contract.status, Contract.seller_id, Contract.buyer_id).where(
+        Contract.settled_at.is_(None), Contract.status.in_(list(SETTLEMENTS))
+    )
+    if after is not None:
+        statement = statement.where(Contract.id > after)
+    contracts = db.execute(
+        statement
+        .order_by(Contract.id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not contracts:
+        return None
+
+    # The amount each contract actually put into escrow
+    funded = dict(db.execute(
+        select(Transaction.contract_id, Transaction.amount_usd_cents).where(
+            Transaction.wallet_id == ESCROW_WALLET_ID,
+            Transaction.transaction_type == TransactionType.ESCROW,
+            Transaction.contract_id.in_([contract.id for contract in contracts]),
+        )
+    ).all())
+    parties = {contract.seller_id for contract in contracts} | {contract.buyer_id for contract in contracts}
+    wallet_ids = dict(db.execute(select(Wallet.owner_id, Wallet.id).where(Wallet.owner_id.in_(parties))).all())
+
+    now = utcnow()
+    deltas: dict[uuid.UUID, int] = defaultdict(int)
+    entries, settled = [], []
+    counts = {"released": 0, "refunded": 0, "unfunded": 0, "amount_usd_cents": 0}
+    for contract_id, status, seller_id, buyer_id in contracts:
+        amount = funded.get(contract_id)
+        if amount is None:
+            if status == ContractStatus.COMPLETED:
+                counts["unfunded"] += 1
+                continue
+            # Cancelled before escrow was funded: nothing to give back
+            settled.append({"id": contract_id, "settled_at": now})
+            continue
+
+        transaction_type = SETTLEMENTS[status]
+        payee = seller_id if transaction_type == TransactionType.RELEASE else buyer_id
+        if payee not in wallet_ids:
+            # A seller who has never opened their wallet gets one now
+            wallet_ids[payee] = uuid.uuid4()
+            db.execute(insert(Wallet).values(
+                id=wallet_ids[payee], owner_id=payee, kind=WalletKind.USER, balance_usd_cents=0, created_at=now
+            ))
+        payee_wallet_id = wallet_ids[payee]
+        deltas[ESCROW_WALLET_ID] -= amount
+        deltas[payee_wallet_id] += amount
+        entry = {
+            "transfer_id": uuid.uuid4(),
+            "contract_id": contract_id,
+            "transaction_type": transaction_type,
+            "reference": settlement_reference(contract_id),
+            "created_at": now,
+        }
+        entries.append({**entry, "id": uuid.uuid4(), "wallet_id": ESCROW_WALLET_ID, "amount_usd_cents": -amount})
+        entries.append({**entry, "id": uuid.uuid4(), "wallet_id": payee_wallet_id, "amount_usd_cents": amount})
+        settled.append({"id": contract_id, "settled_at": now})
+        counts["released" if transaction_type == TransactionType.RELEASE else "refunded"] += 1
+        counts["amount_usd_cents"] += amount
+
+    # One balance update per wallet, in id order like single transfers, so they cannot deadlock
+    for wallet_id in sorted(deltas):
+        if deltas[wallet_id]:
+            apply_balance_delta(db, wallet_id=wallet_id, delta=deltas[wallet_id], allow_negative=False)
+    if entries:
+        db.execute(insert(Transaction), entries)
+    if settled:
+        db.execute(update(Contract), settled)
+    db.commit()
+    counts["last_id"] = contracts[-1].id
+    return counts
+
+def settle_contracts(db: Session, *, chunk_size: int = 500) -> dict:
+    """
+    Runs settlement chunk by chunk until every eligible contract is settled, and
+    returns the totals. Safe to rerun at any time, including after a crash.
+    """
+    totals = {"chunks": 0, "released": 0, "refunded": 0, "unfunded": 0, "amount_usd_cents": 0}
+    after = None
+    # Keyset progress, so contracts left unsettled (unfunded) are not picked up again this run
+    while (counts := settle_contracts_chunk(db, chunk_size=chunk_size, after=after)) is not None:
+        totals["chunks"] += 1
+        for key in ("released", "refunded", "unfunded", "amount_usd_cents"):
+            totals[key] += counts[key]
+        after = counts["last_id"]
+    return totals
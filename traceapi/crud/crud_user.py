@@ -1,7 +1,11 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from traceapi.db.models import User
-from traceapi.schemas.user import UserCreate
+from traceapi.schemas.user import UserCreate, UserTier
 from traceapi.core.security import get_pin_hash
+from traceapi.utils.response_cache import listings_cache
+from traceapi.utils.user_cache import user_cache
 import uuid
 
 
@@ -15,10 +19,14 @@ def get_user_by_id(db: Session, *, user_id: uuid.UUID) -> User | None:
     return db.query(User).filter(User.id == user_id).first()
 
 
-def create_user(db: Session, *, user_in: UserCreate) -> User:
-    """Creates a new user in the database."""
+def create_user(db: Session, *, user_in: UserCreate, hashed_pin: str | None = None) -> User:
+    """
+    Creates a new user in the database.
+    Callers that already hashed the PIN (e.g. on the PIN hashing pool) pass `hashed_pin`.
+    """
     # Hash the pin before storing
-    hashed_pin = get_pin_hash(user_in.pin)
+    if hashed_pin is None:
+        hashed_pin = get_pin_hash(user_in.pin)
 
     # Create the User DB object
     db_user = User(
@@ -31,3 +39,69 @@ def create_user(db: Session, *, user_in: UserCreate) -> User:
     db.commit()
     db.refresh(db_user)
     return db_user
+
+
+def update_user_pin_hash(db: Session, *, user: User, hashed_pin: str) -> User:
+    """Replaces a user's stored PIN hash, e.g. after a bcrypt cost upgrade."""
+    user.hashed_pin = hashed_pin
+    db.add(user)
+    db.commit()
+    return user
+
+
+def update_user_tier(db: Session, *, user: User, tier: UserTier) -> User:
+    """
+    Changes a user's verification tier and drops their cached sessions, and the
+    cached listing pages that embed it.
+    """
+    user.tier = tier
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    user_cache.invalidate_user(user.id)
+    listings_cache.invalidate()
+    return user
+
+
+def deactivate_user(db: Session, *, user: User) -> User:
+    """
+    Deactivates a user account and drops their cached sessions, and the cached
+    listing pages that embed it.
+    """
+    user.is_active = False
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    user_cache.invalidate_user(user.id)
+    listings_cache.invalidate()
+    return user
+
+
+# --- Async variants, used by the async routers (settings.ASYNC_DB) ---
+
+
+async def get_user_by_phone_async(db: AsyncSession, *, phone_number: str) -> User | None:
+    """Fetches a user by their phone number."""
+    return (await db.scalars(select(User).filter(User.phone_number == phone_number))).first()
+
+
+async def get_user_by_id_async(db: AsyncSession, *, user_id: uuid.UUID) -> User | None:
+    """Fetches a user by their ID."""
+    return await db.get(User, user_id)
+
+
+async def create_user_async(db: AsyncSession, *, user_in: UserCreate, hashed_pin: str) -> User:
+    """Creates a new user from an already hashed PIN."""
+    db_user = User(phone_number=user_in.phone_number, hashed_pin=hashed_pin)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def update_user_pin_hash_async(db: AsyncSession, *, user: User, hashed_pin: str) -> User:
+    """Replaces a user's stored PIN hash, e.g. after a bcrypt cost upgrade."""
+    user.hashed_pin = hashed_pin
+    db.add(user)
+    await db.commit()
+    return user
@@ -0,0 +1,184 @@
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from traceapi.core.outbox import outbox_handler
+from traceapi.crud.crud_outbox import CONTRACT_SIGNED
+from traceapi.db.models import Contract, Transaction, Wallet, utcnow
+from traceapi.schemas.contract import ContractStatus
+from traceapi.schemas.wallet import TransactionType, WalletKind
+
+# Platform wallets have fixed IDs so transfers can name them without a lookup
+ESCROW_WALLET_ID = uuid.uuid5(uuid.NAMESPACE_URL, "trace:wallet:escrow")
+EXTERNAL_WALLET_ID = uuid.uuid5(uuid.NAMESPACE_URL, "trace:wallet:external")
+PLATFORM_WALLETS = {ESCROW_WALLET_ID: WalletKind.ESCROW, EXTERNAL_WALLET_ID: WalletKind.EXTERNAL}
+
+
+class InsufficientFunds(Exception):
+    """Raised when a debit would take a wallet below zero."""
+
+
+class WalletNotFound(Exception):
+    pass
+
+
+def contract_value_cents(parameters: dict) -> int:
+    """Total price of a contract's parameters in cents, rounded half up."""
+    value = Decimal(str(parameters["quantity_kg"])) * Decimal(str(parameters["price_per_kg_usd"])) * 100
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def get_wallet_by_owner(db: Session, *, owner_id: uuid.UUID) -> Wallet | None:
+    return db.scalars(select(Wallet).filter(Wallet.owner_id == owner_id)).first()
+
+def get_or_create_user_wallet(db: Session, *, owner_id: uuid.UUID) -> Wallet:
+    """Returns the user's wallet, opening an empty one on first use."""
+    wallet = get_wallet_by_owner(db, owner_id=owner_id)
+    if wallet is not None:
+        return wallet
+    wallet = Wallet(id=uuid.uuid4(), owner_id=owner_id, kind=WalletKind.USER, balance_usd_cents=0, created_at=utcnow())
+    db.add(wallet)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Opened concurrently by another request
+        db.rollback()
+        return get_wallet_by_owner(db, owner_id=owner_id)
+    return wallet
+
+def get_wallet_balance(db: Session, *, wallet_id: uuid.UUID) -> int | None:
+    """The materialized balance: a primary-key read, independent of ledger size."""
+    return db.scalar(select(Wallet.balance_usd_cents).filter(Wallet.id == wallet_id))
+
+def get_wallet_transactions(db: Session, *, wallet_id: uuid.UUID, limit: int = 50) -> list[Transaction]:
+    """A wallet's most recent ledger entries, newest first."""
+    return db.scalars(
+        select(Transaction)
+        .filter(Transaction.wallet_id == wallet_id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        .limit(limit)
+    ).all()
+
+def apply_balance_delta(db: Session, *, wallet_id: uuid.UUID, delta: int, allow_negative: bool) -> None:
+    """
+    Applies `delta` to a materialized balance with one conditional UPDATE. The row
+    lock it takes serializes concurrent moves on the wallet, and the balance check
+    happens under that lock, so two debits can never both spend the same funds.
+    """
+    statement = (
+        update(Wallet)
+        .where(Wallet.id == wallet_id)
+        .values(balance_usd_cents=Wallet.balance_usd_cents + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if delta < 0 and not allow_negative:
+        statement = statement.where(Wallet.balance_usd_cents >= -delta)
+    if db.execute(statement).rowcount == 1:
+        return
+
+    if wallet_id in PLATFORM_WALLETS and db.get(Wallet, wallet_id) is None:
+        # Platform wallets are opened by their first transfer. Concurrent first
+        # transfers may both get here; the savepoint undoes only the losing insert
+        try:
+            with db.begin_nested():
+                db.execute(insert(Wallet).values(
+                    id=wallet_id, owner_id=None, kind=PLATFORM_WALLETS[wallet_id], balance_usd_cents=0,
+                    created_at=utcnow(),
+                ))
+        except IntegrityError:
+            pass
+        return apply_balance_delta(db, wallet_id=wallet_id, delta=delta, allow_negative=allow_negative)
+    if db.get(Wallet, wallet_id) is None:
+        raise WalletNotFound(wallet_id)
+    raise InsufficientFunds(wallet_id)
+
+def get_transfer_by_reference(db: Session, *, wallet_id: uuid.UUID, reference: str) -> uuid.UUID | None:
+    return db.scalar(
+        select(Transaction.transfer_id).filter(Transaction.wallet_id == wallet_id, Transaction.reference == reference)
+    )
+
+def transfer(
+        db: Session,
+        *,
+        from_wallet_id: uuid.UUID,
+        to_wallet_id: uuid.UUID,
+        amount_usd_cents: int,
+        transaction_type: TransactionType,
+        contract_id: uuid.UUID | None = None,
+        reference: str | None = None,
+        commit: bool = True,
+) -> uuid.UUID:
+    """
+    Posts a double-entry transfer: debits one wallet, credits the other and appends
+    both ledger entries in one transaction. Returns the transfer ID.
+
+    With a `reference`, the transfer is idempotent: if the reference was already
+    posted against the debited wallet, the earlier transfer's ID is returned and
+    nothing moves. Raises InsufficientFunds if the debit would overdraw a wallet
+    (only the external wallet may go negative). With `commit=False` the caller owns
+    the transaction, and must roll back if this raises.
+    """
+    if amount_usd_cents <= 0:
+        raise ValueError("Transfer amount must be positive")
+    if reference is not None:
+        existing = get_transfer_by_reference(db, wallet_id=from_wallet_id, reference=reference)
+        if existing is not None:
+            return existing
+
+    # Lock the two rows in a fixed order so opposite transfers cannot deadlock
+    moves = sorted([(from_wallet_id, -amount_usd_cents), (to_wallet_id, amount_usd_cents)], key=lambda move: move[0])
+    for wallet_id, delta in moves:
+        apply_balance_delta(db, wallet_id=wallet_id, delta=delta, allow_negative=wallet_id == EXTERNAL_WALLET_ID)
+
+    transfer_id, now = uuid.uuid4(), utcnow()
+    entry = {
+        "transfer_id": transfer_id,
+        "contract_id": contract_id,
+        "transaction_type": transaction_type,
+        "reference": reference,
+        "created_at": now,
+    }
+    db.execute(insert(Transaction), [
+        {**entry, "id": uuid.uuid4(), "wallet_id": from_wallet_id, "amount_usd_cents": -amount_usd_cents},
+        {**entry, "id": uuid.uuid4(), "wallet_id": to_wallet_id, "amount_usd_cents": amount_usd_cents},
+    ])
+    if commit:
+        db.commit()
+    return transfer_id
+
+def deposit(db: Session, *, wallet_id: uuid.UUID, amount_usd_cents: int, reference: str) -> uuid.UUID:
+    """Credits funds arriving from outside the platform (on-ramp), once per reference."""
+    return transfer(
+        db,
+        from_wallet_id=EXTERNAL_WALLET_ID,
+        to_wallet_id=wallet_id,
+        amount_usd_cents=amount_usd_cents,
+        transaction_type=TransactionType.DEPOSIT,
+        reference=reference,
+    )
+
+@outbox_handler(CONTRACT_SIGNED)
+def fund_escrow(db: Session, payload: dict) -> None:
+    """
+    Moves the contract value from the buyer's wallet into escrow once the contract
+    is signed. Retried by the outbox (e.g. until the buyer has funds); the
+    reference makes redelivery a no-op. A contract cancelled before its escrow was
+    funded is skipped, so settlement has nothing to refund.
+    """
+    status = db.scalar(select(Contract.status).filter(Contract.id == uuid.UUID(payload["contract_id"])))
+    if status == ContractStatus.CANCELLED:
+        return
+    buyer_wallet = get_wallet_by_owner(db, owner_id=uuid.UUID(payload["buyer_id"]))
+    if buyer_wallet is None:
+        raise WalletNotFound(f"Buyer {payload['buyer_id']} has no wallet")
+    transfer(
+        db,
+        from_wallet_id=buyer_wallet.id,
+        to_wallet_id=ESCROW_WALLET_ID,
+        amount_usd_cents=contract_value_cents(payload["parameters"]),
+        transaction_type=TransactionType.ESCROW,
+        contract_id=uuid.UUID(payload["contract_id"]),
+        reference=f"escrow:{payload['contract_id']}",
+        commit=False,
+    )
@@ -0,0 +1,23 @@
+"""
+Creates the database schema.
+
+Run once per deployment, before starting the API:
+
+    python -m traceapi.db.init_db
+"""
+
+from sqlalchemy import Engine
+
+from traceapi.db import models  # noqa: F401  (registers the tables on Base.metadata)
+from traceapi.db.base_class import Base
+from traceapi.db.session import get_engine
+
+
+def init_db(engine: Engine | None = None) -> None:
+    """Creates any missing tables and indexes. Existing tables are left untouched."""
+    Base.metadata.create_all(bind=engine or get_engine())
+
+
+if __name__ == "__main__":
+    init_db()
+    print("Database schema is up to date.")
@@ -0,0 +1,181 @@
+"""
+Per-statement timing on the database engines, rolled up per request.
+
+Every statement is timed into `trace_db_statement_seconds` and added to the
+current request's QueryStats. Statements slower than SLOW_QUERY_SECONDS are
+logged with the calling function and the shape (not the values) of their bound
+parameters, and a sample of slow Postgres SELECTs can be logged with their
+`EXPLAIN (ANALYZE, BUFFERS)` plan. QueryStatsMiddleware reports each request's
+query count as a histogram and, with SERVER_TIMING_HEADER, in a `Server-Timing`
+response header that browser dev tools display.
+"""
+
+import logging
+import random
+import sys
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Histogram
+from sqlalchemy import Engine, event
+
+from traceapi.core.config import settings
+from traceapi.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_SECONDS = Histogram(
+    "trace_db_statement_seconds",
+    "Time to execute one SQL statement, by its leading keyword",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REQUEST_QUERIES = Histogram(
+    "trace_http_request_queries",
+    "SQL statements issued while serving a request, by route template",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+
+# Leading keywords reported as-is; anything else is "other"
+OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT"})
+
+
+class QueryStats:
+    """Statements issued, and the time spent on them, while serving one request."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+# Set by QueryStatsMiddleware. Sync endpoints run with a copy of the request's
+# context, which still refers to the same QueryStats object.
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+def statement_operation(statement: str) -> str:
+    words = statement[:16].split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in OPERATIONS else "other"
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """
+    The types of a statement's bound parameters, e.g. {'phone_number_1': 'str'}.
+    Values are left out of the log: they include phone numbers and PIN hashes.
+    """
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x {parameter_shape(rows[0]) if rows else '{}'}"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def calling_function() -> str | None:
+    """The innermost traceapi function outside the db package, usually a CRUD function."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("traceapi.") and not module.startswith("traceapi.db."):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    # Async sessions run statements on a greenlet, whose stack ends at the session call
+    return None
+
+
+def explain_analyze(conn, statement: str, parameters) -> str:
+    """
+    Runs `EXPLAIN (ANALYZE, BUFFERS)` for a statement that just ran, inside a
+    savepoint so a failure cannot abort the caller's transaction. ANALYZE
+    executes the statement again, which is why only SELECTs are explained.
+    """
+    explain_cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        explain_cursor.execute("SAVEPOINT trace_explain")
+        try:
+            explain_cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            return "\n".join(row[0] for row in explain_cursor.fetchall())
+        finally:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT trace_explain")
+    finally:
+        explain_cursor.close()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    STATEMENT_SECONDS.labels(statement_operation(statement)).observe(elapsed)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+    if elapsed < settings.SLOW_QUERY_SECONDS:
+        return
+    logger.warning(
+        "Slow query: %.1f ms in %s\n%s\nparameters: %s",
+        elapsed * 1000, calling_function() or "unknown caller", statement, parameter_shape(parameters, executemany),
+    )
+    if (
+        conn.dialect.name == "postgresql"
+        and not executemany
+        and statement_operation(statement) in ("SELECT", "WITH")
+        and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+    ):
+        try:
+            logger.warning("Slow query plan:\n%s", explain_analyze(conn, statement, parameters))
+        except Exception:
+            logger.warning("Could not EXPLAIN slow query", exc_info=True)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Times every statement `engine` executes; pass `async_engine.sync_engine` for async engines."""
+    if not event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    Collects the statements each request issues into a fresh QueryStats, and
+    reports the count per route. With SERVER_TIMING_HEADER the totals so far are
+    sent as `Server-Timing: db;dur=<ms>;desc="<n> queries"`; statements run
+    while a body streams are counted in the histogram only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_HEADER:
+                message["headers"] = [*message.get("headers", []), (b"server-timing", stats.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            REQUEST_QUERIES.labels(scope["method"], route_template(scope)).observe(stats.count)
@@ -1,13 +1,21 @@
 import uuid
+from datetime import datetime, timezone
 from sqlalchemy.dialects.postgresql import UUID, JSON # Import JSON type for structured data
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Column,
     String,
     Boolean,
+    DateTime,
     Enum as SAEnum,
     ForeignKey,
     Float,
-    Text
+    Index,
+    Integer,
+    Text,
+    UniqueConstraint,
+    event,
 )
 
 from sqlalchemy.orm import relationship
@@ -16,6 +24,12 @@ from ..db.base_class import Base
 from ..schemas.contract import ContractStatus
 from ..schemas.listing import Incoterm
 from ..schemas.user import UserTier, DocumentStatus
+from ..schemas.wallet import TransactionStatus, TransactionType, WalletKind
+
+
+def utcnow() -> datetime:
+    """Timezone-aware default for timestamp columns."""
+    return datetime.now(timezone.utc)
 
 
 class User(Base):
@@ -96,6 +110,7 @@ class Listing(Base):
     incoterm = Column(SAEnum(Incoterm), nullable=False)
     notes = Column(Text, nullable=True)
     is_active = Column(Boolean(), default=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
 
     # Foreign Key to the User who created the listing
     seller_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -106,6 +121,29 @@ class Listing(Base):
     # Add the missing contracts relationship
     contracts = relationship("Contract", back_populates="listing")
 
+    __table_args__ = (
+        # Backs keyset pagination: active listings ordered by (created_at, id)
+        Index("ix_listings_active_created_id", "is_active", "created_at", "id"),
+        # Back listing search: browsing a region, and a commodity by price
+        Index("ix_listings_active_state_commodity", "is_active", "location_state", "commodity_name"),
+        Index("ix_listings_active_commodity_price", "is_active", "commodity_name", "price_per_kg_usd"),
+        # Case-insensitive prefix and fuzzy commodity matching (Postgres only)
+        Index(
+            "ix_listings_commodity_trgm",
+            "commodity_name",
+            postgresql_using="gin",
+            postgresql_ops={"commodity_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# The trigram index above needs pg_trgm to exist before the table is created
+event.listen(
+    Listing.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 class Contract(Base):
     __tablename__ = "contracts"
 
@@ -122,8 +160,119 @@ class Contract(Base):
     parameters = Column(JSON, nullable=False) # Store the machine-readable part as JSON
     contract_hash = Column(String(64), nullable=False, unique=True) # For SHA-256 hash
     on_chain_id = Column(String, nullable=True) # For the blockchain record ID
+    # Prose template the contract was drafted with; with created_at it reproduces the hash
+    template_version = Column(String(20), nullable=False, default="v1")
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    # Merkle anchoring: the batch whose root is on-chain, and this contract's sibling path to it
+    anchor_batch_id = Column(UUID(as_uuid=True), ForeignKey("anchor_batches.id"), nullable=True, index=True)
+    merkle_proof = Column(JSON, nullable=True)
+
+    # Set once escrow has been released (COMPLETED) or refunded (CANCELLED)
+    settled_at = Column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     listing = relationship("Listing", back_populates="contracts")
     seller = relationship("User", foreign_keys=[seller_id], back_populates="contracts_as_seller")
-    buyer = relationship("User", foreign_keys=[buyer_id], back_populates="contracts_as_buyer")
\ No newline at end of file
+    buyer = relationship("User", foreign_keys=[buyer_id], back_populates="contracts_as_buyer")
+    anchor_batch = relationship("AnchorBatch", back_populates="contracts")
+
+class AnchorBatch(Base):
+    """A batch of signed contract hashes whose Merkle root was anchored on-chain."""
+    __tablename__ = "anchor_batches"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    merkle_root = Column(String(64), nullable=False)
+    leaf_count = Column(Integer, nullable=False)
+    on_chain_id = Column(String, nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    contracts = relationship("Contract", back_populates="anchor_batch")
+
+
+class OutboxEvent(Base):
+    """
+    A side effect to deliver after a commit (e.g. fund escrow once a contract is
+    signed). Written in the same transaction as the change that causes it, and
+    delivered at least once by the outbox dispatcher.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # The dispatcher's claim query: undelivered events that are due
+        Index("ix_outbox_events_pending", "dispatched_at", "failed_at", "available_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_type = Column(String(64), nullable=False)
+    aggregate_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    # Earliest next delivery attempt; pushed forward while claimed and after each failure
+    available_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+    # Set once attempts are exhausted; the event is then left for manual replay
+    failed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class Wallet(Base):
+    """
+    A ledger account. `balance_usd_cents` is the materialized sum of the wallet's
+    ledger entries, kept in step by the ledger in the same transaction as each entry.
+    """
+    __tablename__ = "wallets"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # One wallet per user; platform wallets (escrow, external) have no owner
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, unique=True)
+    kind = Column(SAEnum(WalletKind), default=WalletKind.USER, nullable=False)
+    balance_usd_cents = Column(BigInteger, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class Transaction(Base):
+    """
+    One leg of a double-entry transfer. Entries are append-only: every transfer
+    writes a debit and a credit sharing a transfer_id, summing to zero.
+    """
+    __tablename__ = "wallet_transactions"
+    __table_args__ = (
+        # Idempotency: a reference can move a wallet at most once
+        UniqueConstraint("wallet_id", "reference", name="uq_wallet_transactions_wallet_reference"),
+        Index("ix_wallet_transactions_wallet_created", "wallet_id", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    transfer_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey("wallets.id"), nullable=False)
+    contract_id = Column(UUID(as_uuid=True), ForeignKey("contracts.id"), nullable=True, index=True)
+    transaction_type = Column(SAEnum(TransactionType), nullable=False)
+    status = Column(SAEnum(TransactionStatus), default=TransactionStatus.COMPLETED, nullable=False)
+    amount_usd_cents = Column(BigInteger, nullable=False)
+    reference = Column(String(100), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+def _reject_ledger_rewrite(mapper, connection, target):
+    raise ValueError("Ledger entries are append-only; post a correcting transfer instead")
+
+event.listen(Transaction, "before_update", _reject_ledger_rewrite)
+event.listen(Transaction, "before_delete", _reject_ledger_rewrite)
+
+
+class IdempotencyKey(Base):
+    """
+    A client-supplied Idempotency-Key and the response first returned for it.
+    The row is written in the same transaction as the request's effect; the
+    response is filled in right after.
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Hash of the method, path and body, to catch a key reused for a different request
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
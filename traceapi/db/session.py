@@ -1,19 +1,119 @@
+from functools import lru_cache
+
 from traceapi.core.config import settings
-from sqlalchemy import create_engine
+from traceapi.core.metrics import TimedPool, track_pool
+from traceapi.db.instrumentation import instrument_engine
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-
-# Create the SQLAlchemy engine
-# The 'pool_pre_ping' argument checks for "stale" connections and reconnects if necessary.
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 
 # Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# It is bound to the engine on first use, so importing the app opens no connections.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# Async drivers for the sync URLs we are configured with
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+# Configured with an engine on first use so the async driver is only imported when needed.
+# expire_on_commit=False: attributes cannot be lazily reloaded once the session awaits.
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+# The default pools, reporting checkout wait times to /metrics
+class TimedQueuePool(TimedPool, QueuePool):
+    metrics_label = "sync"
+
+
+class TimedAsyncAdaptedQueuePool(TimedPool, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def engine_options() -> dict:
+    """
+    Connection pool settings for the current execution mode.
+    The 'pool_pre_ping' argument checks for "stale" connections and reconnects if necessary,
+    which matters most in Lambda, where a frozen container's connection may have been dropped.
+    """
+    if settings.LAMBDA_MODE and settings.DB_BEHIND_PROXY:
+        # RDS Proxy multiplexes connections across containers; don't hold one here
+        return {"poolclass": NullPool}
+    if settings.LAMBDA_MODE:
+        # One request at a time per container: one connection, reused across invocations
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": 1,
+            "max_overflow": 0,
+            "pool_recycle": settings.LAMBDA_POOL_RECYCLE_SECONDS,
+            "pool_pre_ping": True,
+        }
+    return {"poolclass": TimedQueuePool, "pool_pre_ping": True}
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """
+    Creates the SQLAlchemy engine on first use.
+    """
+    sync_engine = create_engine(settings.DATABASE_URL, **engine_options())
+    SessionLocal.configure(bind=sync_engine)
+    track_pool("sync", sync_engine)
+    instrument_engine(sync_engine)
+    return sync_engine
+
+
+def __getattr__(name: str):
+    # Keeps `from traceapi.db.session import engine` working without creating it at import
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # This function will be used as a FastAPI dependency to get a DB session per request
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Dependency for streaming responses: the request's `get_db` session is closed before
+# the body is sent, so the stream opens its own session from this factory
+def get_session_factory() -> sessionmaker:
+    get_engine()
+    return SessionLocal
+
+
+def async_database_url(url: str) -> str:
+    """Maps a sync database URL onto its async driver, e.g. postgresql:// -> postgresql+asyncpg://"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+@lru_cache(maxsize=None)
+def get_async_engine() -> AsyncEngine:
+    """Creates the async engine on first use."""
+    url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    if settings.LAMBDA_MODE:
+        # Each invocation may run on a fresh event loop, and pooled async connections
+        # are bound to the loop that opened them
+        async_engine = create_async_engine(url, poolclass=NullPool)
+    else:
+        async_engine = create_async_engine(url, poolclass=TimedAsyncAdaptedQueuePool, pool_pre_ping=True)
+    AsyncSessionLocal.configure(bind=async_engine)
+    track_pool("async", async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+# The async counterpart of get_db, used by the async routers
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
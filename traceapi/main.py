@@ -1,26 +1,84 @@
 """main.py"""
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from traceapi.api.api_v1.endpoints import users as user_router
 from traceapi.api.api_v1.endpoints import listings as listing_router
 from traceapi.api.api_v1.endpoints import contracts as contract_router
-from traceapi.db.base_class import Base
-from traceapi.db.session import engine
+from traceapi.api.api_v1.endpoints import wallets as wallet_router
+from traceapi.core.config import settings
+from traceapi.core.metrics import MetricsMiddleware
+from traceapi.core.security import pin_hasher
+from traceapi.db.instrumentation import QueryStatsMiddleware
+from traceapi.utils.responses import PydanticJSONResponse
+
+# Importing the app must stay cheap: it runs on every process start, including each
+# Lambda cold start. The schema is created by `python -m traceapi.db.init_db`, and the
+# database engine is only created when the first request needs it.
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    dispatcher = None
+    if settings.OUTBOX_IN_PROCESS:
+        # Imported only when enabled, keeping the default import path lean
+        from traceapi.core.outbox import OutboxDispatcher
+        from traceapi.db.session import get_session_factory
+
+        dispatcher = OutboxDispatcher(get_session_factory())
+        dispatcher.start()
+    yield
+    if dispatcher is not None:
+        await dispatcher.stop()
+    pin_hasher.shutdown()
 
-# This command will create the database tables based on our SQLAlchemy models
-# It's good for initial setup. For production and updates, we will use Alembic migrations.
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="TRACE Platform API",
     description="The official API for the TRACE Digital Commodities Exchange.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=PydanticJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse,
 )
+# Listing pages and contracts with their legal prose compress several times over
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+if settings.METRICS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+    # Added last so it is outermost and times compression too
+    app.add_middleware(MetricsMiddleware)
+
+
+def include_routers(target: FastAPI, *, async_db: bool = False) -> None:
+    """
+    Mounts the v1 routers. With `async_db`, each module's async handlers are mounted
+    first so they take precedence; endpoints without an async variant fall through
+    to the sync router.
+    """
+    routers = [
+        (user_router, "/api/v1/users", ["Users"]),
+        (listing_router, "/api/v1/listings", ["Listings"]),
+        (contract_router, "/api/v1/contracts", ["Contracts"]),
+        (wallet_router, "/api/v1/wallets", ["Wallets"]),
+    ]
+    for module, prefix, tags in routers:
+        if async_db:
+            target.include_router(module.async_router, prefix=prefix, tags=tags)
+        target.include_router(module.router, prefix=prefix, tags=tags)
+
+
+include_routers(app, async_db=settings.ASYNC_DB)
 
-app.include_router(user_router.router, prefix="/api/v1/users", tags=["Users"])
-app.include_router(listing_router.router, prefix="/api/v1/listings", tags=["Listings"])
-app.include_router(contract_router.router, prefix="/api/v1/contracts", tags=["Contracts"])
 
 @app.get("/", name="TRACE Index")
 def api_index():
     return {"message": "Welcome to the Farmily TRACE API"}
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,7 +1,8 @@
 import uuid
+from datetime import datetime
 from pydantic import BaseModel, Field
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 
 from .listing import Listing # We'll need listing details
 from .user import User # And user details
@@ -23,6 +24,11 @@ class OfferCreate(BaseModel):
     offered_price_per_kg_usd: float = Field(..., gt=0)
 
 
+# Offers on several listings, drafted together in one transaction
+class OfferBatchCreate(BaseModel):
+    offers: List[OfferCreate] = Field(..., min_length=1, max_length=100)
+
+
 # --- Contract Schemas ---
 # The machine-readable component of the Ricardian Contract
 class ContractParameters(BaseModel):
@@ -33,6 +39,9 @@ class ContractParameters(BaseModel):
     quantity_kg: float
     price_per_kg_usd: float
     incoterm: str # Using a simple string for the machine part
+    # Makes every contract's hash unique, including repeat offers on the same day.
+    # Absent from contracts drafted before it was added; their hashes exclude it.
+    contract_id: Optional[uuid.UUID] = None
     # We will add payment_schedule, shipping_deadlines here later
     # as per the PRD [cite: 56]
 
@@ -49,10 +58,36 @@ class Contract(BaseModel):
     contract_hash: str
     # A link to the on-chain record (placeholder for now) [cite: 56, 62]
     on_chain_id: Optional[str] = None
+    # Version of the legal prose template used to draft the contract
+    template_version: str
+    created_at: datetime
 
     buyer: User
     seller: User
     listing: Listing
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Everything needed to check a contract against its anchored Merkle root
+class ContractAnchorProof(BaseModel):
+    contract_id: uuid.UUID
+    contract_hash: str
+    on_chain_id: str
+    merkle_root: str
+    # Sibling hashes from the contract's leaf up to the root, as [side, hash] pairs
+    proof: List[List[str]]
+    verified: bool
+
+
+
+class ContractHashMismatch(BaseModel):
+    contract_id: uuid.UUID
+    stored_hash: str
+    computed_hash: str
+
+
+class ContractIntegrityReport(BaseModel):
+    checked: int
+    mismatches: List[ContractHashMismatch]
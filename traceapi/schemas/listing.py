@@ -1,7 +1,7 @@
 from enum import Enum
 import uuid
 from pydantic import BaseModel, Field
-from typing import Optional, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .user import UserTier
@@ -13,6 +13,14 @@ class Incoterm(str, Enum):
     CIF = "Cost, Insurance, and Freight"
 
 
+# Sort orders offered by listing search
+class ListingSort(str, Enum):
+    NEWEST = "newest"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    QUANTITY_DESC = "quantity_desc"
+
+
 # --- Listing Schemas ---
 
 
@@ -56,4 +64,54 @@ class Listing(ListingBase):
     seller: UserInDB
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# --- Bulk Creation Schemas ---
+
+
+class BulkItemError(BaseModel):
+    index: int = Field(..., description="Position of the item in the submitted batch")
+    errors: List[dict]
+
+
+class BulkListingResult(BaseModel):
+    created: List[uuid.UUID] = Field(..., description="IDs of the created listings, in submission order")
+    errors: List[BulkItemError]
+
+
+# --- Search Schemas ---
+
+
+# Filters shared by listing search and export
+class ListingFilters(BaseModel):
+    commodity: Optional[str] = Field(
+        None, max_length=100, description="Commodity name prefix (or fragment when fuzzy)"
+    )
+    fuzzy: bool = False
+    state: Optional[str] = None
+    lga: Optional[str] = None
+    incoterm: Optional[Incoterm] = None
+    min_price: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+    min_quantity: Optional[float] = Field(None, ge=0)
+    max_quantity: Optional[float] = Field(None, ge=0)
+    sort: ListingSort = ListingSort.NEWEST
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+# Each facet is counted with every filter applied except its own,
+# so buyers can see what they would get by switching state or commodity
+class ListingFacets(BaseModel):
+    state: List[FacetCount]
+    commodity: List[FacetCount]
+
+
+class ListingSearchResults(BaseModel):
+    items: List[Listing]
+    total: int
+    facets: ListingFacets
@@ -218,4 +218,6 @@ class LoginRequest(BaseModel):
 from . import listing
 User.model_rebuild()
 UserWithListings.model_rebuild()
-listing.Listing.model_rebuild()
\ No newline at end of file
+listing.UserInDB.model_rebuild()
+listing.Listing.model_rebuild()
+listing.ListingSearchResults.model_rebuild()
\ No newline at end of file
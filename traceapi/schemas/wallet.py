@@ -11,6 +11,11 @@ class TransactionType(str, Enum):
     RELEASE = "RELEASE" # Releasing funds from escrow to seller
     REFUND = "REFUND" # Refunding buyer from escrow
 
+class WalletKind(str, Enum):
+    USER = "USER" # A user's own funds
+    ESCROW = "ESCROW" # Platform account holding funds for open trades
+    EXTERNAL = "EXTERNAL" # Counterpart of on/off-ramp movements; may go negative
+
 class TransactionStatus(str, Enum):
     PENDING = "PENDING"
     COMPLETED = "COMPLETED"
@@ -34,7 +39,9 @@ class Transaction(BaseModel):
     contract_id: Optional[uuid.UUID] = None
     transaction_type: TransactionType
     status: TransactionStatus
+    # Signed: negative for the debited leg of a transfer, positive for the credited leg
     amount_usd_cents: int
+    reference: Optional[str] = None
     created_at: datetime
 
     class Config:
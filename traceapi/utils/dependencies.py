@@ -1,51 +1,93 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from traceapi.crud import crud_user
-from traceapi.db import models
 from traceapi.schemas import user as UserSchema
 from traceapi.core.config import settings
-from traceapi.db.session import get_db
+from traceapi.core.metrics import JWT_DECODE_SECONDS
+from traceapi.db.session import get_async_db, get_db
+from traceapi.utils.user_cache import user_cache
 
 # HTTP Bearer scheme for JWT tokens
 bearer = HTTPBearer()
 
 
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Decodes a JWT access token, returning its claims.
+    Raises a 401 HTTPException if the token is invalid or has no subject.
+    """
+    try:
+        with JWT_DECODE_SECONDS.time():
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+    except JWTError as exc:
+        raise credentials_exception() from exc
+    if payload.get("sub") is None:
+        raise credentials_exception()
+    return payload
+
+
 def get_current_user(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(bearer),
-) -> models.User:
+) -> UserSchema.User:
     """
     Dependency to get the current authenticated user.
     Decodes the JWT token from the request and retrieves the user from the database.
+    Verified tokens are cached with a snapshot of the user, so repeat requests
+    skip both the decode and the database lookup.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    # Extract the token string from HTTPAuthorizationCredentials
+    token = credentials.credentials
+    cached_user = user_cache.get(token)
+    if cached_user is not None:
+        return cached_user
 
-    try:
-        # Extract the token string from HTTPAuthorizationCredentials
-        token = credentials.credentials
-
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        phone_number: str = payload.get("sub")
-        if phone_number is None:
-            raise credentials_exception
-        token_data = UserSchema.TokenData(phone_number=phone_number)
-    except JWTError as exc:
-        raise credentials_exception from exc
+    payload = decode_access_token(token)
+    token_data = UserSchema.TokenData(phone_number=payload["sub"])
 
     user = crud_user.get_user_by_phone(db, phone_number=token_data.phone_number)
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
+
+    current_user = UserSchema.User.model_validate(user)
+    user_cache.put(token, current_user, token_expires_at=payload["exp"])
+    return current_user
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+) -> UserSchema.User:
+    """
+    Async counterpart of `get_current_user`, sharing its cache.
+    """
+    token = credentials.credentials
+    cached_user = user_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    payload = decode_access_token(token)
+    user = await crud_user.get_user_by_phone_async(db, phone_number=payload["sub"])
+    if user is None:
+        raise credentials_exception()
 
-    return user
+    current_user = UserSchema.User.model_validate(user)
+    user_cache.put(token, current_user, token_expires_at=payload["exp"])
+    return current_user
 
 
 def get_token(credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> str:
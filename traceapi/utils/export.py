@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Iterable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def plain(value):
+    """Converts a column value into something both json and csv write as expected."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def encode_ndjson(batches: Iterable[Sequence], columns: Sequence[str]) -> Iterator[str]:
+    for rows in batches:
+        yield "".join(
+            json.dumps({column: plain(value) for column, value in zip(columns, row)}) + "\n"
+            for row in rows
+        )
+
+
+def encode_csv(batches: Iterable[Sequence], columns: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [json.dumps(value) if isinstance(value, dict) else plain(value) for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+
+
+def session_batches(session_factory: Callable[[], Session], fetch: Callable[..., Iterator], **kwargs) -> Iterator:
+    """
+    Runs `fetch(db, **kwargs)` in a session owned by the generator. The request's
+    own session is closed before a streaming body is sent, so exports open theirs here.
+    """
+    with session_factory() as db:
+        yield from fetch(db, **kwargs)
+
+
+def export_response(batches: Iterable[Sequence], columns: Sequence[str], fmt: ExportFormat, filename: str) -> StreamingResponse:
+    """
+    Streams batches of rows as NDJSON or CSV, one chunk per batch, so memory use
+    is bounded by the batch size rather than the result size.
+    """
+    encode = encode_csv if fmt is ExportFormat.CSV else encode_ndjson
+    return StreamingResponse(
+        encode(batches, columns),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt.value}"'},
+    )
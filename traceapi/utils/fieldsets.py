@@ -0,0 +1,54 @@
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+# Fields every sparse response keeps, whatever was asked for
+ALWAYS_INCLUDED = ("id",)
+
+
+def fieldset(schema: type[BaseModel]):
+    """
+    Builds a dependency reading the `fields=` query parameter: a comma-separated
+    subset of `schema`'s fields. Resolves to None (every field) when absent, and
+    rejects unknown names with a 400.
+    """
+    def dependency(
+            fields: Optional[str] = Query(
+                None,
+                description=f"Comma-separated {schema.__name__} fields to return, e.g. "
+                            f"`{','.join(list(schema.model_fields)[1:3])}`; `id` is always included",
+            ),
+    ) -> tuple[str, ...] | None:
+        if fields is None:
+            return None
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(requested) - set(schema.model_fields))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return tuple(dict.fromkeys([*ALWAYS_INCLUDED, *requested]))
+
+    return dependency
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: type[BaseModel], fields: tuple[str, ...] | None) -> type[BaseModel]:
+    """
+    `schema` narrowed to `fields`. Validating an ORM object against it reads only
+    those attributes, so columns left out of the SELECT are never lazy loaded.
+    """
+    if fields is None:
+        return schema
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields},
+    )
+
+
+@lru_cache(maxsize=256)
+def sparse_adapter(schema: type[BaseModel], fields: tuple[str, ...] | None, *, many: bool = False) -> TypeAdapter:
+    """TypeAdapter for one, or with `many` a list of, `sparse_schema(schema, fields)`."""
+    model = sparse_schema(schema, fields)
+    return TypeAdapter(List[model] if many else model)
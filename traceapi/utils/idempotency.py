@@ -0,0 +1,225 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from traceapi.core.config import settings
+from traceapi.crud import crud_idempotency
+from traceapi.db.models import IdempotencyKey
+
+# Set on responses replayed from a stored idempotent response
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotentResponseCache:
+    """
+    Bounded LRU of (user, key) -> stored response, so retries are answered
+    without touching the database.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[uuid.UUID, str], tuple[float, str, int, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: uuid.UUID, key: str) -> tuple[str, int, object] | None:
+        """Returns (fingerprint, status_code, body), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop((user_id, key), None)
+                return None
+            self._entries.move_to_end((user_id, key))
+            return entry[1:]
+
+    def put(self, user_id: uuid.UUID, key: str, fingerprint: str, status_code: int, body, *, ttl_seconds: float | None = None) -> None:
+        lifetime = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if lifetime <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, key)] = (time.monotonic() + lifetime, fingerprint, status_code, body)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+idempotency_cache = IdempotentResponseCache(
+    max_size=settings.IDEMPOTENCY_CACHE_MAX_SIZE, ttl_seconds=settings.IDEMPOTENCY_KEY_TTL_HOURS * 3600
+)
+
+
+def idempotency_key_header(
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
+) -> Optional[str]:
+    return idempotency_key
+
+
+def request_fingerprint(request: Request, body: BaseModel | None = None) -> str:
+    """Hash of the method, path and body, so a key cannot be reused for another request."""
+    payload = f"{request.method} {request.url.path}\n{body.model_dump_json() if body is not None else ''}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def in_progress_exception() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is already in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _age(created_at: datetime) -> timedelta:
+    if created_at.tzinfo is None:
+        # SQLite hands timestamps back naive; they are stored in UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - created_at
+
+
+class IdempotentRequest:
+    """
+    Tracks one request's Idempotency-Key. After `begin_idempotent_request`, either
+    `replay` holds the stored response to return as is, or the key has been staged
+    in the session and the handler runs. With a key, the handler flushes its
+    effect without committing and returns through `complete`, inside `guard`:
+    the effect, the key and the response are then saved by one commit, so a
+    crash can never leave a key without its response. Without a key every step
+    is a no-op and the handler commits as usual.
+    """
+
+    def __init__(self, *, user_id: uuid.UUID, key: str | None, fingerprint: str):
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = fingerprint
+        self.replay: JSONResponse | None = None
+        self.record: IdempotencyKey | None = None
+
+    def _ensure_same_request(self, fingerprint: str) -> None:
+        if fingerprint != self.fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+
+    def _replay(self, fingerprint: str, status_code: int, body) -> JSONResponse:
+        self._ensure_same_request(fingerprint)
+        return JSONResponse(content=body, status_code=status_code, headers={REPLAYED_HEADER: "true"})
+
+    def _check_cache(self) -> bool:
+        cached = idempotency_cache.get(self.user_id, self.key)
+        if cached is not None:
+            self.replay = self._replay(*cached)
+        return cached is not None
+
+    def _resolve(self, db: Session | AsyncSession, record: IdempotencyKey | None) -> None:
+        ttl = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        # Keys are committed with their response, so a row without one was left
+        # by an older release that saved responses separately; it is retried
+        if record is None or record.status_code is None or _age(record.created_at) >= ttl:
+            self.record = crud_idempotency.stage_idempotency_key(
+                db, user_id=self.user_id, key=self.key, fingerprint=self.fingerprint, existing=record
+            )
+            return
+        remaining = (ttl - _age(record.created_at)).total_seconds()
+        idempotency_cache.put(
+            self.user_id, self.key, record.fingerprint, record.status_code, record.response_body, ttl_seconds=remaining
+        )
+        self.replay = self._replay(record.fingerprint, record.status_code, record.response_body)
+
+    @contextmanager
+    def guard(self, db: Session):
+        """Turns a lost race on the key (a concurrent duplicate committed first) into a 409."""
+        try:
+            yield
+        except IntegrityError:
+            if self.key is None:
+                raise
+            db.rollback()
+            if crud_idempotency.get_idempotency_key(db, user_id=self.user_id, key=self.key) is None:
+                raise
+            raise in_progress_exception()
+
+    @asynccontextmanager
+    async def guard_async(self, db: AsyncSession):
+        try:
+            yield
+        except IntegrityError:
+            if self.key is None:
+                raise
+            await db.rollback()
+            if await crud_idempotency.get_idempotency_key_async(db, user_id=self.user_id, key=self.key) is None:
+                raise
+            raise in_progress_exception()
+
+    def complete(self, db: Session, response_model: type[BaseModel], result, *, status_code: int = 200):
+        """
+        Commits the flushed effect together with the key and its response, and
+        returns the response. The in-process cache is only filled once that commit
+        has succeeded.
+        """
+        if self.key is None:
+            return result
+        body = response_model.model_validate(result).model_dump(mode="json")
+        crud_idempotency.save_idempotent_response(db, record=self.record, status_code=status_code, body=body)
+        idempotency_cache.put(self.user_id, self.key, self.fingerprint, status_code, body)
+        return JSONResponse(content=body, status_code=status_code)
+
+    async def complete_async(self, db: AsyncSession, response_model: type[BaseModel], result, *, status_code: int = 200):
+        if self.key is None:
+            return result
+        body = response_model.model_validate(result).model_dump(mode="json")
+        await crud_idempotency.save_idempotent_response_async(db, record=self.record, status_code=status_code, body=body)
+        idempotency_cache.put(self.user_id, self.key, self.fingerprint, status_code, body)
+        return JSONResponse(content=body, status_code=status_code)
+
+
+def begin_idempotent_request(db: Session, *, user_id: uuid.UUID, key: str | None, fingerprint: str) -> IdempotentRequest:
+    """
+    Looks the key up, in the in-process cache first and then the database.
+    Raises 422 if the key was used for a different request, and 409 if its first
+    request has not finished yet.
+    """
+    idempotent = IdempotentRequest(user_id=user_id, key=key, fingerprint=fingerprint)
+    if key is not None and not idempotent._check_cache():
+        idempotent._resolve(db, crud_idempotency.get_idempotency_key(db, user_id=user_id, key=key))
+    return idempotent
+
+
+async def begin_idempotent_request_async(db: AsyncSession, *, user_id: uuid.UUID, key: str | None, fingerprint: str) -> IdempotentRequest:
+    idempotent = IdempotentRequest(user_id=user_id, key=key, fingerprint=fingerprint)
+    if key is not None and not idempotent._check_cache():
+        idempotent._resolve(db, await crud_idempotency.get_idempotency_key_async(db, user_id=user_id, key=key))
+    return idempotent
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Deletes Idempotency-Keys past IDEMPOTENCY_KEY_TTL_HOURS; run daily."""
+    import argparse
+
+    from traceapi.db.session import get_session_factory
+
+    parser = argparse.ArgumentParser(description="Delete expired Idempotency-Key records.")
+    parser.add_argument("--ttl-hours", type=int, default=settings.IDEMPOTENCY_KEY_TTL_HOURS,
+                        help="delete keys older than this")
+    args = parser.parse_args(argv)
+
+    before = datetime.now(timezone.utc) - timedelta(hours=args.ttl_hours)
+    with get_session_factory()() as db:
+        deleted = crud_idempotency.purge_expired_idempotency_keys(db, before=before)
+    print(f"Deleted {deleted} expired idempotency keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import hashlib
+
+# Domain separation between leaves and interior nodes, so an interior node can
+# never be passed off as a leaf (second-preimage attack on the tree)
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+LEFT = "L"
+RIGHT = "R"
+
+
+def hash_leaf(leaf_hex: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(leaf_hex)).digest()
+
+
+def hash_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(leaves: list[str]) -> list[list[bytes]]:
+    """
+    Builds a Merkle tree over hex-encoded leaf hashes, returning every level from
+    the hashed leaves up to the root. A node without a sibling is promoted to the
+    next level unchanged rather than paired with a copy of itself.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    levels = [[hash_leaf(leaf) for leaf in leaves]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(levels: list[list[bytes]]) -> str:
+    return levels[-1][0].hex()
+
+
+def inclusion_proof(levels: list[list[bytes]], index: int) -> list[list[str]]:
+    """
+    The sibling path from leaf `index` to the root, as [side, hash] pairs where side
+    says whether the sibling sits to the left or right. Its length is at most log2(n).
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append([LEFT if sibling < index else RIGHT, level[sibling].hex()])
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf_hex: str, proof: list[list[str]], root_hex: str) -> bool:
+    """Checks that `leaf_hex` is included under `root_hex`, in O(log n) hashes."""
+    node = hash_leaf(leaf_hex)
+    for side, sibling_hex in proof:
+        sibling = bytes.fromhex(sibling_hex)
+        node = hash_node(sibling, node) if side == LEFT else hash_node(node, sibling)
+    return node.hex() == root_hex
@@ -0,0 +1,26 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, item_id: uuid.UUID) -> str:
+    """
+    Encodes the sort key of the last item on a page into an opaque cursor.
+    Clients pass it back unchanged to fetch the next page.
+    """
+    raw = json.dumps([created_at.isoformat(), str(item_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(item_id)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
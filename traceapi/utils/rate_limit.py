@@ -0,0 +1,213 @@
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi import HTTPException, Request, status
+
+from traceapi.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(ABC):
+    """
+    Token buckets keyed by a string. A bucket holds up to `capacity` tokens and
+    refills at `refill_per_second`; each attempt takes one token.
+    """
+
+    @abstractmethod
+    def take(self, key: str, *, capacity: float, refill_per_second: float) -> float:
+        """Takes a token from `key`'s bucket. Returns 0 if one was taken, else the seconds until one is available."""
+
+
+def refill(tokens: float, updated_at: float, now: float, *, capacity: float, refill_per_second: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * refill_per_second)
+
+
+def wait_for_token(tokens: float, refill_per_second: float) -> float:
+    return (1 - tokens) / refill_per_second
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets in this process, for a single node. Bounded to `max_keys` buckets,
+    least recently used first out; a bucket being hammered stays recent, so
+    eviction only ever forgets idle, refilled ones.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, *, capacity: float, refill_per_second: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = refill(tokens, updated_at, now, capacity=capacity, refill_per_second=refill_per_second)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = wait_for_token(tokens, refill_per_second)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class BucketStore(ABC):
+    """
+    Key-value store shared by every API process, holding bucket state as short
+    strings. Maps onto Redis (WATCH/MULTI, or a Lua script) or a DynamoDB table
+    with conditional writes.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        """Returns the value stored under `key`, or None."""
+
+    @abstractmethod
+    def compare_and_set(self, key: str, expected: str | None, value: str, *, ttl_seconds: float) -> bool:
+        """
+        Stores `value` under `key` if the current value is still `expected` (None:
+        absent), expiring it after `ttl_seconds`. Returns False if it changed.
+        """
+
+
+class LocalBucketStore(BucketStore):
+    """Stand-in shared store for development and tests: a dict with expiry."""
+
+    def __init__(self):
+        self._values: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return entry[0]
+
+    def compare_and_set(self, key: str, expected: str | None, value: str, *, ttl_seconds: float) -> bool:
+        with self._lock:
+            entry = self._values.get(key)
+            current = entry[0] if entry is not None and entry[1] > time.time() else None
+            if current != expected:
+                return False
+            self._values[key] = (value, time.time() + ttl_seconds)
+            return True
+
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """
+    Buckets in a BucketStore, so limits hold across workers and Lambda containers.
+    Each take is a read and a conditional write, retried on a conflicting write.
+    A bucket still contended after `max_attempts` is treated as empty, while a
+    store that cannot be reached lets the attempt through: logins keep working
+    and the PIN hasher's own bound still protects the CPU.
+    """
+
+    def __init__(self, store: BucketStore, max_attempts: int = 5):
+        self.store = store
+        self.max_attempts = max_attempts
+
+    def take(self, key: str, *, capacity: float, refill_per_second: float) -> float:
+        # Buckets untouched for this long are full again, so need not be stored
+        ttl_seconds = capacity / refill_per_second
+        try:
+            for _ in range(self.max_attempts):
+                now = time.time()
+                stored = self.store.get(key)
+                if stored is None:
+                    tokens, updated_at = capacity, now
+                else:
+                    tokens_text, updated_at_text = stored.split(":")
+                    tokens, updated_at = float(tokens_text), float(updated_at_text)
+                tokens = refill(tokens, updated_at, now, capacity=capacity, refill_per_second=refill_per_second)
+                if tokens < 1:
+                    return wait_for_token(tokens, refill_per_second)
+                if self.store.compare_and_set(key, stored, f"{tokens - 1:.6f}:{now:.6f}", ttl_seconds=ttl_seconds):
+                    return 0.0
+        except Exception:
+            logger.warning("Rate limit store unavailable; allowing the attempt", exc_info=True)
+            return 0.0
+        return 1 / refill_per_second
+
+
+# Backends selectable with settings.RATE_LIMIT_BACKEND; deployments register shared stores here
+RATE_LIMIT_BACKENDS: dict[str, Callable[[], RateLimitBackend]] = {
+    "memory": lambda: MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS),
+    "local": lambda: SharedRateLimitBackend(LocalBucketStore()),
+}
+
+_backend: RateLimitBackend | None = None
+
+
+def register_rate_limit_backend(name: str, factory: Callable[[], RateLimitBackend]) -> None:
+    RATE_LIMIT_BACKENDS[name] = factory
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """Returns the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_BACKEND not in RATE_LIMIT_BACKENDS:
+            raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+        _backend = RATE_LIMIT_BACKENDS[settings.RATE_LIMIT_BACKEND]()
+    return _backend
+
+
+def client_ip(request: Request) -> str:
+    """
+    The caller's address. Behind RATE_LIMIT_TRUSTED_PROXIES load balancers it is
+    taken that many entries from the right of X-Forwarded-For, since entries
+    further left are whatever the client chose to send.
+    """
+    hops = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if hops > 0:
+        forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",") if address.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client is not None else "unknown"
+
+
+def too_many_attempts_exception(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many sign-in attempts, please retry later.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def limit_sign_in(backend: RateLimitBackend, request: Request, phone_number: str) -> None:
+    """
+    Takes a token from the caller's IP bucket, then from the phone number's, and
+    raises a 429 with Retry-After if either is empty. Called before the user
+    lookup and bcrypt, so rejected attempts cost neither.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    retry_after = backend.take(
+        f"sign-in:ip:{client_ip(request)}",
+        capacity=settings.RATE_LIMIT_IP_BURST,
+        refill_per_second=settings.RATE_LIMIT_IP_PER_MINUTE / 60,
+    )
+    if retry_after:
+        raise too_many_attempts_exception(retry_after)
+    # The last ten digits, so +234, 234 and 0 prefixed forms share a bucket
+    retry_after = backend.take(
+        f"sign-in:phone:{phone_number[-10:]}",
+        capacity=settings.RATE_LIMIT_PHONE_BURST,
+        refill_per_second=settings.RATE_LIMIT_PHONE_PER_MINUTE / 60,
+    )
+    if retry_after:
+        raise too_many_attempts_exception(retry_after)
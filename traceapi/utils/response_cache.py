@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from traceapi.core.config import settings
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+    headers: dict[str, str]
+
+    def validators(self) -> dict[str, str]:
+        """Headers sent with both full and 304 responses."""
+        return {
+            **self.headers,
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            "Cache-Control": settings.LISTINGS_CACHE_CONTROL,
+        }
+
+    def not_modified(self, request: Request) -> bool:
+        """
+        Evaluates If-None-Match, or If-Modified-Since when no ETag was sent
+        (RFC 9110 section 13.2.2). ETags are compared weakly.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return self.etag.removeprefix("W/") in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def to_response(self, request: Request) -> Response:
+        if self.not_modified(request):
+            return Response(status_code=304, headers=self.validators())
+        return Response(content=self.body, media_type="application/json", headers=self.validators())
+
+
+class PublicResponseCache:
+    """
+    Bounded LRU of serialized public responses, keyed by path and query string.
+    Writers call `invalidate()` after committing a change the cached endpoints
+    would show; it bumps a generation, and a page rendered from data read under
+    an older generation is never stored. Invalidation is per process, so the TTL
+    bounds staleness across workers.
+
+    Last-Modified is when the cached data last changed, as far as this process
+    knows: set on invalidation, in whole seconds like the header, and always at
+    least a second later than before. A page rendered in the same second as an
+    earlier one, but after a change, therefore never matches that page's
+    If-Modified-Since.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.modified_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self._entries: OrderedDict[str, tuple[float, CachedResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request: Request) -> str:
+        return f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+    def get(self, request: Request) -> CachedResponse | None:
+        """Returns the cached response for a request, or None on a miss."""
+        key = self.key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, request: Request, generation: int, body: bytes, headers: dict[str, str] | None = None) -> CachedResponse:
+        """
+        Wraps a rendered body with its validators and caches it, unless the cache
+        was invalidated after `generation` was read.
+        """
+        etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        with self._lock:
+            current = generation == self.generation
+            # Data read before the latest change may lack it, so it must not claim
+            # to be as recent; clients holding it then revalidate to the new page
+            last_modified = self.modified_at if current else self.modified_at - timedelta(seconds=1)
+            cached = CachedResponse(body=body, etag=etag, last_modified=last_modified, headers=headers or {})
+            if current and self.ttl_seconds > 0 and self.max_size > 0:
+                key = self.key(request)
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, cached)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.generation += 1
+            now = datetime.now(timezone.utc).replace(microsecond=0)
+            self.modified_at = max(now, self.modified_at + timedelta(seconds=1))
+            self._entries.clear()
+
+    def clear(self) -> None:
+        self.invalidate()
+
+
+# Public listing pages and search results
+listings_cache = PublicResponseCache(
+    max_size=settings.LISTINGS_CACHE_MAX_SIZE, ttl_seconds=settings.LISTINGS_CACHE_TTL_SECONDS
+)
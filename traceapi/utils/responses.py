@@ -0,0 +1,46 @@
+import json
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from traceapi.core.config import settings
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by pydantic-core instead of `json.dumps`. UUIDs,
+    datetimes, enums and models are encoded natively, in one pass.
+    Opt in per route with `response_class=`, or app-wide with FAST_JSON_RESPONSES.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def render_model(adapter: TypeAdapter, value: Any) -> bytes:
+    """
+    Validates `value` (ORM objects included) against the response schema once and
+    serializes it, which is what `response_model` costs in two passes plus a
+    thread hop for sync routes. With FAST_JSON_RESPONSES the validated model is
+    dumped straight to JSON by pydantic-core; otherwise by `json.dumps`, in the
+    same compact UTF-8 form as JSONResponse.
+    """
+    validated = adapter.validate_python(value, from_attributes=True)
+    if settings.FAST_JSON_RESPONSES:
+        return adapter.dump_json(validated)
+    return json.dumps(
+        adapter.dump_python(validated, mode="json"), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def model_response(adapter: TypeAdapter, value: Any, *, status_code: int = 200, headers: dict[str, str] | None = None) -> Response:
+    """
+    Returns `value` rendered by `render_model`. FastAPI passes a returned Response
+    through untouched, so the route's `response_model` only documents the schema.
+    """
+    return Response(
+        content=render_model(adapter, value), status_code=status_code, headers=headers, media_type="application/json"
+    )
@@ -0,0 +1,82 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from traceapi.core.config import settings
+from traceapi.schemas.user import User
+
+
+class AuthenticatedUserCache:
+    """
+    Bounded LRU cache of verified bearer token -> user snapshot.
+    Entries expire after `ttl_seconds` or when the token itself expires, whichever
+    comes first, and can be dropped per user when their tier or status changes.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+        self._tokens_by_user: dict[uuid.UUID, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> User | None:
+        """Returns the cached user for a token, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._discard(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: User, token_expires_at: float) -> None:
+        """
+        Caches a user for a verified token.
+        `token_expires_at` is the token's `exp` claim as a Unix timestamp.
+        """
+        lifetime = min(self.ttl_seconds, token_expires_at - time.time())
+        if lifetime <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._discard(token)
+            self._entries[token] = (time.monotonic() + lifetime, user)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """Drops every cached token for a user."""
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, set()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _discard(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[1].id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[1].id]
+
+
+user_cache = AuthenticatedUserCache(
+    max_size=settings.AUTH_CACHE_MAX_SIZE, ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS
+)